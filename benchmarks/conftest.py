@@ -0,0 +1,83 @@
+"""
+Shared fixtures and options of the per-stage latency benchmarks.
+
+Run with
+    python -m pytest benchmarks
+The median time of every (input size, stage) pair is compared against
+stage_baselines.json and the test fails when it exceeds the baseline times the
+tolerance factor, and a stage without baseline fails unless the baseline file
+lists it as unmeasured. After an intended performance change, a new stage or on
+a new benchmark machine, refresh the baselines with --update-stage-baselines.
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+if str(REPO_DIR) not in sys.path:
+    sys.path.insert(0, str(REPO_DIR))
+
+BASELINES_PATH = Path(__file__).resolve().parent / 'stage_baselines.json'
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('drgpu stage budgets')
+    group.addoption('--update-stage-baselines', action='store_true', default=False,
+                    help='store the measured medians as the new stage baselines.')
+    group.addoption('--stage-tolerance', type=float, default=None,
+                    help='allowed slowdown factor over the baseline (default from the baseline file).')
+
+
+class StageBaselines:
+    """Per-stage median baselines (seconds) stored as JSON."""
+
+    def __init__(self, path, update, tolerance):
+        self.path = path
+        self.update = update
+        if path.exists():
+            self.content = json.loads(path.read_text(encoding='utf-8'))
+        else:
+            self.content = {'tolerance': 3.0, 'min_budget': 0.005, 'stages': {}, 'unmeasured': []}
+        self.tolerance = tolerance if tolerance is not None else self.content['tolerance']
+        # sub-millisecond stages are dominated by timer and scheduler noise
+        self.min_budget = self.content.get('min_budget', 0.0)
+        # stages which could not be measured yet, e.g. build_dot_graph without the dot executable
+        self.unmeasured = set(self.content.get('unmeasured', []))
+        self.measured = {}
+
+    def check(self, size, stage, median):
+        self.measured.setdefault(size, {})[stage] = median
+        if self.update:
+            return
+        baseline = self.content['stages'].get(size, {}).get(stage)
+        if baseline is None and stage in self.unmeasured:
+            pytest.skip(f"{stage} is not measured yet, no budget on {size} input until it is recorded "
+                        f"with --update-stage-baselines")
+        if baseline is None:
+            pytest.fail(f"{stage} on {size} input has no baseline in {self.path.name}, "
+                        f"record it with --update-stage-baselines")
+        budget = max(baseline * self.tolerance, self.min_budget)
+        assert median <= budget, \
+            f"{stage} on {size} input took {median * 1000:.2f} ms, budget is {budget * 1000:.2f} ms " \
+            f"({self.tolerance}x the {baseline * 1000:.2f} ms baseline)"
+
+    def save(self):
+        for size, stages in self.measured.items():
+            self.content['stages'].setdefault(size, {}).update(
+                {stage: round(median, 6) for stage, median in stages.items()})
+        recorded = {stage for stages in self.content['stages'].values() for stage in stages}
+        self.content['unmeasured'] = sorted(self.unmeasured - recorded)
+        self.path.write_text(json.dumps(self.content, indent=4, sort_keys=True) + '\n', encoding='utf-8')
+
+
+@pytest.fixture(scope='session')
+def stage_baselines(request):
+    baselines = StageBaselines(BASELINES_PATH, request.config.getoption('--update-stage-baselines'),
+                               request.config.getoption('--stage-tolerance'))
+    yield baselines
+    if baselines.update:
+        baselines.save()
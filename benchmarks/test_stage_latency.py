@@ -0,0 +1,105 @@
+"""
+Latency of every stage of drgpu_launch.work on small, medium and large inputs.
+"""
+import copy
+import io
+import shutil
+
+import pytest
+
+from conftest import REPO_DIR
+from drgpu import dot_graph
+from drgpu import read_reports
+from drgpu import synthetic_report
+from drgpu.data_struct import Analysis, Memory_Metrics, Report
+from drgpu.drgpu_launch import load_config, hunt_units, build_tree, add_suggestions
+
+# small is test/vector_add.csv, medium and large are generated by drgpu.synthetic_report:
+# (kernels in the main report, columns of the main report, lines of the source report)
+INPUT_SIZES = {
+    'small': None,
+    'medium': (100, 1000, 5000),
+    'large': (1000, 2000, 20000),
+}
+STAGES = ['fill_stats', 'fill_source_report', 'unit_hunt', 'gather', 'suggestions', 'build_dot_graph']
+ROUNDS = 5
+
+
+def make_report(size):
+    if INPUT_SIZES[size] is None:
+        return Report(path='vector_add.csv', source_report_path='vector_add_s.csv', kernel_id=0,
+                      report_content=(REPO_DIR / 'test' / 'vector_add.csv').read_text(encoding='utf-8'),
+                      source_report_content=(REPO_DIR / 'test' / 'vector_add_s.csv').read_text(encoding='utf-8'))
+    kernels, columns, source_lines = INPUT_SIZES[size]
+    report_stream = io.StringIO()
+    synthetic_report.write_raw_report(report_stream, kernels, columns)
+    source_stream = io.StringIO()
+    synthetic_report.write_source_report(source_stream, source_lines, files=4)
+    return Report(path='synthetic_%s.csv' % size, source_report_path='synthetic_%s_s.csv' % size,
+                  kernel_id=kernels - 1, report_content=report_stream.getvalue(),
+                  source_report_content=source_stream.getvalue())
+
+
+@pytest.fixture(scope='module', params=list(INPUT_SIZES))
+def stage_input(request):
+    report = make_report(request.param)
+    config = load_config('gtx1650')
+    analysis = Analysis()
+    read_reports.fill_stats(analysis.all_stats, report)
+    read_reports.fill_source_report(report, analysis)
+    return request.param, report, config, analysis
+
+
+def hunted(analysis, config):
+    fresh = Analysis()
+    fresh.all_stats = copy.deepcopy(analysis.all_stats)
+    fresh.stall_sass_code = analysis.stall_sass_code
+    fresh.source_lines = analysis.source_lines
+    memory_metrics = Memory_Metrics()
+    hunt_units(fresh, memory_metrics, config)
+    return fresh, memory_metrics
+
+
+def stage_call(stage, report, config, analysis, tmp_path):
+    """Return (target, setup) for benchmark.pedantic. Only the target is timed."""
+    if stage == 'fill_stats':
+        return read_reports.fill_stats, lambda: (({}, report), {})
+    if stage == 'fill_source_report':
+        return read_reports.fill_source_report, lambda: ((report, Analysis()), {})
+    if stage == 'unit_hunt':
+        def setup():
+            fresh = Analysis()
+            fresh.all_stats = copy.deepcopy(analysis.all_stats)
+            return (fresh, Memory_Metrics(), config), {}
+        return hunt_units, setup
+    if stage == 'gather':
+        def setup():
+            fresh, memory_metrics = hunted(analysis, config)
+            return (report, fresh, memory_metrics, config), {}
+        return build_tree, setup
+    if stage == 'suggestions':
+        def setup():
+            fresh, memory_metrics = hunted(analysis, config)
+            hw_tree = build_tree(report, fresh, memory_metrics, config)
+            return (hw_tree, fresh, memory_metrics, config), {}
+        return add_suggestions, setup
+    if stage == 'build_dot_graph':
+        if shutil.which('dot') is None:
+            pytest.skip("Graphviz dot executable is not available")
+        fresh, memory_metrics = hunted(analysis, config)
+        hw_tree = build_tree(report, fresh, memory_metrics, config)
+        add_suggestions(hw_tree, fresh, memory_metrics, config)
+        return dot_graph.build_dot_graph, lambda: ((hw_tree, str(tmp_path / 'tree')), {})
+    raise ValueError(stage)
+
+
+@pytest.mark.parametrize('stage', STAGES)
+def test_stage_latency(benchmark, stage_baselines, stage_input, stage, tmp_path):
+    size, report, config, analysis = stage_input
+    benchmark.group = size
+    target, setup = stage_call(stage, report, config, analysis, tmp_path)
+    benchmark.pedantic(target, setup=setup, rounds=ROUNDS, warmup_rounds=1)
+    if benchmark.stats is None:
+        # --benchmark-disable runs every stage once without timing
+        return
+    stage_baselines.check(size, stage, benchmark.stats.stats.median)
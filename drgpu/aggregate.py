@@ -0,0 +1,123 @@
+"""
+Aggregate repeated launches of the same kernel into one weighted set of counters.
+
+Launches are grouped by kernel name and launch configuration. Counters ending in `.sum` and the
+elapsed cycles are added up, every other counter (ratios, percentages, per-cycle averages) is
+averaged weighted by the elapsed cycles of each launch, so long launches dominate the diagnosis
+like they dominate the run time. All of it is done with groupby on whole columns.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from drgpu import counters
+
+logger = logging.getLogger(__name__)
+
+KERNEL_NAME_COLUMN = "Kernel Name"
+CYCLES_COLUMN = "gpc__cycles_elapsed.max"
+# launches with the same name but another configuration are diagnosed separately
+LAUNCH_CONFIG_COLUMNS = ["launch__grid_size", "launch__block_size", "launch__registers_per_thread",
+                         "launch__shared_mem_per_block"]
+STALL_RATIO_PREFIX = "smsp__average_warps_issue_stalled_"
+STALL_RATIO_SUFFIX = "_per_issue_active.ratio"
+# stall ratios listed per group by format_variation
+TOP_STALLS = 3
+
+
+def is_sum_counter(column):
+    return column.endswith(".sum") or column == CYCLES_COLUMN
+
+
+def numeric_counters(kernel_rows, columns):
+    """Convert the string counters of the raw page to floats, column by column."""
+    numeric = {}
+    for column in columns:
+        values = kernel_rows[column]
+        if not pd.api.types.is_numeric_dtype(values):
+            values = pd.to_numeric(values.astype(str).str.replace(',', '', regex=False), errors='coerce')
+        numeric[column] = values.astype(float)
+    return pd.DataFrame(numeric, index=kernel_rows.index)
+
+
+def aggregate_launches(raw_counters_df, units_row=True):
+    """
+    Combine the launches of every kernel and launch configuration.
+    Args:
+        raw_counters_df: The parsed raw page.
+        units_row: Whether the first row holds the units of the counters as in the ncu CSV.
+    Returns:
+        The aggregated counters, one row per group without units row, for load_report_frame, and
+        the variation of the stall ratios of every group (launches, cycles, then mean, std, min
+        and max of each stall ratio).
+    """
+    kernel_rows = raw_counters_df.iloc[1:] if units_row else raw_counters_df
+    if KERNEL_NAME_COLUMN not in kernel_rows.columns:
+        raise ValueError(f"The report has no {KERNEL_NAME_COLUMN} column to group launches")
+    keys = [KERNEL_NAME_COLUMN] + [column for column in LAUNCH_CONFIG_COLUMNS if column in kernel_rows.columns]
+    counter_columns = [column for column in counters.required_ncu_columns()
+                       if column in kernel_rows.columns and column not in keys]
+    numeric = numeric_counters(kernel_rows, counter_columns)
+    if CYCLES_COLUMN in numeric:
+        weights = numeric[CYCLES_COLUMN].fillna(0)
+    else:
+        logger.warning("The report has no %s, launches are weighted equally", CYCLES_COLUMN)
+        weights = pd.Series(1.0, index=numeric.index)
+    groups = [kernel_rows[key].astype(str) for key in keys]
+
+    sum_columns = [column for column in counter_columns if is_sum_counter(column)]
+    mean_columns = [column for column in counter_columns if not is_sum_counter(column)]
+    sums = numeric[sum_columns].groupby(groups, sort=False).sum(min_count=1)
+    means = weighted_means(numeric[mean_columns], weights, groups)
+    aggregated = pd.concat([sums, means], axis=1)[counter_columns].reset_index()
+    aggregated.columns = keys + counter_columns
+
+    stall_columns = [column for column in mean_columns
+                     if column.startswith(STALL_RATIO_PREFIX) and column.endswith(STALL_RATIO_SUFFIX)]
+    variation = stall_variation(numeric[stall_columns], weights, groups, means[stall_columns])
+    variation.index = aggregated[KERNEL_NAME_COLUMN]
+    return aggregated, variation
+
+
+def weighted_means(values, weights, groups):
+    """
+    Weighted mean of every column per group. Missing values don't count, and groups without
+    weight (no elapsed cycles) fall back to the plain mean.
+    """
+    present = values.notna()
+    numerator = values.fillna(0).mul(weights, axis=0).groupby(groups, sort=False).sum()
+    denominator = present.mul(weights, axis=0).groupby(groups, sort=False).sum()
+    plain = values.groupby(groups, sort=False).mean()
+    return (numerator / denominator.where(denominator > 0)).fillna(plain)
+
+
+def stall_variation(stalls, weights, groups, means):
+    """Launch count, total cycles and weighted std, min and max of the stall ratios per group."""
+    grouped = stalls.groupby(groups, sort=False)
+    squares = weighted_means(stalls ** 2, weights, groups)
+    std = np.sqrt((squares - means ** 2).clip(lower=0))
+    columns = {('launches', ''): grouped.size(), ('cycles', ''): weights.groupby(groups, sort=False).sum()}
+    for column in stalls.columns:
+        stall = column[len(STALL_RATIO_PREFIX):-len(STALL_RATIO_SUFFIX)]
+        columns[(stall, 'mean')] = means[column]
+        columns[(stall, 'std')] = std[column]
+        columns[(stall, 'min')] = grouped[column].min()
+        columns[(stall, 'max')] = grouped[column].max()
+    variation = pd.DataFrame(columns)
+    return variation.reset_index(drop=True)
+
+
+def format_variation(variation, group_id):
+    """Describe the launches of one group and the variation of its largest stall ratios."""
+    row = variation.iloc[group_id]
+    stalls = [name for name in row.index.get_level_values(0).unique() if name not in ('launches', 'cycles')]
+    stalls.sort(key=lambda name: row[(name, 'mean')], reverse=True)
+    lines = ["%s: %d launches, %.0f cycles" % (variation.index[group_id], row[('launches', '')],
+                                               row[('cycles', '')])]
+    for name in stalls[:TOP_STALLS]:
+        mean = row[(name, 'mean')]
+        std = row[(name, 'std')]
+        lines.append("  stall %s: %.3f +- %.3f (cv %.0f%%, %.3f..%.3f)" % (
+            name, mean, std, 100 * std / mean if mean else 0, row[(name, 'min')], row[(name, 'max')]))
+    return "\n".join(lines)
@@ -0,0 +1,199 @@
+"""
+One stall tree for a whole application.
+
+The tree of drgpu_launch.work describes one kernel launch. Here the counters of all kernels of a
+report are read as columns and combined with weighted sums, every kernel weighted by its share of
+the elapsed cycles of all kernels:
+
+- the idle share of the cycles (the root),
+- the share of the cycles lost to every warp_cant_issue stall,
+- the pipe utilization below the pipe throttle stall,
+- the memory latency breakdown of unit_hunt.memory_model below the long scoreboard stall.
+
+Every node lists the kernels contributing most to it and links (in the SVG) to the tree of the
+largest one, so one can drill down from the application to the kernel.
+"""
+import logging
+
+import numpy as np
+
+from drgpu import counters
+from drgpu import read_reports
+from drgpu import trace
+from drgpu import unit_hunt
+from drgpu.node import Node, NODE_NAME_MAP_COUNTER, LATENCY_NODE
+
+logger = logging.getLogger(__name__)
+
+STALL_NAMES = [name for name in counters.counters_name_map_for_ncu
+               if name.startswith('warp_cant_issue_') and name in NODE_NAME_MAP_COUNTER]
+PIPE_NAMES = [name for name in counters.counters_name_map_for_ncu
+              if name.startswith('pipe_') and name in NODE_NAME_MAP_COUNTER]
+# kernels listed on every node
+TOP_KERNELS = 3
+
+
+def app_columns(raw_counters, units_row=True):
+    """
+    The counters of the application tree for every kernel of a raw page.
+    @arg raw_counters: pandas DataFrame or pyarrow Table of the raw page.
+    @return: {stat name: array over kernels} of the stalls, pipes, elapsedClocks and retireIPC
+    which are in the report, and the kernel names.
+    """
+    names = {name: counters.counters_name_map_for_ncu[name][0]
+             for name in STALL_NAMES + PIPE_NAMES + ['elapsedClocks', 'retireIPC']}
+    kernel_name_column = counters.counters_name_map_for_ncu['kernel_name'][0]
+    available = raw_counters.column_names if hasattr(raw_counters, 'column_names') else raw_counters.columns
+    missing = [name for name, column in names.items() if column not in available]
+    if missing:
+        logger.debug("The report doesn't have the counters of %s", ", ".join(missing))
+    names = {name: column for name, column in names.items() if column in available}
+    needed = list(names.values()) + ([kernel_name_column] if kernel_name_column in available else [])
+    if hasattr(raw_counters, 'column_names'):
+        # pyarrow.Table
+        raw_counters = raw_counters.select(needed).to_pandas()
+    kernel_rows = raw_counters.iloc[1:] if units_row else raw_counters
+    values = read_reports.numeric_columns_ncu(kernel_rows, list(names.values()))
+    columns = {name: values[column] for name, column in names.items()}
+    if kernel_name_column in kernel_rows.columns:
+        kernel_names = [read_reports.get_kernel_name(str(name)) for name in kernel_rows[kernel_name_column]]
+    else:
+        kernel_names = ["kernel"] * len(kernel_rows)
+    return columns, kernel_names
+
+
+def kernel_weights(elapsed_clocks):
+    """The share of every kernel of the elapsed cycles of all kernels, equal shares without cycles."""
+    total = elapsed_clocks.sum()
+    if not total > 0:
+        return np.full(len(elapsed_clocks), 1 / max(len(elapsed_clocks), 1))
+    return elapsed_clocks / total
+
+
+def _shares(values, total):
+    """values / total row by row, 0 where the total is 0."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shares = values / total[:, None]
+    return np.nan_to_num(shares, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+class AppTreeBuilder:
+    def __init__(self, weights, kernel_names, kernel_url=None, top_kernels=TOP_KERNELS):
+        """
+        @arg weights: share of every kernel of the elapsed cycles.
+        @arg kernel_url: function of the kernel index returning the link of its tree, or None.
+        """
+        self.weights = weights
+        self.kernel_names = kernel_names
+        self.kernel_url = kernel_url
+        self.top_kernels = top_kernels
+        # kernels listed on any node
+        self.listed = set()
+
+    def node(self, name, values):
+        """
+        A node whose value is the weighted sum of values, listing the kernels with the largest
+        weighted values.
+        """
+        node = Node(name)
+        contributions = self.weights * values
+        total = contributions.sum()
+        node.percentage = float(total)
+        if total > 0:
+            top = np.argsort(-contributions, kind='stable')[:self.top_kernels]
+            top = [kernel for kernel in top if contributions[kernel] > 0]
+            for kernel in top:
+                node.suffix_label += r"\n#%d %s: %.0f%%" % (kernel, self.kernel_names[kernel],
+                                                           100 * contributions[kernel] / total)
+            self.listed.update(int(kernel) for kernel in top)
+            if self.kernel_url is not None and top:
+                node.url = self.kernel_url(int(top[0]))
+        return node
+
+
+def build_app_tree(columns, model, kernel_names, config, kernel_url=None, top_kernels=TOP_KERNELS):
+    """
+    Build the application tree.
+    @arg columns: app_columns of the report.
+    @arg model: unit_hunt.memory_model of the kernels, None to leave out the latency breakdown.
+    @arg kernel_url: function of the kernel index returning the link of its tree, or None.
+    @return: the root node and the kernels listed on any node, sorted.
+    """
+    kernels = len(kernel_names)
+    elapsed_clocks = columns.get('elapsedClocks', np.ones(kernels))
+    weights = kernel_weights(elapsed_clocks)
+    builder = AppTreeBuilder(weights, kernel_names, kernel_url, top_kernels)
+
+    retire_ipc = columns.get('retireIPC', np.zeros(kernels))
+    idle = 1 - retire_ipc / config.quadrants_per_SM
+    hw_tree = builder.node('Idle', idle)
+    hw_tree.prefix_label = "%d kernels, %.0f cycles\n" % (kernels, elapsed_clocks.sum())
+
+    stall_names = [name for name in STALL_NAMES if name in columns]
+    stalls = np.column_stack([columns[name] for name in stall_names]) if stall_names else np.zeros((kernels, 0))
+    # share of the cycles of every kernel lost to each stall
+    stall_shares = _shares(stalls, stalls.sum(axis=1)) * idle[:, None]
+    app_stalls = weights @ stall_shares
+    shown = np.argsort(-app_stalls, kind='stable')[:config.max_number_of_showed_nodes]
+    for i in shown:
+        stall_node = builder.node(stall_names[i], stall_shares[:, i])
+        stall_node.suffix_label = " of total cycles" + stall_node.suffix_label
+        hw_tree.child.append(stall_node)
+        if stall_names[i] == 'warp_cant_issue_pipe_throttle':
+            add_pipe_branch(builder, columns, stall_node, config)
+        elif stall_names[i] == 'warp_cant_issue_long_scoreboard' and model is not None:
+            add_latency_branch(builder, model, stall_node)
+    return hw_tree, sorted(builder.listed)
+
+
+def add_pipe_branch(builder, columns, target_node, config):
+    pipe_names = [name for name in PIPE_NAMES if name in columns]
+    if not pipe_names:
+        return
+    utilization = np.column_stack([columns[name] for name in pipe_names]) / 100
+    app_utilization = builder.weights @ utilization
+    for i in np.argsort(-app_utilization, kind='stable')[:config.max_number_of_showed_nodes]:
+        node = builder.node(pipe_names[i], utilization[:, i])
+        node.prefix_label = 'active '
+        node.suffix_label = ' of total cycles' + node.suffix_label
+        target_node.child.append(node)
+
+
+def add_latency_branch(builder, model, target_node):
+    """The chain of weighted average latencies of unit_hunt.LATENCY_LEVELS, like the kernel tree."""
+    total_latency = builder.weights @ model['total_latency']
+    latency_node_top = builder.node("avg_latency", model['total_latency'])
+    latency_node_top.type = LATENCY_NODE
+    latency_node_top.percentage = None
+    latency_node_top.suffix_label = r"Average load latency (weighted): %i" % int(total_latency) + \
+        latency_node_top.suffix_label
+    target_node.child.append(latency_node_top)
+    target_node = latency_node_top
+    for level in unit_hunt.LATENCY_LEVELS:
+        node = builder.node(level + "_latency", model[level + '_latency'])
+        node.type = LATENCY_NODE
+        node.percentage = node.percentage / total_latency if total_latency else 0.0
+        cycles = builder.weights @ model[level + '_cycles']
+        node.suffix_label = r" of average latency (weighted)\navg cycles spent at this level: %i" % int(cycles) + \
+            node.suffix_label
+        target_node.child.append(node)
+        target_node = node
+
+
+def app_tree(report, config, kernel_url=None, top_kernels=TOP_KERNELS):
+    """
+    Read all kernels of the report and build the application tree.
+    @arg kernel_url: function of the kernel index returning the link of its tree, or None.
+    @return: the root node, the kernels listed on any node and the parsed raw page.
+    """
+    raw_counters = read_reports.fill_report_ncu(report)
+    units_row = getattr(report, 'raw_counters_units_row', True)
+    with trace.span("app_tree"):
+        columns, kernel_names = app_columns(raw_counters, units_row)
+        try:
+            model = unit_hunt.memory_model(read_reports.memory_model_columns_ncu(raw_counters, units_row), config)
+        except ValueError as e:
+            logger.warning("No memory latency breakdown: %s", e)
+            model = None
+        hw_tree, listed = build_app_tree(columns, model, kernel_names, config, kernel_url, top_kernels)
+    return hw_tree, listed, raw_counters
@@ -0,0 +1,137 @@
+"""
+asyncio entry points of DrGPU for embedding it in services.
+
+The CPU-bound stages run on an executor (the loop's default thread pool unless one is given, a
+ProcessPoolExecutor avoids holding the GIL of the service), and so do the file reads, the
+in-memory graphviz layout and the writes of the rendering, so the event loop is never blocked.
+A stage already running on the executor when its call is cancelled finishes in the background and
+its result is dropped; a cancelled rendering is not saved.
+"""
+import asyncio
+import concurrent.futures
+import functools
+import logging
+from pathlib import Path
+from typing import List, Sequence
+
+from drgpu import dot_graph
+from drgpu.data_struct import Report, Memory_Metrics, Configuration
+from drgpu.drgpu_launch import DEFAULT_OUTPUT_DIR, launch, load_report, default_dot_graph_name, save_rendering
+from drgpu.node import Node
+
+logger = logging.getLogger(__name__)
+
+# default number of reports analyzed at the same time by launch_many_async
+DEFAULT_CONCURRENCY = 4
+
+
+async def _run(executor: concurrent.futures.Executor | None, func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+async def load_report_async(report_path: Path, source_path: Path | None = None,
+                            kernel_id: int | None = None,
+                            executor: concurrent.futures.Executor | None = None) -> Report:
+    """
+    Load the report from the path without blocking the event loop.
+    Args:
+        report_path: The path to the report.
+        source_path: The path to the source (optional).
+        kernel_id: The kernel id (optional).
+        executor: Executor doing the file reads (optional, default is the loop's executor).
+    Returns:
+        The report.
+    """
+    return await _run(executor, load_report, report_path, source_path, kernel_id)
+
+
+async def render_dot_async(hw_tree: Node, dot_graph_name: str, output_dir: str | None = DEFAULT_OUTPUT_DIR,
+                           unique_output: bool = False,
+                           executor: concurrent.futures.Executor | None = None) -> dot_graph.Rendering:
+    """
+    Render the decision tree in memory and save it like drgpu_launch.render, without blocking the
+    event loop.
+    Args:
+        hw_tree: The decision tree root node.
+        dot_graph_name: The name of the dot graph.
+        output_dir: Directory of the dot graph, None keeps it in memory only.
+        unique_output: Add a number to the name if the file exists (optional).
+        executor: Executor running `dot` and the writes (optional, default is the loop's executor).
+    Returns:
+        The rendering with the dot source, the SVG and the paths they were saved to.
+    """
+    rendering = await _run(executor, dot_graph.render_tree, hw_tree, dot_graph_name)
+    if output_dir is not None:
+        # the paths are set on the copy returned by a process pool
+        rendering = await _run(executor, save_rendering, rendering, output_dir, unique_output)
+    return rendering
+
+
+async def launch_async(report: Report, config: Configuration, memory_metrics: Memory_Metrics | None = None,
+                       output: str | None = None, save_dot: bool = True,
+                       executor: concurrent.futures.Executor | None = None,
+                       output_dir: str = DEFAULT_OUTPUT_DIR, unique_output: bool = False) -> Node:
+    """
+    Launch DrGPU without blocking the event loop, see drgpu_launch.launch.
+    Args:
+        report: The report data structure populated with report content.
+        config: Parsed GPU configuration data.
+        memory_metrics: The memory metrics object to update (optional). It is not updated when the
+            executor runs in other processes.
+        output: Name of the output decision tree file (dot graph name).
+        save_dot: Whether to save the dot graph (optional, default is True).
+        executor: Executor of the analysis stages (optional, default is the loop's executor).
+        output_dir: Directory of the dot graph (optional, default is dots).
+        unique_output: Add a number to the output name if the file exists, so concurrent launches
+            with the same output never overwrite each other (optional).
+    Returns:
+        The decision tree root node.
+    """
+    hw_tree = await _run(executor, launch, report, config, memory_metrics, output, save_dot=False)
+    if save_dot:
+        await render_dot_async(hw_tree, default_dot_graph_name(report, output), output_dir, unique_output,
+                               executor)
+    return hw_tree
+
+
+async def launch_many_async(reports: Sequence[Report], config: Configuration,
+                            outputs: Sequence[str | None] | None = None, save_dot: bool = True,
+                            executor: concurrent.futures.Executor | None = None,
+                            concurrency: int = DEFAULT_CONCURRENCY, output_dir: str = DEFAULT_OUTPUT_DIR,
+                            unique_output: bool = False) -> List[Node]:
+    """
+    Analyze several reports, at most `concurrency` at the same time.
+    Args:
+        reports: The reports to analyze.
+        config: Parsed GPU configuration data used for all reports.
+        outputs: Dot graph name of every report (optional).
+        save_dot: Whether to save the dot graphs (optional, default is True).
+        executor: Executor of the analysis stages (optional, default is the loop's executor).
+        concurrency: Maximum number of reports in flight.
+        output_dir: Directory of the dot graphs (optional, default is dots).
+        unique_output: Add a number to an output name if the file exists (optional).
+    Returns:
+        The decision tree root nodes in the order of the reports. If one analysis fails, the
+        others are cancelled and the error is raised.
+    """
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be at least 1, got {concurrency}")
+    if outputs is None:
+        outputs = [None] * len(reports)
+    elif len(outputs) != len(reports):
+        raise ValueError(f"Got {len(outputs)} outputs for {len(reports)} reports")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(report, output):
+        async with semaphore:
+            return await launch_async(report, config, output=output, save_dot=save_dot, executor=executor,
+                                      output_dir=output_dir, unique_output=unique_output)
+
+    try:
+        async with asyncio.TaskGroup() as group:
+            tasks = [group.create_task(limited(report, output)) for report, output in zip(reports, outputs)]
+    except ExceptionGroup as errors:
+        # re-raise the first failure like a synchronous loop over launch would
+        raise errors.exceptions[0]
+    return [task.result() for task in tasks]
@@ -0,0 +1,169 @@
+"""
+Group the kernels of a large report by their stall signature and analyze one kernel per group.
+
+Every kernel gets a feature vector of its idle share, the share of every warp_cant_issue stall
+among its stalls, its pipe utilizations and the memory model outputs (utilization of the
+bottleneck unit, share of every level in the load latency). All features are between 0 and 1,
+so they are compared without scaling; the modeled utilization, which exceeds 1 when the unit is
+saturated, is clipped to 1. The vectors are clustered with k-means (k-means++
+seeding, several restarts) in NumPy, and the medoid of every cluster, the member with the
+smallest summed distance to the other members, stands for it. Only the medoids are analyzed and
+rendered; the table of members lists every kernel with its distance from its medoid.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from drgpu import app_tree
+from drgpu import read_reports
+from drgpu import trace
+from drgpu import unit_hunt
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CLUSTERS = 8
+DEFAULT_RESTARTS = 4
+MAX_ITERATIONS = 100
+# rows of the distance matrix computed at once for the medoids
+BLOCK_ROWS = 1024
+
+
+def kernel_features(raw_counters, config, units_row=True):
+    """
+    The feature matrix of all kernels of a raw page.
+    @arg raw_counters: pandas DataFrame or pyarrow Table of the raw page.
+    @return: the kernels x features matrix, the feature names and the kernel names.
+    """
+    columns, kernel_names = app_tree.app_columns(raw_counters, units_row)
+    kernels = len(kernel_names)
+    features = {}
+    retire_ipc = columns.get('retireIPC', np.zeros(kernels))
+    features['idle'] = np.clip(1 - retire_ipc / config.quadrants_per_SM, 0, 1)
+    stall_names = [name for name in app_tree.STALL_NAMES if name in columns]
+    if stall_names:
+        stalls = np.column_stack([columns[name] for name in stall_names])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shares = np.nan_to_num(stalls / stalls.sum(axis=1, keepdims=True))
+        features.update(zip(stall_names, shares.T))
+    for name in app_tree.PIPE_NAMES:
+        if name in columns:
+            features[name] = columns[name] / 100
+    try:
+        model = unit_hunt.memory_model(read_reports.memory_model_columns_ncu(raw_counters, units_row), config)
+    except ValueError as e:
+        logger.warning("Clustering without memory model features: %s", e)
+        model = None
+    if model is not None:
+        # above 1 the unit is saturated, larger values would outweigh all other features
+        features['bottleneck_util_rate'] = np.clip(np.nan_to_num(model['util_rate']), 0, 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for level in unit_hunt.LATENCY_LEVELS:
+                features[level + '_latency_share'] = np.nan_to_num(model[level + '_latency'] / model['total_latency'])
+    names = list(features)
+    matrix = np.column_stack([np.broadcast_to(features[name], (kernels,)) for name in names]).astype(float)
+    return matrix, names, kernel_names
+
+
+def squared_distances(points, centers):
+    """points x centers matrix of squared Euclidean distances."""
+    distances = (points ** 2).sum(axis=1)[:, None] - 2 * points @ centers.T + (centers ** 2).sum(axis=1)[None, :]
+    return np.maximum(distances, 0)
+
+
+def kmeans_plus_plus(points, k, rng):
+    centers = [points[rng.integers(len(points))]]
+    closest = squared_distances(points, np.array(centers))[:, 0]
+    for _ in range(1, k):
+        total = closest.sum()
+        if total <= 0:
+            # fewer distinct points than clusters
+            break
+        centers.append(points[rng.choice(len(points), p=closest / total)])
+        closest = np.minimum(closest, squared_distances(points, centers[-1][None, :])[:, 0])
+    return np.array(centers)
+
+
+def kmeans(points, k, seed=0, restarts=DEFAULT_RESTARTS, max_iterations=MAX_ITERATIONS):
+    """
+    Lloyd's k-means, the best of several k-means++ seeded runs.
+    @return: the cluster of every point (numbered by size, largest first) and the centers.
+    """
+    if len(points) == 0:
+        return np.zeros(0, dtype=int), np.zeros((0, points.shape[1]))
+    k = min(k, len(points))
+    rng = np.random.default_rng(seed)
+    best = None
+    for _ in range(restarts):
+        centers = kmeans_plus_plus(points, k, rng)
+        labels = None
+        for _ in range(max_iterations):
+            distances = squared_distances(points, centers)
+            new_labels = distances.argmin(axis=1)
+            if labels is not None and np.array_equal(labels, new_labels):
+                break
+            labels = new_labels
+            counts = np.bincount(labels, minlength=len(centers))
+            sums = np.zeros_like(centers)
+            np.add.at(sums, labels, points)
+            nonempty = counts > 0
+            centers = sums[nonempty] / counts[nonempty, None]
+            if not nonempty.all():
+                # drop empty clusters and renumber
+                labels = squared_distances(points, centers).argmin(axis=1)
+        inertia = squared_distances(points, centers)[np.arange(len(points)), labels].sum()
+        if best is None or inertia < best[0]:
+            best = (inertia, labels, centers)
+    _, labels, centers = best
+    order = np.argsort(-np.bincount(labels, minlength=len(centers)), kind='stable')
+    renumber = np.empty_like(order)
+    renumber[order] = np.arange(len(order))
+    return renumber[labels], centers[order]
+
+
+def medoids(points, labels):
+    """The medoid of every cluster: the member with the smallest summed distance to all members."""
+    result = []
+    for cluster in range(labels.max() + 1 if len(labels) else 0):
+        members = np.flatnonzero(labels == cluster)
+        member_points = points[members]
+        summed = np.zeros(len(members))
+        for start in range(0, len(members), BLOCK_ROWS):
+            block = member_points[start:start + BLOCK_ROWS]
+            summed[start:start + BLOCK_ROWS] = np.sqrt(squared_distances(block, member_points)).sum(axis=1)
+        result.append(members[summed.argmin()])
+    return np.array(result, dtype=int)
+
+
+def cluster_kernels(raw_counters, config, clusters=DEFAULT_CLUSTERS, units_row=True, seed=0):
+    """
+    Cluster all kernels of a raw page.
+    @return: the member table (kernel_id, kernel_name, cluster, medoid, distance from the
+    medoid) and the medoid kernel ids, the medoid of cluster N at index N.
+    """
+    with trace.span("cluster"):
+        features, names, kernel_names = kernel_features(raw_counters, config, units_row)
+        logger.debug("Clustering %d kernels on %s", len(features), ", ".join(names))
+        labels, _ = kmeans(features, clusters, seed)
+        medoid_ids = medoids(features, labels)
+        member_medoids = medoid_ids[labels] if len(labels) else np.zeros(0, dtype=int)
+        distances = np.sqrt(((features - features[member_medoids]) ** 2).sum(axis=1))
+    members = pd.DataFrame({
+        'kernel_id': np.arange(len(features)),
+        'kernel_name': kernel_names,
+        'cluster': labels,
+        'medoid': member_medoids,
+        'distance': distances,
+    })
+    return members, medoid_ids
+
+
+def format_clusters(members):
+    """One line per cluster of the member table: size, medoid and the largest distance of a member."""
+    lines = []
+    for cluster, cluster_members in members.groupby('cluster', sort=True):
+        medoid = cluster_members['medoid'].iloc[0]
+        lines.append("cluster %d: %d kernels, medoid #%d %s, max distance %.3f" % (
+            cluster, len(cluster_members), medoid, members['kernel_name'].iloc[medoid],
+            cluster_members['distance'].max()))
+    return "\n".join(lines)
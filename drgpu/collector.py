@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Profile a suite of applications with Nsight Compute and analyze every report with DrGPU.
+
+This replaces looping over drgpu_collector.sh by hand. The manifest is a JSON file like
+    {
+        "output_dir": "reports",
+        "jobs": [
+            {"name": "btree", "executable": "./b+tree.out",
+             "args": ["file", "../data/mil.txt"], "kernels": ["findRangeK"]}
+        ]
+    }
+Every (job, kernel filter) pair becomes one profiling task. Profiling, CSV export and DrGPU
+analysis run on separate bounded pools, so the export of a finished task overlaps with
+profiling the next one and the analysis starts as soon as its CSV is written.
+"""
+import argparse
+import concurrent.futures
+import json
+import logging
+import os
+import subprocess
+from pathlib import Path
+from typing import List
+
+from drgpu import serialize
+from drgpu import trace
+
+logger = logging.getLogger(__name__)
+
+# Same metric set as drgpu_collector.sh
+NCU_METRICS = ",".join([
+    r"regex:sm__inst_executed_pipe_[^.]*.avg.pct_of_peak_sustained_active$",
+    r"regex:sm__sass_thread_inst_executed_op.*sum$",
+    r"regex:l1tex__t_set_.*_pipe_lsu_mem_global_op_ld.sum$",
+    r"regex:l1tex__t_set_accesses.sum$",
+    r"regex:l1tex__t_requests.sum$",
+    r"regex:l1tex__m_xbar2l1tex_read_sectors.sum$",
+    r"sm__average_thread_inst_executed_pred_on_per_inst_executed_realtime",
+    r"regex:sm__sass_inst_executed.*sum$",
+    r"regex:sm__inst_issued.avg.per_cycle_active$",
+    r"regex:.*throughput.avg.pct_of_peak_sustained_active$",
+    r"regex:.*throughput.avg.pct_of_peak_sustained_elapsed$",
+])
+
+
+class CollectTask:
+    """One profiled kernel of one application in the manifest."""
+
+    def __init__(self, name, executable, args=None, kernel=None, cwd=None):
+        self.name = name
+        self.executable = executable
+        self.args = args or []
+        self.kernel = kernel
+        self.cwd = cwd
+        # report path without the .ncu-rep suffix, set by the collector
+        self.report_base = None
+        self.csv_path = None
+        self.tree = None
+        self.error = None
+
+    @property
+    def output_name(self):
+        if self.kernel:
+            return "%s_%s" % (self.name, self.kernel)
+        return self.name
+
+
+def load_manifest(manifest_path: Path):
+    """
+    Read the manifest and expand it into profiling tasks.
+    Args:
+        manifest_path: Path to the JSON manifest.
+    Returns:
+        The output directory of the manifest and the list of tasks.
+    """
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+    base_dir = manifest_path.parent
+    output_dir = base_dir / manifest.get('output_dir', 'reports')
+    tasks = []
+    for job in manifest['jobs']:
+        executable = job['executable']
+        name = job.get('name', os.path.basename(executable))
+        cwd = job.get('cwd')
+        if cwd is not None:
+            cwd = str(base_dir / cwd)
+        kernels = job.get('kernels') or [None]
+        for kernel in kernels:
+            tasks.append(CollectTask(name, executable, job.get('args', []), kernel, cwd))
+    return output_dir, tasks
+
+
+def profile_command(ncu: str, task: CollectTask) -> List[str]:
+    command = [ncu, '-f', '--target-processes', 'all', '-c', '1', '--export', task.report_base,
+               '--import-source=yes']
+    if task.kernel:
+        command += ['--kernel-name', task.kernel]
+    command += ['--metrics', NCU_METRICS, '--page', 'raw', '--set', 'full', task.executable]
+    return command + list(task.args)
+
+
+def export_command(ncu: str, task: CollectTask) -> List[str]:
+    return [ncu, '--csv', '--page', 'raw', '-i', task.report_base + '.ncu-rep']
+
+
+def run_profile(ncu: str, task: CollectTask):
+    logger.info("Profile %s", task.output_name)
+    with trace.span("profile", task=task.output_name):
+        subprocess.run(profile_command(ncu, task), cwd=task.cwd, check=True,
+                       stdout=subprocess.DEVNULL)
+    return task
+
+
+def run_export(ncu: str, task: CollectTask):
+    logger.info("Export %s", task.output_name)
+    csv_path = task.report_base + '.csv'
+    with open(csv_path, 'w', encoding='utf-8') as fout, trace.span("export", task=task.output_name):
+        subprocess.run(export_command(ncu, task), check=True, stdout=fout)
+    task.csv_path = csv_path
+    return task
+
+
+def run_analysis(csv_path: str, memory_config: str | None, output: str, save_dot: bool,
+                 trace_enabled: bool = False):
+    """
+    Analyze one exported report. Runs in a worker process.
+    Returns:
+        The decision tree in the format of drgpu.serialize, which is smaller and faster to pass
+        back than a pickled tree, and the trace events recorded in the worker.
+    """
+    # imported here so that profiling-only runs don't pay for pandas
+    from drgpu.drgpu_launch import launch, load_report, load_config
+    if trace_enabled:
+        # start empty, forked workers inherit the events of the parent
+        trace.disable()
+        trace.enable()
+    with trace.span("worker", report=csv_path):
+        report = load_report(Path(csv_path))
+        config = load_config(memory_config)
+        tree = launch(report, config, output=output, save_dot=save_dot)
+    return serialize.dumps(tree), trace.drain()
+
+
+def collect(tasks: List[CollectTask], output_dir: Path, ncu: str = 'ncu', profile_workers: int = 1,
+            export_workers: int = 2, analysis_workers: int | None = None, memory_config: str | None = None,
+            analyze: bool = True, save_dot: bool = True) -> List[CollectTask]:
+    """
+    Profile, export and analyze all tasks.
+    Args:
+        tasks: The tasks from the manifest.
+        output_dir: Directory of the .ncu-rep and .csv files.
+        ncu: The ncu executable.
+        profile_workers: Number of concurrently profiled applications. Keep 1 unless every
+            application gets its own GPU.
+        export_workers: Number of concurrent CSV exports.
+        analysis_workers: Number of DrGPU worker processes (default is the number of CPUs).
+        memory_config: The memory config used for all analyses.
+        analyze: Whether to run DrGPU on the exported reports.
+        save_dot: Whether to save the dot graphs of the analyses.
+    Returns:
+        The tasks with csv_path, tree or error filled in.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for task in tasks:
+        task.report_base = str((output_dir / task.output_name).absolute())
+    with concurrent.futures.ThreadPoolExecutor(profile_workers) as profile_pool, \
+            concurrent.futures.ThreadPoolExecutor(export_workers) as export_pool, \
+            concurrent.futures.ProcessPoolExecutor(analysis_workers) as analysis_pool:
+        pending = {}
+        for task in tasks:
+            pending[profile_pool.submit(run_profile, ncu, task)] = ('profile', task)
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                stage, task = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:  # keep going with the rest of the suite
+                    logger.error("%s of %s failed: %s", stage, task.output_name, e)
+                    task.error = "%s: %s" % (stage, e)
+                    continue
+                if stage == 'profile':
+                    pending[export_pool.submit(run_export, ncu, task)] = ('export', task)
+                elif stage == 'export' and analyze:
+                    pending[analysis_pool.submit(run_analysis, task.csv_path, memory_config,
+                                                 task.output_name, save_dot,
+                                                 trace.is_enabled())] = ('analysis', task)
+                elif stage == 'analysis':
+                    payload, events = result
+                    task.tree = serialize.loads(payload).tree()
+                    trace.extend(events)
+                    logger.info("Analyzed %s", task.output_name)
+    return tasks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('manifest', metavar='MANIFEST', help='JSON manifest of the applications to profile.')
+    parser.add_argument('--ncu', default='ncu', help='ncu executable, e.g. test/ncu_stub.py without a GPU.')
+    parser.add_argument('-c', '--memoryconfig', metavar='PATH',
+                        help='absolute path to the memory config or a file name in mem_config')
+    parser.add_argument('-j', '--profile-workers', type=int, default=1,
+                        help='number of applications profiled at the same time.')
+    parser.add_argument('--export-workers', type=int, default=2, help='number of concurrent CSV exports.')
+    parser.add_argument('--analysis-workers', type=int, default=None, help='number of DrGPU processes.')
+    parser.add_argument('--no-analysis', action='store_true', help='only profile and export.')
+    parser.add_argument('--no-dot', action='store_true', help="don't save the decision tree graphs.")
+    parser.add_argument('--trace', metavar='FILE',
+                        help='write a Chrome trace-event JSON of all jobs and workers to FILE.')
+    parser.add_argument('-l', '--log-level', metavar='LEVEL', default='INFO',
+                        help='log level (DEBUG, INFO, WARNING, ERROR, CRITICAL).')
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level)
+
+    output_dir, tasks = load_manifest(Path(args.manifest))
+    if args.trace:
+        trace.enable()
+    try:
+        collect(tasks, output_dir, ncu=args.ncu, profile_workers=args.profile_workers,
+                export_workers=args.export_workers, analysis_workers=args.analysis_workers,
+                memory_config=args.memoryconfig, analyze=not args.no_analysis, save_dot=not args.no_dot)
+    finally:
+        if args.trace:
+            trace.write(args.trace)
+    failed = [task for task in tasks if task.error]
+    for task in failed:
+        logger.error("%s: %s", task.output_name, task.error)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
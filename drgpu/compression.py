@@ -0,0 +1,192 @@
+"""
+Transparent reading of compressed reports.
+
+Archived ncu exports are often stored as .csv.gz, .csv.zst or .csv.xz. The compression is
+detected from the magic bytes, not the file name, and the file is decompressed as a stream into
+the parser without a temporary file. A multi-threaded command line decompressor (pigz, zstd, xz
+-T0) is used when it is installed, otherwise the standard library or the optional zstandard
+package.
+"""
+import contextlib
+import io
+import logging
+import shutil
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+MAGIC_BYTES = {
+    'gzip': b'\x1f\x8b',
+    'zstd': b'\x28\xb5\x2f\xfd',
+    'xz': b'\xfd7zXZ\x00',
+}
+SUFFIXES = {'gzip': '.gz', 'zstd': '.zst', 'xz': '.xz'}
+# (executable, arguments) of the command line decompressors, fastest first
+DECOMPRESS_COMMANDS = {
+    'gzip': [('pigz', ['-dc']), ('gzip', ['-dc'])],
+    'zstd': [('zstd', ['-dc', '-q', '-T0'])],
+    'xz': [('xz', ['-dc', '-T0'])],
+}
+
+
+def detect_compression(path):
+    """The compression of the file from its magic bytes, None for plain files."""
+    with open(path, 'rb') as fin:
+        head = fin.read(max(len(magic) for magic in MAGIC_BYTES.values()))
+    for compression, magic in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def strip_suffix(name):
+    """The file name without a compression suffix, e.g. report.csv for report.csv.zst."""
+    for suffix in SUFFIXES.values():
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def decompress_command(compression, path):
+    for executable, arguments in DECOMPRESS_COMMANDS[compression]:
+        executable_path = shutil.which(executable)
+        if executable_path:
+            return [executable_path] + arguments + [str(path)]
+    return None
+
+
+# bytes of the compressed file decompressed at a time by _ZstdReader
+READ_SIZE = 1 << 20
+
+
+class _ZstdReader(io.RawIOBase):
+    """
+    Decompress the zstd frames of a file with the zstandard package. Its stream_reader returns
+    the decompressed part of a truncated frame without an error, so the end of every frame is
+    checked here.
+    """
+
+    def __init__(self, zstandard, path):
+        self.zstandard = zstandard
+        self.path = path
+        self.file = open(path, 'rb')
+        self.decompressor = zstandard.ZstdDecompressor().decompressobj()
+        self.pending = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending:
+            if self.decompressor.eof:
+                # concatenated frames, e.g. of pzstd
+                data = self.decompressor.unused_data or self.file.read(READ_SIZE)
+                if not data:
+                    return 0
+                self.decompressor = self.zstandard.ZstdDecompressor().decompressobj()
+            else:
+                data = self.file.read(READ_SIZE)
+                if not data:
+                    raise ValueError(f"Decompressing {self.path} failed: the file is truncated")
+            self.pending = memoryview(self.decompressor.decompress(data))
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+
+def _open_library(compression, path):
+    if compression == 'gzip':
+        import gzip
+        return gzip.open(path, 'rb')
+    if compression == 'xz':
+        import lzma
+        return lzma.open(path, 'rb')
+    try:
+        # optional dependency, only needed for .zst reports without the zstd executable
+        import zstandard
+    except ImportError:
+        raise ValueError(f"{path} is zstd compressed, install zstd or the zstandard package to read it")
+    return io.BufferedReader(_ZstdReader(zstandard, path))
+
+
+def _library_errors(compression):
+    """The exceptions of the library decompressors on a truncated or corrupt file."""
+    if compression == 'gzip':
+        import gzip
+        import zlib
+        return EOFError, gzip.BadGzipFile, zlib.error
+    if compression == 'xz':
+        import lzma
+        return EOFError, lzma.LZMAError
+    try:
+        import zstandard
+    except ImportError:
+        return ()
+    return zstandard.ZstdError,
+
+
+@contextlib.contextmanager
+def _process_stream(command, path):
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        yield process.stdout
+    finally:
+        if process.stdout.read(1) != b'':
+            # the reader stopped early or failed, the decompressor would block on the full pipe
+            process.kill()
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.stderr.close()
+        returncode = process.wait()
+        # a negative code is the kill above. A decompressor failing on a truncated or corrupt file
+        # is reported even when the reader failed on its output first.
+        if returncode > 0:
+            raise ValueError(f"Decompressing {path} failed: {stderr.decode(errors='replace').strip()}")
+
+
+@contextlib.contextmanager
+def open_binary(path):
+    """Open a report as a binary stream of its decompressed content."""
+    compression = detect_compression(path)
+    if compression is None:
+        with open(path, 'rb') as fin:
+            yield fin
+        return
+    command = decompress_command(compression, path)
+    if command is not None:
+        logger.debug("Decompress %s with %s", path, command[0])
+        with _process_stream(command, path) as stream:
+            yield stream
+    else:
+        try:
+            with _open_library(compression, path) as stream:
+                yield stream
+        except _library_errors(compression) as e:
+            raise ValueError(f"Decompressing {path} failed: {e}") from e
+
+
+@contextlib.contextmanager
+def open_text(path, encoding='utf-8'):
+    """Open a report as a text stream of its decompressed content."""
+    with open_binary(path) as stream:
+        text = io.TextIOWrapper(stream, encoding=encoding, newline='')
+        try:
+            yield text
+        finally:
+            # leave closing the binary stream to open_binary
+            text.detach()
+
+
+def read_text(path, encoding='utf-8'):
+    """The decompressed content of a report."""
+    with open_binary(path) as stream:
+        # universal newlines like Path.read_text
+        text = io.TextIOWrapper(stream, encoding=encoding)
+        content = text.read()
+        text.detach()
+        return content
@@ -133,3 +133,23 @@ counters_name_map_for_ncu = {
     "kernel_name": ("Kernel Name", str),
 
 }
+
+# raw counters read by read_reports.fill_missing_counters_ncu in addition to the ones above
+extra_counters_for_ncu = [
+    "sm__sass_inst_executed_op_memory_8b.sum",
+    "sm__sass_inst_executed_op_memory_16b.sum",
+    "sm__sass_inst_executed_op_shared_ld.sum",
+    "sm__sass_inst_executed_op_shared_st.sum",
+    "sm__sass_inst_executed_op_global_ld.sum",
+    "sm__sass_inst_executed_op_global_st.sum",
+]
+
+
+def required_ncu_columns():
+    """All columns of an ncu raw page that DrGPU reads."""
+    columns = []
+    for cname_in_ncu, _ in counters_name_map_for_ncu.values():
+        if cname_in_ncu and cname_in_ncu not in columns:
+            columns.append(cname_in_ncu)
+    columns += [cname_in_ncu for cname_in_ncu in extra_counters_for_ncu if cname_in_ncu not in columns]
+    return columns
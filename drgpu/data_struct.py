@@ -5,7 +5,9 @@ import re
 
 class Report:
     def __init__(self, path='', source_report_path=None, kernel_id=0,
-                 report_content=None, source_report_content=None):
+                 report_content=None, source_report_content=None,
+                 partial_report_paths=None, partial_report_contents=None, on_conflict='error',
+                 raw_counters=None, raw_counters_units_row=True, source_summary_size=None):
         self.path = path
         self.source_report_path = source_report_path
         # {unit_name: Unit, }
@@ -15,6 +17,20 @@ class Report:
         # Raw contents of the reports when data is provided in-memory
         self.report_content = report_content
         self.source_report_content = source_report_content
+        # Raw pages of further ncu runs of the same application. Their counters are merged
+        # into the main report by kernel ID, name and launch index.
+        self.partial_report_paths = partial_report_paths or []
+        self.partial_report_contents = partial_report_contents
+        # 'error' or 'first', see read_reports.merge_reports_ncu
+        self.on_conflict = on_conflict
+        # Already parsed raw page as a pandas DataFrame or pyarrow Table. It is used instead of
+        # report_content and partial reports. raw_counters_units_row tells whether its first row
+        # holds the counter units like the ncu CSV.
+        self.raw_counters = raw_counters
+        self.raw_counters_units_row = raw_counters_units_row
+        # Instructions kept per stall reason when the source report is streamed into a
+        # heavy hitters summary, see read_reports.fill_source_report_summary. None keeps all.
+        self.source_summary_size = source_summary_size
 
 
 class Analysis:
@@ -23,8 +39,22 @@ class Analysis:
         self.all_stats = {}
         # {stall_reason: {inst line number: count, }, }
         self.stall_sass_code = {}
-        # [None, inst1, inst2, ]
+        # [None, inst1, inst2, ], {inst line number: inst, } of a summarized source report
         self.source_lines = []
+        # of a summarized source report: {stall_reason: count of all instructions, } and
+        # {stall_reason: {inst line number: largest overestimate of the count, }, }
+        self.stall_sass_totals = {}
+        self.stall_sass_errors = {}
+        # per-branch stats derived by drgpu_launch.hunt_units, {stat_name: Stat, }
+        self.stall_stats = {}
+        self.pipe_stats = {}
+        self.instruction_stats = {}
+        self.dispatch_stats = {}
+        self.latency_stats = {}
+        self.shared_mem_stats = {}
+        # memory throughput bottleneck: l1, utlb, l1tlb, l2 or fb
+        self.bottleneck_unit = None
+        self.bottleneck_stats = {}
 
 
 class Unit:
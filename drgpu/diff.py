@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Compare the DrGPU analyses of two reports, e.g. before and after an optimization.
+
+    python -m drgpu.diff old.csv new.csv -c a100 [-o NAME] [--json FILE] [--markdown FILE]
+
+Kernels are matched by name, the n-th launch of a kernel in the old report with its n-th launch
+in the new one. The trees of a kernel pair are aligned by the path of node names from the root,
+through dicts keyed on the paths, so nothing is compared pairwise. For every kernel the diff
+lists the nodes whose share changed, appeared or disappeared, the suggestions which appeared or
+disappeared and a change of the memory bottleneck unit. It is printed as Markdown, optionally
+saved as JSON, and drawn as one tree per kernel (dots/NAME_diff_N.svg, see --output-dir) with the
+changes colored, including the suggestions which appeared or disappeared.
+"""
+import argparse
+import json
+import logging
+from pathlib import Path
+
+from drgpu import counters
+from drgpu import read_reports
+from drgpu.data_struct import Memory_Metrics, Report
+from drgpu.node import Node, NORMAL_TREE_NODE, LATENCY_NODE, SUGGESTION_NODE, SHOW_AS_PERCENTAGE
+
+logger = logging.getLogger(__name__)
+
+# smaller changes of a node's share are reported as unchanged
+DEFAULT_MIN_DELTA = 0.005
+STATUS_COLORS = {
+    'increased': 'lightpink',
+    'decreased': 'palegreen',
+    'added': 'lightskyblue',
+    'removed': 'gray85',
+    'unchanged': 'lightgrey',
+}
+# node types whose shares are compared, suggestions and source code are compared by text
+COMPARED_TYPES = (NORMAL_TREE_NODE, LATENCY_NODE)
+
+
+def kernel_keys(raw_counters, units_row=True):
+    """(kernel name, launch of this name) of every kernel of a raw page."""
+    kernel_name_column = counters.counters_name_map_for_ncu['kernel_name'][0]
+    if hasattr(raw_counters, 'column_names'):
+        names = raw_counters.column(kernel_name_column).to_pylist()
+    else:
+        names = raw_counters[kernel_name_column].tolist()
+    if units_row:
+        names = names[1:]
+    launches = {}
+    keys = []
+    for name in names:
+        launches[name] = launches.get(name, -1) + 1
+        keys.append((name, launches[name]))
+    return keys
+
+
+def match_kernels(old_keys, new_keys):
+    """
+    Pairs (old kernel id, new kernel id) of the kernels with the same key, in the order of the
+    new report, and the keys found in only one report.
+    """
+    old_ids = {key: kernel_id for kernel_id, key in enumerate(old_keys)}
+    pairs = [(old_ids[key], kernel_id) for kernel_id, key in enumerate(new_keys) if key in old_ids]
+    new_set = set(new_keys)
+    only_old = [key for key in old_keys if key not in new_set]
+    only_new = [key for key in new_keys if key not in old_ids]
+    return pairs, only_old, only_new
+
+
+def node_index(hw_tree):
+    """{path of node names from the root: node} of the compared nodes of a tree, in preorder."""
+    index = {}
+    stack = [((hw_tree.name,), hw_tree)]
+    while stack:
+        path, node = stack.pop()
+        # the first of several siblings with the same name wins, like in the rendered graph
+        index.setdefault(path, node)
+        for child in reversed(node.child):
+            if child.type in COMPARED_TYPES:
+                stack.append((path + (child.name,), child))
+    return index
+
+
+def suggestion_texts(hw_tree):
+    """The (stall node name, suggestion text) pairs of a tree."""
+    return [(suggestion.data.name if suggestion.data is not None else None,
+             suggestion.suggestion.get_label(linewidth=None).replace("\\n", " "))
+            for suggestion in hw_tree.get_tree_suggestions()]
+
+
+def _share(node):
+    return float(node.percentage) if isinstance(node.percentage, (int, float)) else None
+
+
+def node_status(old, new, min_delta):
+    if old is None:
+        return 'added'
+    if new is None:
+        return 'removed'
+    if _share(old) is None or _share(new) is None or abs(_share(new) - _share(old)) < min_delta:
+        return 'unchanged'
+    return 'increased' if _share(new) > _share(old) else 'decreased'
+
+
+def diff_trees(old_tree, new_tree, min_delta=DEFAULT_MIN_DELTA):
+    """
+    Align two trees by node path.
+    @return: one dict per node of either tree (path, name, old and new share or value, delta,
+    whether it is a share, status), in the preorder of the new tree followed by the removed nodes.
+    """
+    old_index = node_index(old_tree)
+    new_index = node_index(new_tree)
+    paths = list(new_index) + [path for path in old_index if path not in new_index]
+    nodes = []
+    for path in paths:
+        old = old_index.get(path)
+        new = new_index.get(path)
+        old_share = _share(old) if old is not None else None
+        new_share = _share(new) if new is not None else None
+        nodes.append({
+            'path': "/".join(path),
+            'name': path[-1],
+            'old': old_share,
+            'new': new_share,
+            'delta': new_share - old_share if old_share is not None and new_share is not None else None,
+            'percentage': _is_percentage(new if new is not None else old),
+            'status': node_status(old, new, min_delta),
+        })
+    return nodes
+
+
+def diff_kernel(old_tree, new_tree, old_memory_metrics, new_memory_metrics, min_delta=DEFAULT_MIN_DELTA):
+    """The diff of one kernel: nodes, suggestions and bottleneck unit."""
+    old_suggestions = suggestion_texts(old_tree)
+    new_suggestions = suggestion_texts(new_tree)
+    old_set = set(old_suggestions)
+    new_set = set(new_suggestions)
+    return {
+        'nodes': diff_trees(old_tree, new_tree, min_delta),
+        'suggestions': {
+            'appeared': [{'stall': stall, 'text': text} for stall, text in new_suggestions if (stall, text) not in old_set],
+            'disappeared': [{'stall': stall, 'text': text} for stall, text in old_suggestions
+                            if (stall, text) not in new_set],
+        },
+        'bottleneck': {'old': old_memory_metrics.bottleneck, 'new': new_memory_metrics.bottleneck},
+    }
+
+
+def node_suggestions(node):
+    """{text: suggestion node} of the suggestions attached to a node, empty for None."""
+    if node is None:
+        return {}
+    return {child.get_label(linewidth=None): child for child in node.child if child.type == SUGGESTION_NODE}
+
+
+def diff_tree(old_tree, new_tree, nodes):
+    """
+    One tree of the nodes of both trees, colored by status (STATUS_COLORS), with the old share
+    and the delta in the label. The suggestions which appeared or disappeared are attached to
+    their node as added or removed; unchanged suggestions are left out.
+    """
+    by_path = {node['path']: node for node in nodes}
+    old_index = node_index(old_tree)
+    new_index = node_index(new_tree)
+    built = {}
+    for path in list(new_index) + [path for path in old_index if path not in new_index]:
+        source = new_index.get(path) or old_index[path]
+        node = Node(source.name, source.type)
+        node.percentage = source.percentage
+        node.show_percentage_or_value = source.show_percentage_or_value
+        node.prefix_label = source.prefix_label
+        node.suffix_label = source.suffix_label
+        entry = by_path["/".join(path)]
+        node.color = STATUS_COLORS[entry['status']]
+        if entry['status'] == 'removed':
+            node.suffix_label += r"\n(removed)"
+        elif entry['status'] == 'added':
+            node.suffix_label += r"\n(new)"
+        elif entry['delta'] is not None and entry['status'] != 'unchanged':
+            node.suffix_label += r"\n(was %s, %+.2f%s)" % (_format_share(source, entry['old']),
+                                                         _delta_scale(source) * entry['delta'],
+                                                         '%' if _is_percentage(source) else '')
+        built[path] = node
+        if len(path) > 1:
+            built[path[:-1]].child.append(node)
+    for path, node in built.items():
+        old_suggestions = node_suggestions(old_index.get(path))
+        new_suggestions = node_suggestions(new_index.get(path))
+        for status, suggestions, others, marker in (('added', new_suggestions, old_suggestions, "(new) "),
+                                                    ('removed', old_suggestions, new_suggestions, "(removed) ")):
+            for text, source in suggestions.items():
+                if text in others:
+                    continue
+                suggestion = Node("suggestion_for_%s_%d" % (node.name, len(node.child)), SUGGESTION_NODE)
+                suggestion.suffix_label = marker + source.suffix_label
+                suggestion.color = STATUS_COLORS[status]
+                node.child.append(suggestion)
+    # the root of the new tree
+    return next(iter(built.values()))
+
+
+def _is_percentage(node):
+    return node.show_percentage_or_value == SHOW_AS_PERCENTAGE
+
+
+def _delta_scale(node):
+    return 100 if _is_percentage(node) else 1
+
+
+def _format_share(node, share):
+    return "%.2f%%" % (100 * share) if _is_percentage(node) else "%.2f" % share
+
+
+def kernel_name_label(key):
+    name, launch = key
+    return "%s (launch %d)" % (read_reports.get_kernel_name(name), launch) if launch else \
+        read_reports.get_kernel_name(name)
+
+
+def analyze_reports(old_report, new_report, config, kernel_id=None):
+    """
+    Analyze the matched kernels of both reports.
+    @arg kernel_id: only compare this kernel of the new report with its match, all by default.
+    @return: the kernel pairs as (key, old kernel id, new kernel id, old tree, new tree, old and
+    new Memory_Metrics), the keys found only in the old and only in the new report.
+    """
+    # imported here so that diffs of given trees don't need the whole analysis
+    from drgpu.drgpu_launch import launch_batch
+    raw = {}
+    keys = {}
+    for side, report in (('old', old_report), ('new', new_report)):
+        raw[side] = read_reports.fill_report_ncu(report)
+        keys[side] = kernel_keys(raw[side], getattr(report, 'raw_counters_units_row', True))
+    pairs, only_old, only_new = match_kernels(keys['old'], keys['new'])
+    if kernel_id is not None:
+        pairs = [pair for pair in pairs if pair[1] == kernel_id]
+        if not pairs:
+            raise ValueError(f"Kernel {kernel_id} of the new report has no match in the old report")
+    trees = {}
+    memory_metrics = {}
+    for side, report, column in (('old', old_report, 0), ('new', new_report, 1)):
+        ids = [pair[column] for pair in pairs]
+        reports = [Report(path=report.path, kernel_id=kernel, raw_counters=raw[side],
+                          raw_counters_units_row=getattr(report, 'raw_counters_units_row', True))
+                   for kernel in ids]
+        memory_metrics[side] = [Memory_Metrics() for _ in ids]
+        trees[side] = launch_batch(reports, config, save_dot=False, kernel_memory_metrics=memory_metrics[side])
+    kernels = [(keys['new'][new_id], old_id, new_id, old_tree, new_tree, old_memory_metrics, new_memory_metrics)
+               for (old_id, new_id), old_tree, new_tree, old_memory_metrics, new_memory_metrics
+               in zip(pairs, trees['old'], trees['new'], memory_metrics['old'], memory_metrics['new'])]
+    return kernels, only_old, only_new
+
+
+def diff_reports(old_report, new_report, config, kernel_id=None, min_delta=DEFAULT_MIN_DELTA):
+    """
+    Compare two reports.
+    @return: the JSON-ready diff and {new kernel id: combined tree} of the matched kernels.
+    """
+    kernels, only_old, only_new = analyze_reports(old_report, new_report, config, kernel_id)
+    result = {
+        'old_report': str(old_report.path),
+        'new_report': str(new_report.path),
+        'kernels': [],
+        'only_old': [{'kernel': name, 'launch': launch} for name, launch in only_old],
+        'only_new': [{'kernel': name, 'launch': launch} for name, launch in only_new],
+    }
+    combined = {}
+    for key, old_id, new_id, old_tree, new_tree, old_memory_metrics, new_memory_metrics in kernels:
+        kernel = diff_kernel(old_tree, new_tree, old_memory_metrics, new_memory_metrics, min_delta)
+        kernel.update({'kernel': key[0], 'launch': key[1], 'old_kernel_id': old_id, 'new_kernel_id': new_id})
+        result['kernels'].append(kernel)
+        combined[new_id] = diff_tree(old_tree, new_tree, kernel['nodes'])
+    return result, combined
+
+
+def _markdown_share(share, percentage):
+    if share is None:
+        return "-"
+    return "%.2f%%" % (100 * share) if percentage else "%.2f" % share
+
+
+def to_markdown(result):
+    """The diff as Markdown: one section per kernel with the changed nodes and suggestions."""
+    lines = ["# DrGPU diff", "", "Old: %s  " % result['old_report'], "New: %s" % result['new_report'], ""]
+    for kernel in result['kernels']:
+        lines.append("## %s" % kernel_name_label((kernel['kernel'], kernel['launch'])))
+        lines.append("")
+        bottleneck = kernel['bottleneck']
+        if bottleneck['old'] != bottleneck['new']:
+            lines.append("**Bottleneck unit:** %s -> %s" % (bottleneck['old'], bottleneck['new']))
+        else:
+            lines.append("**Bottleneck unit:** %s (unchanged)" % bottleneck['new'])
+        lines.append("")
+        changed = [node for node in kernel['nodes'] if node['status'] != 'unchanged']
+        if changed:
+            lines += ["| Node | Old | New | Delta | Status |", "|---|---|---|---|---|"]
+            for node in changed:
+                delta = "" if node['delta'] is None else \
+                    "%+.2f" % (100 * node['delta'] if node['percentage'] else node['delta'])
+                lines.append("| %s | %s | %s | %s | %s |" % (
+                    node['path'], _markdown_share(node['old'], node['percentage']),
+                    _markdown_share(node['new'], node['percentage']), delta, node['status']))
+        else:
+            lines.append("No node changed.")
+        lines.append("")
+        for change in ('appeared', 'disappeared'):
+            for suggestion in kernel['suggestions'][change]:
+                lines.append("* Suggestion %s (%s): %s" % (change, suggestion['stall'], suggestion['text']))
+        if kernel['suggestions']['appeared'] or kernel['suggestions']['disappeared']:
+            lines.append("")
+    for side, title in (('only_old', 'Only in the old report'), ('only_new', 'Only in the new report')):
+        if result[side]:
+            lines.append("## %s" % title)
+            lines.append("")
+            lines += ["* %s" % kernel_name_label((kernel['kernel'], kernel['launch'])) for kernel in result[side]]
+            lines.append("")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('old', metavar='OLD', help='report before the change (CSV raw page).')
+    parser.add_argument('new', metavar='NEW', help='report after the change (CSV raw page).')
+    parser.add_argument('-c', '--memoryconfig', metavar='PATH',
+                        help='absolute path to the memory config or a file name in mem_config')
+    parser.add_argument('-id', '--id', metavar='ID', type=int, dest='kernel_id',
+                        help='only compare kernel ID of the new report with its match.')
+    parser.add_argument('-o', '--output', metavar='NAME',
+                        help='name of the combined trees, DIR/NAME_diff_ID.svg (default: the new report name).')
+    parser.add_argument('--output-dir', metavar='DIR', default='dots',
+                        help='directory of the combined trees (default: dots).')
+    parser.add_argument('--unique-output', action='store_true',
+                        help='add a number to a tree name if the file exists instead of overwriting it.')
+    parser.add_argument('--json', metavar='FILE', help='save the diff as JSON to FILE.')
+    parser.add_argument('--markdown', metavar='FILE', help='save the Markdown to FILE instead of printing it.')
+    parser.add_argument('--min-delta', metavar='SHARE', type=float, default=DEFAULT_MIN_DELTA,
+                        help='smallest change of a node share reported, e.g. 0.005 for half a percent.')
+    parser.add_argument('--no-dot', action='store_true', help="don't render the combined trees.")
+    parser.add_argument('-l', '--log-level', metavar='LEVEL', default='INFO', help='log level.')
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level)
+
+    from drgpu.drgpu_launch import load_report, load_config, default_dot_graph_name, render
+    old_report = load_report(Path(args.old))
+    new_report = load_report(Path(args.new))
+    config = load_config(args.memoryconfig)
+    result, combined = diff_reports(old_report, new_report, config, args.kernel_id, args.min_delta)
+
+    markdown = to_markdown(result)
+    if args.markdown:
+        Path(args.markdown).write_text(markdown, encoding='utf-8')
+    else:
+        print(markdown)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fout:
+            json.dump(result, fout, indent=2)
+    if not args.no_dot:
+        output = default_dot_graph_name(new_report, args.output)
+        for kernel_id, hw_tree in combined.items():
+            render(hw_tree, "%s_diff_%d" % (output, kernel_id), args.output_dir, args.unique_output)
+
+
+if __name__ == "__main__":
+    main()
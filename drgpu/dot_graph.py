@@ -1,4 +1,7 @@
+import os
+import threading
 from graphviz import Digraph # type: ignore
+from drgpu import trace
 from drgpu.node import Node, MEMORY_LATENCY_HIERARCHY
 
 colors = [
@@ -6,8 +9,86 @@ colors = [
     "skyblue", "wheat", "thistle",
 ]
 
+# tries of unique_output_path before giving up
+MAX_UNIQUE_TRIES = 10000
+
+
+class Rendering:
+    """
+    A decision tree rendered in memory: the dot source and the SVG as bytes, and the paths they
+    were saved to, None while they are not saved.
+    """
+    def __init__(self, name: str, dot: bytes, svg: bytes):
+        self.name = name
+        self.dot = dot
+        self.svg = svg
+        self.dot_path = None
+        self.svg_path = None
+
+
 def build_dot_graph(hw_tree: Node, dot_file_name: str):
-    """Build the dot graph of the stall analysis decision tree via BFS."""
+    """Build the dot graph of the stall analysis decision tree and render it to dot_file_name.svg."""
+    rendering = render_tree(hw_tree, os.path.basename(dot_file_name))
+    write_rendering(rendering, dot_file_name)
+    return rendering
+
+
+def render_tree(hw_tree: Node, name: str) -> Rendering:
+    """Render the decision tree in memory with `dot`, without touching the file system."""
+    g = build_digraph(hw_tree)
+    with trace.span("graphviz", output=name):
+        svg = g.pipe(format='svg')
+    return Rendering(name, g.source.encode('utf-8'), svg)
+
+
+def unique_output_path(directory: str, name: str, suffix: str = '.svg') -> str:
+    """
+    Reserve directory/NAME.svg, or NAME_1.svg, NAME_2.svg, ... if it exists, by creating the file
+    exclusively, so concurrent analyses never get the same path.
+    Args:
+        suffix: Reserve NAME_N + suffix instead, e.g. '_app.svg' to reserve a prefix of several
+            files or '.csv' for a table.
+    Returns:
+        The reserved path without the suffix.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for i in range(MAX_UNIQUE_TRIES):
+        path = os.path.join(directory, name if i == 0 else "%s_%d" % (name, i))
+        try:
+            os.close(os.open(path + suffix, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+        except FileExistsError:
+            continue
+        return path
+    raise FileExistsError("No free output name for %s in %s" % (name, directory))
+
+
+def _write_atomic(path: str, data: bytes):
+    """Write through a temporary file, readers never see a partly written file."""
+    # one writer per process and thread
+    tmp_path = "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+    try:
+        with open(tmp_path, 'wb') as fout:
+            fout.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def write_rendering(rendering: Rendering, dot_file_name: str):
+    """Save the dot source to dot_file_name and the SVG to dot_file_name.svg."""
+    directory = os.path.dirname(dot_file_name)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    _write_atomic(dot_file_name, rendering.dot)
+    _write_atomic(dot_file_name + '.svg', rendering.svg)
+    rendering.dot_path = dot_file_name
+    rendering.svg_path = dot_file_name + '.svg'
+
+
+def build_digraph(hw_tree: Node) -> Digraph:
+    """Build the dot graph of the stall analysis decision tree via BFS without rendering it."""
     g = Digraph('hw tree')
     # [(father.name, child), ], have to record their father
     queue = [(hw_tree.name, hw_tree)]
@@ -28,8 +109,9 @@ def build_dot_graph(hw_tree: Node, dot_file_name: str):
         #        color=colors[color_i % len(colors)])
         # g.node(name=cur_child.name, label=node_label, style="filled",
         #        color="/ylgn9/%d" % (9 - color_i%9))
+        attributes = {'URL': cur_child.url} if getattr(cur_child, 'url', None) else {}
         g.node(name=cur_child.name, label=node_label, style="filled", color=node_color,
-               shape=node_shape)
+               shape=node_shape, **attributes)
         color_i += 1
 
         # add the edge connecting the new node to the graph
@@ -50,4 +132,4 @@ def build_dot_graph(hw_tree: Node, dot_file_name: str):
             queue.append((cur_child.name, next_child))
 
     g.format = 'svg'
-    g.render(dot_file_name, view=False)
+    return g
@@ -7,20 +7,37 @@ from pathlib import Path
 import configparser
 from typing import List
 import numpy as np
+import pandas as pd
 import logging
+from drgpu import aggregate
+from drgpu import compression
 from drgpu import gather
 from drgpu import unit_hunt
 from drgpu import dot_graph
 from drgpu import suggestions
 from drgpu import read_reports
+from drgpu import rules
+from drgpu import app_tree
+from drgpu import cluster
+from drgpu import results_store
+from drgpu import stage_cache
 from drgpu import source_code_analysis
+from drgpu import trace
 from drgpu.data_struct import Analysis, Report, Memory_Metrics, Configuration
 from drgpu.node import Node
 
 logger = logging.getLogger(__name__)
 
+# directory of the dot graphs, relative to the working directory
+DEFAULT_OUTPUT_DIR = "dots"
+# suffixes of main reports read as Arrow IPC files
+ARROW_SUFFIXES = ('.arrow', '.feather', '.ipc')
+
+
 def work(report: Report, dot_graph_name: str | None, memory_metrics: Memory_Metrics,
-         config: Configuration, save_dot: bool = True) -> Node:
+         config: Configuration, save_dot: bool = True, cache: stage_cache.StageCache | None = None,
+         store: results_store.ResultsStore | None = None, output_dir: str | None = DEFAULT_OUTPUT_DIR,
+         unique_output: bool = False):
     """
     Carry out the analysis and generate the decision tree.
     Args:
@@ -28,24 +45,231 @@ def work(report: Report, dot_graph_name: str | None, memory_metrics: Memory_Metr
         dot_graph_name: The name of the dot graph.
         memory_metrics: The memory metrics object.
         config: The configuration object.
-        save_dot: Whether to save the dot graph (optional, default is True).
+        save_dot: Whether to render the dot graph (optional, default is True).
+        cache: Stage cache to reuse the stages whose inputs didn't change (optional).
+        store: Results store recording the analysis (optional).
+        output_dir: Directory of the dot graph, None keeps it in memory only (optional, default is dots).
+        unique_output: Add a number to the dot graph name if the file exists (optional).
     Returns:
-        The decision tree root node.
+        The decision tree root node and its dot_graph.Rendering, None if it was not rendered or
+        the cached rendering was reused.
+    """
+    dot_graph_name = default_dot_graph_name(report, dot_graph_name)
+    if cache is not None:
+        return work_cached(report, dot_graph_name, memory_metrics, config, save_dot, cache, store,
+                           output_dir, unique_output)
+    analysis, hw_tree = analyze(report, memory_metrics, config)
+    with trace.span("suggestions"):
+        add_suggestions(hw_tree, analysis, memory_metrics, config)
+    rendering = None
+    if save_dot:
+        rendering = render(hw_tree, dot_graph_name, output_dir, unique_output)
+    if store is not None:
+        store.add(report, hw_tree, analysis, memory_metrics, rendered_name(rendering, dot_graph_name))
+    return hw_tree, rendering
+
+
+def analyze(report: Report, memory_metrics: Memory_Metrics, config: Configuration):
+    """
+    Read the report, hunt the bottleneck units and build the decision tree without suggestions.
+    Args:
+        report: The report object.
+        memory_metrics: The memory metrics object.
+        config: The configuration object.
+    Returns:
+        The analysis object and the decision tree root node.
     """
     analysis = Analysis()
     # {stat_name: stat, } type:{str: Stat}
     all_stats = analysis.all_stats
-    if dot_graph_name is None:
-        if report.path:
-            (_, dot_graph_name) = os.path.split(report.path)
-            (dot_graph_name, _) = os.path.splitext(dot_graph_name)
-        else:
-            dot_graph_name = "drgpu_report"
     # read reports and filter all useful stats
-    read_reports.fill_stats(all_stats, report)
-    if report.source_report_path or getattr(report, 'source_report_content', None):
-        read_reports.fill_source_report(report, analysis)
+    with trace.span("fill_stats"):
+        read_reports.fill_stats(all_stats, report)
+    if has_source_report(report):
+        with trace.span("fill_source_report"):
+            read_reports.fill_source_report(report, analysis)
+
+    with trace.span("unit_hunt"):
+        hunt_units(analysis, memory_metrics, config)
+    with trace.span("build_tree"):
+        hw_tree = build_tree(report, analysis, memory_metrics, config)
+    return analysis, hw_tree
+
+
+def work_cached(report: Report, dot_graph_name: str, memory_metrics: Memory_Metrics,
+                config: Configuration, save_dot: bool, cache: stage_cache.StageCache,
+                store: results_store.ResultsStore | None = None, output_dir: str | None = DEFAULT_OUTPUT_DIR,
+                unique_output: bool = False):
+    """
+    work() with every stage looked up in the cache first, see stage_cache for the stage keys.
+    """
+    def ingest():
+        analysis = Analysis()
+        with trace.span("fill_stats"):
+            read_reports.fill_stats(analysis.all_stats, report)
+        if has_source_report(report):
+            with trace.span("fill_source_report"):
+                read_reports.fill_source_report(report, analysis)
+        return analysis
+
+    def derived_metrics():
+        derived_memory_metrics = Memory_Metrics()
+        with trace.span("derived_metrics"):
+            derive_metrics(analysis, derived_memory_metrics)
+        return analysis, derived_memory_metrics
+
+    def memory_model():
+        with trace.span("unit_hunt"):
+            model_memory(analysis, kernel_memory_metrics, config)
+        return analysis, kernel_memory_metrics
+
+    def tree():
+        with trace.span("build_tree"):
+            return analysis, kernel_memory_metrics, build_tree(report, analysis, kernel_memory_metrics, config)
+
+    def suggestions_stage():
+        with trace.span("suggestions"):
+            add_suggestions(hw_tree, analysis, kernel_memory_metrics, config)
+        return hw_tree
+
+    with trace.span("cache_key"):
+        ingest_key = cache.key(cache.report_key(report))
+    analysis = cache.get("ingest", ingest_key, ingest)
+    derived_key = cache.key("derived_metrics", ingest_key)
+    analysis, kernel_memory_metrics = cache.get("derived_metrics", derived_key, derived_metrics)
+    memory_model_key = cache.key("memory_model", derived_key,
+                                 stage_cache.config_fields(config, stage_cache.MEMORY_MODEL_FIELDS))
+    analysis, kernel_memory_metrics = cache.get("memory_model", memory_model_key, memory_model)
+    tree_key = cache.key("tree", memory_model_key, has_source_report(report),
+                         stage_cache.config_fields(config, stage_cache.TREE_FIELDS))
+    analysis, kernel_memory_metrics, hw_tree = cache.get("tree", tree_key, tree)
+    suggestions_key = cache.key("suggestions", tree_key,
+                                stage_cache.config_fields(config, stage_cache.SUGGESTION_FIELDS))
+    hw_tree = cache.get("suggestions", suggestions_key, suggestions_stage)
+    memory_metrics.__dict__.update(kernel_memory_metrics.__dict__)
+    rendering = None
+    if save_dot and (unique_output or output_dir is None):
+        # every call gets a new file or stays in memory, nothing to reuse
+        rendering = render(hw_tree, dot_graph_name, output_dir, unique_output)
+    elif save_dot:
+        rendering = cache.render(cache.key("render", suggestions_key), os.path.join(output_dir, dot_graph_name),
+                                 lambda: render(hw_tree, dot_graph_name, output_dir))
+    if store is not None:
+        store.add(report, hw_tree, analysis, memory_metrics, rendered_name(rendering, dot_graph_name))
+    return hw_tree, rendering
+
+
+def render(hw_tree: Node, dot_graph_name: str, output_dir: str | None = DEFAULT_OUTPUT_DIR,
+           unique_output: bool = False) -> dot_graph.Rendering:
+    """
+    Render the decision tree in memory and save it to OUTPUT_DIR/NAME and OUTPUT_DIR/NAME.svg.
+    Args:
+        hw_tree: The decision tree root node.
+        dot_graph_name: The name of the dot graph.
+        output_dir: Directory of the dot graph, None keeps it in memory only.
+        unique_output: Add a number to the name if the file exists (optional).
+    Returns:
+        The rendering with the dot source, the SVG and the paths they were saved to.
+    """
+    with trace.span("render", output=dot_graph_name):
+        rendering = dot_graph.render_tree(hw_tree, dot_graph_name)
+        if output_dir is not None:
+            save_rendering(rendering, output_dir, unique_output)
+    return rendering
+
+
+def save_rendering(rendering: dot_graph.Rendering, output_dir: str,
+                   unique_output: bool = False) -> dot_graph.Rendering:
+    """
+    Save a rendering to OUTPUT_DIR/NAME and OUTPUT_DIR/NAME.svg.
+    Args:
+        rendering: The rendering of dot_graph.render_tree.
+        output_dir: Directory of the dot graph.
+        unique_output: Add a number to the name if the file exists (optional).
+    Returns:
+        The rendering with its paths set.
+    """
+    if unique_output:
+        path = dot_graph.unique_output_path(output_dir, rendering.name)
+    else:
+        path = os.path.join(output_dir, rendering.name)
+    dot_graph.write_rendering(rendering, path)
+    logger.info("save to " + rendering.svg_path)
+    return rendering
+
+
+def rendered_name(rendering: dot_graph.Rendering | None, dot_graph_name: str) -> str:
+    """The name the decision tree was saved as, e.g. NAME_1 with unique_output, or the given name."""
+    if rendering is not None and rendering.dot_path is not None:
+        return os.path.basename(rendering.dot_path)
+    return dot_graph_name
+
+
+def default_dot_graph_name(report: Report, dot_graph_name: str | None = None) -> str:
+    """The given dot graph name, or the report file name without extension."""
+    if dot_graph_name is not None:
+        return dot_graph_name
+    if report.path:
+        (_, dot_graph_name) = os.path.split(report.path)
+        (dot_graph_name, _) = os.path.splitext(compression.strip_suffix(dot_graph_name))
+        return dot_graph_name
+    return "drgpu_report"
 
+
+def has_source_report(report: Report) -> bool:
+    return bool(report.source_report_path or getattr(report, 'source_report_content', None))
+
+
+def hunt_units(analysis: Analysis, memory_metrics: Memory_Metrics, config: Configuration):
+    """
+    Derive the per-unit stats of every branch of the decision tree from the raw counters.
+    Args:
+        analysis: The analysis object with all_stats filled in. The results are stored in it.
+        memory_metrics: The memory metrics object to update.
+        config: The configuration object.
+    """
+    derive_metrics(analysis, memory_metrics)
+    model_memory(analysis, memory_metrics, config)
+
+
+def derive_metrics(analysis: Analysis, memory_metrics: Memory_Metrics):
+    """
+    The part of hunt_units which doesn't depend on the configuration: stall, pipe, instruction,
+    dispatch and shared memory stats.
+    """
+    all_stats = analysis.all_stats
+    analysis.stall_stats = unit_hunt.warp_cant_issue(all_stats)
+    analysis.pipe_stats = unit_hunt.pipe_utilization(all_stats)
+    analysis.instruction_stats = unit_hunt.instruction_distribution(all_stats)
+    analysis.dispatch_stats = unit_hunt.cant_dispatch(all_stats)
+    analysis.shared_mem_stats = unit_hunt.common_function_pattern(all_stats, r'shared_ld_(\d+)b_executed')
+    gather.add_shared_memory_info(all_stats, analysis.shared_mem_stats, memory_metrics)
+
+
+def model_memory(analysis: Analysis, memory_metrics: Memory_Metrics, config: Configuration):
+    """
+    The memory throughput and latency model of hunt_units, it reads the
+    stage_cache.MEMORY_MODEL_FIELDS of the configuration.
+    """
+    all_stats = analysis.all_stats
+    analysis.bottleneck_unit, analysis.bottleneck_stats, _ = \
+        unit_hunt.long_scoreboard_throughput(all_stats, memory_metrics, config)
+    analysis.latency_stats = unit_hunt.long_scoreboard_latency(all_stats, memory_metrics, config)
+
+
+def build_tree(report: Report, analysis: Analysis, memory_metrics: Memory_Metrics,
+               config: Configuration) -> Node:
+    """
+    Build the decision tree from the stats derived by hunt_units.
+    Args:
+        report: The report object.
+        analysis: The analysis object.
+        memory_metrics: The memory metrics object.
+        config: The configuration object.
+    Returns:
+        The decision tree root node without suggestions.
+    """
+    all_stats = analysis.all_stats
     hw_tree = Node('Idle')
     hw_tree.suffix_label = ' of total cycles'
     retire_ipc = all_stats.get('retireIPC', None)
@@ -75,34 +299,30 @@ def work(report: Report, dot_graph_name: str | None, memory_metrics: Memory_Metr
     hw_tree.suffix_label += f"\nIssue IPC: {all_stats['issueIPC'].value:.2f}"
 
     # first level
-    tmpstats = unit_hunt.warp_cant_issue(all_stats)
-    gather.add_sub_branch(tmpstats, hw_tree, 1, config)
-    if report.source_report_path is not None or getattr(report, 'source_report_content', None):
-        source_code_analysis.add_source_code_nodes(tmpstats, hw_tree, analysis, config)
+    gather.add_sub_branch(analysis.stall_stats, hw_tree, 1, config)
+    if has_source_report(report):
+        source_code_analysis.add_source_code_nodes(analysis.stall_stats, hw_tree, analysis, config)
 
     # pipe utilization is the subbranch of shadow_pipe_throttle
-    tmpstats = unit_hunt.pipe_utilization(all_stats)
     target_node = gather.find_node(hw_tree, "warp_cant_issue_pipe_throttle")
     if not target_node:
         logger.warning("Could not find the target node: warp_cant_issue_pipe_throttle")
     else:
-        gather.add_pipe_throttle_branch(tmpstats, target_node, config)
+        gather.add_pipe_throttle_branch(analysis.pipe_stats, target_node, config)
 
     # instruction distribution is the subbranch of wait
-    tmpstats = unit_hunt.instruction_distribution(all_stats)
     target_node = gather.find_node(hw_tree, "warp_cant_issue_wait")
     if not target_node:
         logger.warning("Could not find the target node: warp_cant_issue_wait")
     else:
-        gather.add_sub_branch(tmpstats, target_node, 1, config)
+        gather.add_sub_branch(analysis.instruction_stats, target_node, 1, config)
 
     # warp_cant_issue_dispatch_stall
-    tmpstats = unit_hunt.cant_dispatch(all_stats)
     target_node = gather.find_node(hw_tree, "warp_cant_issue_dispatch")
     if not target_node:
         logger.warning("Could not find the target node: warp_cant_issue_dispatch")
     else:
-        gather.add_sub_branch(tmpstats, target_node, 1, config)
+        gather.add_sub_branch(analysis.dispatch_stats, target_node, 1, config)
 
     target_node = gather.find_node(hw_tree, "warp_cant_issue_lg_throttle")
     if not target_node:
@@ -117,59 +337,88 @@ def work(report: Report, dot_graph_name: str | None, memory_metrics: Memory_Metr
     #     gather.add_sub_branch(tmpstats, target_node, 1)
 
     # warp_cant_issue_long_scoreboard memory
-    bottleneck_unit, bottleneck_stats, memory_metrics = \
-        unit_hunt.long_scoreboard_throughput(all_stats, memory_metrics, config)
     long_scoreboard_node = gather.find_node(hw_tree, "warp_cant_issue_long_scoreboard")
-    latency_stats = unit_hunt.long_scoreboard_latency(all_stats, memory_metrics, config)
-    gather.add_sub_branch_for_longscoreboard_latency(latency_stats, long_scoreboard_node, all_stats,
+    gather.add_sub_branch_for_longscoreboard_latency(analysis.latency_stats, long_scoreboard_node, all_stats,
                                                      memory_metrics)
-    gather.add_sub_branch_for_longscoreboard_throughput(all_stats, bottleneck_unit,
-                                                        bottleneck_stats, long_scoreboard_node, 1,
+    gather.add_sub_branch_for_longscoreboard_throughput(all_stats, analysis.bottleneck_unit,
+                                                        analysis.bottleneck_stats, long_scoreboard_node, 1,
                                                         config)
 
-    shared_mem_stats = unit_hunt.common_function_pattern(all_stats, r'shared_ld_(\d+)b_executed')
-    gather.add_shared_memory_info(all_stats, shared_mem_stats, memory_metrics)
     target_node = gather.find_node(hw_tree, "warp_cant_issue_mio_throttle")
-    gather.add_branch_for_mio_throttle(all_stats, shared_mem_stats, memory_metrics, target_node,
+    gather.add_branch_for_mio_throttle(all_stats, analysis.shared_mem_stats, memory_metrics, target_node,
                                        config)
     target_node = gather.find_node(hw_tree, "warp_cant_issue_short_scoreboard")
-    gather.add_branch_for_short_scoreboard(all_stats, shared_mem_stats, memory_metrics, target_node,
+    gather.add_branch_for_short_scoreboard(all_stats, analysis.shared_mem_stats, memory_metrics, target_node,
                                            config)
+    return hw_tree
 
-    # suggestions part
+
+def add_suggestions(hw_tree: Node, analysis: Analysis, memory_metrics: Memory_Metrics,
+                    config: Configuration, fired: dict | None = None):
+    """
+    Attach the suggestion nodes to the decision tree.
+    Args:
+        hw_tree: The decision tree root node.
+        analysis: The analysis object.
+        memory_metrics: The memory metrics object.
+        config: The configuration object.
+        fired: The threshold rules of the kernel, {rule name: bool} (optional, evaluated here
+            when not given, see rules.evaluate for many kernels at once).
+    """
+    all_stats = analysis.all_stats
+    shared_mem_stats = analysis.shared_mem_stats
+    if fired is None:
+        fired = rules.evaluate_kernel(all_stats, memory_metrics, config)
     suggestions.pipe_suggest(hw_tree, all_stats)
-    suggestions.barrier_suggest(hw_tree, all_stats, config)
-    suggestions.branch_solving_suggest(hw_tree, all_stats, config)
+    suggestions.barrier_suggest(hw_tree, all_stats, config, fired)
+    suggestions.branch_solving_suggest(hw_tree, all_stats, config, fired)
     suggestions.dispatch_stall_suggest(hw_tree, all_stats)
-    suggestions.drain_suggest(hw_tree, all_stats, config)
+    suggestions.drain_suggest(hw_tree, all_stats, config, fired)
     # imc_miss_suggest(hw_tree, all_stats)
     suggestions.lg_credit_throttle_suggest(hw_tree, all_stats)
-    suggestions.memory_suggest(hw_tree, all_stats, bottleneck_unit, memory_metrics, config)
+    suggestions.memory_suggest(hw_tree, all_stats, analysis.bottleneck_unit, memory_metrics, config, fired)
     suggestions.membar_suggest(hw_tree, all_stats)
     suggestions.mio_throttle_suggest(hw_tree, all_stats, shared_mem_stats, config)
-    suggestions.short_scoreboard_suggest(hw_tree, all_stats, shared_mem_stats, config)
+    suggestions.short_scoreboard_suggest(hw_tree, all_stats, shared_mem_stats, config, fired)
     suggestions.wait_suggestion(hw_tree, all_stats)
 
-    if save_dot:
-        dot_graph.build_dot_graph(hw_tree, "dots/" + dot_graph_name)
-        logger.info("save to dots/" + dot_graph_name + ".svg")
-
-    return hw_tree
-
 
 def launch(report: Report, config: Configuration, memory_metrics: Memory_Metrics | None = None,
-           output: str | None = None, save_dot: bool = True) -> Node:
+           output: str | None = None, save_dot: bool = True,
+           cache: stage_cache.StageCache | None = None,
+           store: results_store.ResultsStore | None = None, output_dir: str = DEFAULT_OUTPUT_DIR,
+           unique_output: bool = False) -> Node:
     """
-    Launch DrGPU with the given arguments.
+    Launch DrGPU with the given arguments. Launches may run in parallel threads; they share no
+    mutable state except the cache and store given to them.
     Args:
         report: The report data structure populated with report content.
         config: Parsed GPU configuration data.
         memory_metrics: The memory metrics object to update (optional).
         output: Name of the output decision tree file (dot graph name).
         save_dot: Whether to save the dot graph (optional, default is True).
+        cache: Stage cache shared by repeated launches, only the stages whose inputs changed
+            are computed again (optional).
+        store: Results store recording the analysis (optional).
+        output_dir: Directory of the dot graph (optional, default is dots).
+        unique_output: Add a number to the output name if the file exists, so parallel launches
+            with the same output never overwrite each other (optional).
     Returns:
         The decision tree root node.
     """
+    hw_tree, _ = launch_work(report, config, memory_metrics, output, save_dot, cache, store, output_dir,
+                             unique_output)
+    return hw_tree
+
+
+def launch_work(report: Report, config: Configuration, memory_metrics: Memory_Metrics | None = None,
+                output: str | None = None, save_dot: bool = True,
+                cache: stage_cache.StageCache | None = None,
+                store: results_store.ResultsStore | None = None, output_dir: str | None = DEFAULT_OUTPUT_DIR,
+                unique_output: bool = False):
+    """
+    launch() returning the result of work(), the decision tree and its rendering.
+    """
     if report.kernel_id is None:
         report.kernel_id = 0
     report_path_display = report.path if report.path else "<in-memory>"
@@ -183,8 +432,171 @@ def launch(report: Report, config: Configuration, memory_metrics: Memory_Metrics
     logger.debug("Source path: %s", source_display)
     if memory_metrics is None:
         memory_metrics = Memory_Metrics()
-    hw_tree = work(report, output, memory_metrics, config, save_dot=save_dot)
-    return hw_tree
+    with trace.span("kernel", report=report_path_display, kernel_id=report.kernel_id):
+        return work(report, output, memory_metrics, config, save_dot=save_dot, cache=cache, store=store,
+                    output_dir=output_dir, unique_output=unique_output)
+
+
+def launch_render(report: Report, config: Configuration, memory_metrics: Memory_Metrics | None = None,
+                  output: str | None = None, output_dir: str | None = None, unique_output: bool = True,
+                  cache: stage_cache.StageCache | None = None,
+                  store: results_store.ResultsStore | None = None):
+    """
+    launch() returning the rendered decision tree in memory, for services that don't want to read
+    the SVG back from disk.
+    Args:
+        report: The report data structure populated with report content.
+        config: Parsed GPU configuration data.
+        memory_metrics: The memory metrics object to update (optional).
+        output: Name of the rendering (optional, default is the report name).
+        output_dir: Also save the dot graph to this directory (optional, default is memory only).
+        unique_output: Add a number to the output name if the file exists (optional, default is True).
+        cache: Stage cache shared by repeated launches (optional).
+        store: Results store recording the analysis (optional).
+    Returns:
+        The decision tree root node and its dot_graph.Rendering.
+    """
+    hw_tree, rendering = launch_work(report, config, memory_metrics, output, cache=cache, store=store,
+                                     output_dir=output_dir, unique_output=unique_output)
+    if rendering is None:
+        # the cache kept the saved files of the same tree, render it again in memory only
+        name = default_dot_graph_name(report, output)
+        rendering = render(hw_tree, name, None)
+        rendering.dot_path = os.path.join(output_dir, name)
+        rendering.svg_path = rendering.dot_path + '.svg'
+    return hw_tree, rendering
+
+
+def memory_model_report(report: Report, config: Configuration):
+    """
+    Compute the memory throughput and latency model of every kernel of the report in one
+    vectorized pass, without building decision trees.
+    Args:
+        report: The report, all of its kernels are modeled.
+        config: Parsed GPU configuration data.
+    Returns:
+        A DataFrame with one row per kernel and the columns of unit_hunt.memory_model.
+    """
+    raw_counters = read_reports.fill_report_ncu(report)
+    with trace.span("memory_model"):
+        columns = read_reports.memory_model_columns_ncu(raw_counters, getattr(report, 'raw_counters_units_row', True))
+        model = unit_hunt.memory_model(columns, config)
+    return pd.DataFrame(model)
+
+
+def launch_batch(reports: List[Report], config: Configuration, outputs: List[str | None] | None = None,
+                 save_dot: bool = True, store: results_store.ResultsStore | None = None,
+                 kernel_memory_metrics: List[Memory_Metrics] | None = None,
+                 output_dir: str = DEFAULT_OUTPUT_DIR, unique_output: bool = False) -> List[Node]:
+    """
+    Launch DrGPU on many kernels, evaluating the suggestion rules of all of them in one pass.
+    Args:
+        reports: The reports, one per kernel.
+        config: Parsed GPU configuration data used for all reports.
+        outputs: Dot graph name of every report (optional).
+        save_dot: Whether to save the dot graphs (optional, default is True).
+        store: Results store recording the analyses (optional).
+        kernel_memory_metrics: The memory metrics object of every report to update (optional).
+        output_dir: Directory of the dot graphs (optional, default is dots).
+        unique_output: Add a number to an output name if the file exists (optional).
+    Returns:
+        The decision tree root nodes in the order of the reports.
+    """
+    if outputs is None:
+        outputs = [None] * len(reports)
+    elif len(outputs) != len(reports):
+        raise ValueError(f"Got {len(outputs)} outputs for {len(reports)} reports")
+    if kernel_memory_metrics is None:
+        kernel_memory_metrics = [Memory_Metrics() for _ in reports]
+    elif len(kernel_memory_metrics) != len(reports):
+        raise ValueError(f"Got {len(kernel_memory_metrics)} memory metrics for {len(reports)} reports")
+    kernels = []
+    for report, memory_metrics in zip(reports, kernel_memory_metrics):
+        if report.kernel_id is None:
+            report.kernel_id = 0
+        with trace.span("kernel", report=report.path or "<in-memory>", kernel_id=report.kernel_id):
+            analysis, hw_tree = analyze(report, memory_metrics, config)
+        kernels.append((analysis, memory_metrics, hw_tree))
+    with trace.span("rules", kernels=len(kernels)):
+        matrix = rules.metric_matrix([rules.kernel_metrics(analysis.all_stats, memory_metrics, config)
+                                      for analysis, memory_metrics, _ in kernels])
+        fired = rules.evaluate(matrix, config)
+    hw_trees = []
+    for i, ((analysis, memory_metrics, hw_tree), report, output) in enumerate(zip(kernels, reports, outputs)):
+        with trace.span("suggestions"):
+            add_suggestions(hw_tree, analysis, memory_metrics, config, rules.kernel_rules(fired, i))
+        if store is not None:
+            store.add(report, hw_tree, analysis, memory_metrics, default_dot_graph_name(report, output))
+        if save_dot:
+            render(hw_tree, default_dot_graph_name(report, output), output_dir, unique_output)
+        hw_trees.append(hw_tree)
+    return hw_trees
+
+
+def launch_app(report: Report, config: Configuration, output: str | None = None, save_dot: bool = True,
+               store: results_store.ResultsStore | None = None, output_dir: str = DEFAULT_OUTPUT_DIR,
+               unique_output: bool = False):
+    """
+    Build one tree for all kernels of the report, weighted by their elapsed cycles, and the trees
+    of the kernels listed on its nodes, which the nodes link to.
+    Args:
+        report: The report, all of its kernels are combined.
+        config: Parsed GPU configuration data.
+        output: Name of the output, the application tree is saved as OUTPUT_app and the tree of
+            kernel N as OUTPUT_N (optional, default is the report name).
+        save_dot: Whether to save the dot graphs (optional, default is True).
+        store: Results store recording the analyses of the listed kernels (optional).
+        output_dir: Directory of the dot graphs (optional, default is dots).
+        unique_output: Add a number to the output name if OUTPUT_app exists, the kernel trees
+            the application tree links to get the same name (optional).
+    Returns:
+        The application tree and {kernel id: decision tree} of the listed kernels.
+    """
+    output = default_dot_graph_name(report, output)
+    if save_dot and unique_output:
+        output = os.path.basename(dot_graph.unique_output_path(output_dir, output, '_app.svg'))
+    hw_tree, listed, raw_counters = app_tree.app_tree(report, config,
+                                                      kernel_url=lambda kernel_id: "%s_%d.svg" % (output, kernel_id))
+    if save_dot:
+        render(hw_tree, output + "_app", output_dir)
+    units_row = getattr(report, 'raw_counters_units_row', True)
+    reports = [Report(path=report.path, kernel_id=kernel_id, raw_counters=raw_counters,
+                      raw_counters_units_row=units_row) for kernel_id in listed]
+    kernel_trees = launch_batch(reports, config, outputs=["%s_%d" % (output, kernel_id) for kernel_id in listed],
+                                save_dot=save_dot, store=store, output_dir=output_dir)
+    return hw_tree, dict(zip(listed, kernel_trees))
+
+
+def launch_clusters(report: Report, config: Configuration, clusters: int = cluster.DEFAULT_CLUSTERS,
+                    output: str | None = None, save_dot: bool = True,
+                    store: results_store.ResultsStore | None = None, output_dir: str = DEFAULT_OUTPUT_DIR,
+                    unique_output: bool = False):
+    """
+    Cluster the kernels of the report by stall signature and analyze only the medoid of every
+    cluster.
+    Args:
+        report: The report, all of its kernels are clustered.
+        config: Parsed GPU configuration data.
+        clusters: The number of clusters (optional).
+        output: Name of the output, the tree of cluster N is saved as OUTPUT_cluster_N (optional,
+            default is the report name).
+        save_dot: Whether to save the dot graphs (optional, default is True).
+        store: Results store recording the analyses of the medoids (optional).
+        output_dir: Directory of the dot graphs (optional, default is dots).
+        unique_output: Add a number to an output name if the file exists (optional).
+    Returns:
+        The member table of cluster.cluster_kernels and the decision trees of the medoids, the
+        tree of cluster N at index N.
+    """
+    output = default_dot_graph_name(report, output)
+    raw_counters = read_reports.fill_report_ncu(report)
+    units_row = getattr(report, 'raw_counters_units_row', True)
+    members, medoid_ids = cluster.cluster_kernels(raw_counters, config, clusters, units_row)
+    reports = [Report(path=report.path, kernel_id=int(kernel_id), raw_counters=raw_counters,
+                      raw_counters_units_row=units_row) for kernel_id in medoid_ids]
+    hw_trees = launch_batch(reports, config, outputs=["%s_cluster_%d" % (output, i) for i in range(len(reports))],
+                            save_dot=save_dot, store=store, output_dir=output_dir, unique_output=unique_output)
+    return members, hw_trees
 
 
 def resolve_memory_config_path(config_arg: str | None) -> Path:
@@ -237,27 +649,164 @@ def load_config(given_config: str) -> Configuration:
 
 
 def load_report(report_path: Path, source_path: Path | None = None,
-                kernel_id: int | None = None) -> Report:
+                kernel_id: int | None = None, partial_report_paths: List[Path] | None = None,
+                on_conflict: str = 'error', source_summary_size: int | None = None) -> Report:
     """
     Load the report from the path.
     Args:
         report_path: The path to the report.
         source_path: The path to the source.
         kernel_id: The kernel id.
+        partial_report_paths: Paths to raw pages of further ncu runs whose counters are merged
+            into the main report (optional).
+        on_conflict: What to do when partial reports disagree on a unit or launch or device
+            attribute, 'error' or 'first'.
+        source_summary_size: Stream the source report and keep only this many instructions per
+            stall reason (optional, default keeps all).
     Returns:
         The report.
     """
-    report_content = report_path.read_text(encoding='utf-8')
-
-    source_content = None
-    if source_path is not None:
-        source_content = source_path.read_text(encoding='utf-8')
-
+    # the reports are streamed from their paths when they are parsed, see read_reports.fill_report_ncu
+    partial_report_paths = partial_report_paths or []
+    for path in [report_path, source_path] + partial_report_paths:
+        if path is not None and not Path(path).exists():
+            raise FileNotFoundError(f"Report file {path} doesn't exist")
     report = Report(
         path=str(report_path),
         source_report_path=str(source_path) if source_path else None,
         kernel_id=kernel_id if kernel_id is not None else 0,
-        report_content=report_content,
-        source_report_content=source_content,
+        partial_report_paths=[str(path) for path in partial_report_paths],
+        on_conflict=on_conflict,
+        source_summary_size=source_summary_size,
     )
     return report
+
+
+def aggregate_report(report: Report):
+    """
+    Combine the repeated launches of every kernel and launch configuration of a report, see
+    aggregate.aggregate_launches.
+    Args:
+        report: The loaded report.
+    Returns:
+        One report per kernel and launch configuration and the variation of the stall ratios.
+    """
+    with trace.span("aggregate"):
+        raw_counters = read_reports.fill_report_ncu(report)
+        aggregated, variation = aggregate.aggregate_launches(
+            raw_counters, getattr(report, 'raw_counters_units_row', True))
+    reports = []
+    for group_id in range(len(aggregated)):
+        reports.append(Report(
+            path=report.path,
+            source_report_path=report.source_report_path,
+            kernel_id=group_id,
+            source_report_content=getattr(report, 'source_report_content', None),
+            raw_counters=aggregated,
+            raw_counters_units_row=False,
+        ))
+    return reports, variation
+
+
+def iter_chunked_reports(report_path: Path, source_path: Path | None = None, kernel_id: int | None = None,
+                         max_memory: int | None = None, chunk_rows: int | None = None,
+                         kernel_filter: read_reports.KernelFilter | None = None):
+    """
+    Create a report for every kernel of a raw page too large to load at once. The page is parsed in
+    chunks of kernel rows, so peak memory follows max_memory instead of the file size. Analyze
+    and drop the reports of a chunk before asking for the next one.
+    Args:
+        report_path: The path to the report.
+        source_path: The path to the source, used for every kernel (optional).
+        kernel_id: Only report this kernel (optional).
+        max_memory: Approximate bytes of one parsed chunk (optional).
+        chunk_rows: Fixed number of kernel rows per chunk, overrides max_memory (optional).
+        kernel_filter: Only report the kernels passing this filter (optional).
+    Returns:
+        Iterator of (kernel index, report).
+    """
+    for indexes, chunk in read_reports.iter_kernel_chunks_ncu(str(report_path), max_memory, chunk_rows,
+                                                              kernel_filter):
+        for position, index in enumerate(indexes):
+            if kernel_id is not None and index != kernel_id:
+                continue
+            yield index, Report(
+                path=str(report_path),
+                source_report_path=str(source_path) if source_path else None,
+                kernel_id=position,
+                raw_counters=chunk,
+                raw_counters_units_row=False,
+            )
+        if kernel_id is not None and kernel_id <= indexes[-1]:
+            return
+
+
+def iter_stream_reports(stream, source_path: Path | None = None, kernel_id: int | None = None,
+                        name: str = 'stdin', kernel_filter: read_reports.KernelFilter | None = None):
+    """
+    Create a report for every kernel of a raw page read from a stream (stdin or a FIFO) as soon as
+    the row of the kernel has arrived.
+    Args:
+        stream: Text stream of the `ncu --csv --page raw` output.
+        source_path: The path to the source, used for every kernel (optional).
+        kernel_id: Only report this kernel and stop reading after it (optional).
+        name: Name of the stream used in logs.
+        kernel_filter: Only report the kernels passing this filter (optional).
+    Returns:
+        Iterator of (kernel index, report).
+    """
+    for index, raw_counters in read_reports.iter_kernel_rows_ncu(stream, name, kernel_filter):
+        if kernel_id is not None and index != kernel_id:
+            continue
+        yield index, Report(
+            path=name,
+            source_report_path=str(source_path) if source_path else None,
+            kernel_id=0,
+            raw_counters=raw_counters,
+        )
+        if kernel_id is not None:
+            return
+
+
+def load_report_frame(raw_counters, source_path: Path | None = None, kernel_id: int | None = None,
+                      units_row: bool = True, name: str = 'dataframe') -> Report:
+    """
+    Create a report from an already parsed raw page without going through CSV text.
+    Args:
+        raw_counters: pandas DataFrame or pyarrow Table with the ncu raw page columns. Values may be
+            strings as in the CSV or numbers.
+        source_path: The path to the source.
+        kernel_id: The kernel id, the row of the kernel after the units row.
+        units_row: Whether the first row holds the units of the counters as in the ncu CSV.
+        name: Name of the report used for the output files.
+    Returns:
+        The report.
+    """
+    return Report(
+        path=name,
+        source_report_path=str(source_path) if source_path else None,
+        kernel_id=kernel_id if kernel_id is not None else 0,
+        raw_counters=raw_counters,
+        raw_counters_units_row=units_row,
+    )
+
+
+def load_report_arrow(report_path: Path, source_path: Path | None = None, kernel_id: int | None = None,
+                      units_row: bool = False) -> Report:
+    """
+    Load the report from an Arrow IPC (Feather v2) file. The file is memory-mapped, only the row
+    of the kernel and the counters DrGPU reads are converted to pandas.
+    Args:
+        report_path: The path to the Arrow file.
+        source_path: The path to the source.
+        kernel_id: The kernel id.
+        units_row: Whether the first row holds the units of the counters as in the ncu CSV.
+    Returns:
+        The report.
+    """
+    # pyarrow is optional, only needed for Arrow input
+    import pyarrow
+
+    with pyarrow.memory_map(str(report_path)) as source:
+        table = pyarrow.ipc.open_file(source).read_all()
+    return load_report_frame(table, source_path, kernel_id, units_row, name=str(report_path))
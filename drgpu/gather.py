@@ -2,6 +2,7 @@ import gzip
 import json
 import functools
 import logging
+from drgpu import trace
 from drgpu.data_struct import Stat, Unit
 from drgpu.node import Node, SHOW_AS_RAW_VALUE, SHOW_AS_PERCENTAGE, LATENCY_NODE
 from drgpu.unit_hunt import add_l1_stats, add_utlb_stats, add_l1tlb_stats
@@ -264,6 +265,7 @@ def add_branch_for_short_scoreboard(all_stats, shared_mem_stats, memory_metrics,
         target_node.child.append(node)
 
 
+@trace.traced("find_node")
 def find_node(hw_tree, node_name):
     if hw_tree is None:
         raise ValueError(f"You are trying to find {node_name} in a none tree")
@@ -0,0 +1,67 @@
+"""
+Bounded-memory summary of the heaviest items of a weighted stream.
+
+SpaceSaving (Metwally et al.) monitors at most `capacity` items. An item not monitored replaces the
+item with the smallest count and inherits that count as its error, so every monitored count
+overestimates the true weight of the item by at most its error, and the error is at most
+total / capacity. Every item heavier than total / capacity is monitored. With no more distinct
+items than the capacity the counts are exact.
+"""
+import heapq
+
+
+class SpaceSaving:
+    def __init__(self, capacity):
+        """
+        @arg capacity: the number of items monitored.
+        """
+        if capacity < 1:
+            raise ValueError(f"The capacity of a SpaceSaving summary must be at least 1, not {capacity}")
+        self.capacity = capacity
+        # exact sum of all weights added
+        self.total = 0.0
+        # {key: [count, error, payload]}
+        self.items = {}
+        # (count, key) of the monitored items, entries of updated counts are dropped lazily
+        self._heap = []
+
+    def add(self, key, weight=1.0, payload=None):
+        """
+        Add the weight of an item. Items without weight are not monitored.
+        @arg payload: kept with the item while it is monitored, e.g. its source line.
+        """
+        if not weight > 0:
+            return
+        self.total += weight
+        item = self.items.get(key)
+        if item is not None:
+            item[0] += weight
+        elif len(self.items) < self.capacity:
+            item = self.items[key] = [weight, 0.0, payload]
+        else:
+            smallest = self._pop_smallest()
+            count = self.items.pop(smallest)[0]
+            item = self.items[key] = [count + weight, count, payload]
+        heapq.heappush(self._heap, (item[0], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, key) for key, (count, _, _) in self.items.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_smallest(self):
+        while True:
+            count, key = heapq.heappop(self._heap)
+            item = self.items.get(key)
+            if item is not None and item[0] == count:
+                return key
+
+    def max_error(self):
+        """The largest overestimate of any count."""
+        return max((error for _, error, _ in self.items.values()), default=0.0)
+
+    def top(self, n=None):
+        """
+        The monitored items, heaviest first, ties broken by the larger key.
+        @return: [(key, count, error, payload), ] of at most n items.
+        """
+        ranked = sorted(self.items.items(), key=lambda kv: (kv[1][0], kv[0]), reverse=True)
+        return [(key, count, error, payload) for key, (count, error, payload) in ranked[:n]]
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Index the stall samples of source lines across all analyzed kernels.
+
+Every source report is per kernel, but kernels share device headers and inlined functions. The
+index maps every (file, line) to the samples of every stall reason per kernel, so the lines
+causing a stall across the whole application are found without reading the source reports again.
+The samples are kept as a sparse COO matrix (line, stall, kernel, count) in one .npz file next
+to the tables of files, lines and kernels. Adding the source report of a kernel again replaces
+its samples, an unchanged report is skipped.
+
+    ./main.py -i app.csv -s app_s.csv --hotspot-index hotspots.npz
+    python -m drgpu.hotspot_index hotspots.npz --stall stall_long_sb -n 20
+"""
+import argparse
+import logging
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from drgpu import compression
+from drgpu import read_reports
+from drgpu import source_code_analysis
+from drgpu import stage_cache
+from drgpu import trace
+
+logger = logging.getLogger(__name__)
+
+# the stall columns of the source report, the stall index of the samples
+STALLS = list(source_code_analysis.stalls_mapping_to_detail_report)
+FORMAT_VERSION = 1
+DEFAULT_TOP_LINES = 20
+
+
+def kernel_name_of(source_path):
+    """The default kernel name of a source report, NAME of NAME_s.csv."""
+    name = Path(compression.strip_suffix(Path(source_path).name)).stem
+    return name.removesuffix('_s')
+
+
+class HotspotIndex:
+    def __init__(self, path=None):
+        """
+        @arg path: the .npz file of the index, loaded if it exists and written by save().
+        """
+        self.path = Path(path) if path is not None else None
+        self.files = []
+        self.line_files = []
+        self.line_numbers = []
+        self.line_texts = []
+        self.kernels = []
+        self.kernel_digests = []
+        self._file_ids = {}
+        self._line_ids = {}
+        self._kernel_ids = {}
+        # COO samples, kept as lists of arrays until they are needed
+        self._samples = []
+        if self.path is not None and self.path.exists():
+            self.load(self.path)
+
+    def load(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data['version'])
+            if version > FORMAT_VERSION:
+                raise ValueError(f"{path} is a hotspot index of version {version}, this DrGPU reads "
+                                 f"up to version {FORMAT_VERSION}")
+            self.files = data['files'].tolist()
+            self.line_files = data['line_files'].tolist()
+            self.line_numbers = data['line_numbers'].tolist()
+            self.line_texts = data['line_texts'].tolist()
+            self.kernels = data['kernels'].tolist()
+            self.kernel_digests = data['kernel_digests'].tolist()
+            stalls = data['stalls'].tolist()
+            samples = (data['line'], data['stall'], data['kernel'], data['count'])
+        if stalls != STALLS:
+            # written with other stall columns, map them by name
+            known = np.array([STALLS.index(stall) if stall in STALLS else -1 for stall in stalls], dtype=np.int64)
+            stall = known[samples[1]]
+            keep = stall >= 0
+            samples = tuple(column[keep] for column in (samples[0], stall, samples[2], samples[3]))
+        self._samples = [samples]
+        self._file_ids = {name: i for i, name in enumerate(self.files)}
+        self._line_ids = {(file_id, number): i for i, (file_id, number)
+                          in enumerate(zip(self.line_files, self.line_numbers))}
+        self._kernel_ids = {name: i for i, name in enumerate(self.kernels)}
+
+    def samples(self):
+        """The (line, stall, kernel, count) arrays of all samples."""
+        if len(self._samples) != 1:
+            if self._samples:
+                self._samples = [tuple(np.concatenate(columns) for columns in zip(*self._samples))]
+            else:
+                self._samples = [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                                  np.zeros(0, dtype=np.int64), np.zeros(0))]
+        return self._samples[0]
+
+    def save(self, path=None):
+        """Write the index, replacing the file atomically."""
+        path = Path(path) if path is not None else self.path
+        if path is None:
+            raise ValueError("The hotspot index has no path to save to")
+        line, stall, kernel, count = self.samples()
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as fout:
+            np.savez_compressed(
+                fout, version=np.array(FORMAT_VERSION), stalls=np.array(STALLS, dtype=str),
+                files=np.array(self.files, dtype=str), line_files=np.array(self.line_files, dtype=np.int64),
+                line_numbers=np.array(self.line_numbers, dtype=np.int64),
+                line_texts=np.array(self.line_texts, dtype=str), kernels=np.array(self.kernels, dtype=str),
+                kernel_digests=np.array(self.kernel_digests, dtype=str),
+                line=line, stall=stall, kernel=kernel, count=count)
+        os.replace(tmp_path, path)
+        self.path = path
+
+    def _file_id(self, name):
+        file_id = self._file_ids.get(name)
+        if file_id is None:
+            file_id = self._file_ids[name] = len(self.files)
+            self.files.append(name)
+        return file_id
+
+    def _line_id(self, file_id, number, text):
+        line_id = self._line_ids.get((file_id, number))
+        if line_id is None:
+            line_id = self._line_ids[(file_id, number)] = len(self.line_numbers)
+            self.line_files.append(file_id)
+            self.line_numbers.append(number)
+            self.line_texts.append(text)
+        return line_id
+
+    def remove(self, kernel):
+        """Drop the samples of a kernel, its name stays in the kernel table."""
+        kernel_id = self._kernel_ids.get(kernel)
+        if kernel_id is None:
+            return False
+        line, stall, kernels, count = self.samples()
+        keep = kernels != kernel_id
+        self._samples = [(line[keep], stall[keep], kernels[keep], count[keep])]
+        self.kernel_digests[kernel_id] = ''
+        return True
+
+    def add(self, source_path, kernel=None):
+        """
+        Add the samples of the source report of one kernel, replacing the earlier samples of the
+        kernel.
+        @arg kernel: the name of the kernel in the index, by default NAME of NAME_s.csv.
+        @return: the number of samples added, 0 if the report is unchanged.
+        """
+        kernel = kernel or kernel_name_of(source_path)
+        digest = stage_cache.file_digest(source_path)
+        kernel_id = self._kernel_ids.get(kernel)
+        if kernel_id is not None and self.kernel_digests[kernel_id] == digest:
+            logger.debug("%s of %s is already indexed", source_path, kernel)
+            return 0
+        # {(line id, stall index): count} of this report
+        counts = {}
+        with compression.open_text(source_path) as handle, trace.span("hotspot_index", path=str(source_path)):
+            for _, code_line, values in read_reports.iter_source_rows(handle, source_path):
+                line_id = None
+                for stall, value in enumerate(values):
+                    if not value > 0:
+                        continue
+                    if line_id is None:
+                        file_name = code_line.file_name if isinstance(code_line.file_name, str) else ''
+                        text = code_line.raw_line if isinstance(code_line.raw_line, str) else ''
+                        line_id = self._line_id(self._file_id(file_name), code_line.line_number, text)
+                    counts[(line_id, stall)] = counts.get((line_id, stall), 0.0) + value
+        if kernel_id is None:
+            kernel_id = self._kernel_ids[kernel] = len(self.kernels)
+            self.kernels.append(kernel)
+            self.kernel_digests.append(digest)
+        else:
+            self.remove(kernel)
+            self.kernel_digests[kernel_id] = digest
+        keys = np.array(list(counts), dtype=np.int64).reshape(-1, 2)
+        self._samples.append((keys[:, 0], keys[:, 1], np.full(len(counts), kernel_id, dtype=np.int64),
+                              np.fromiter(counts.values(), dtype=float, count=len(counts))))
+        logger.debug("Indexed %d samples of %s as %s", len(counts), source_path, kernel)
+        return len(counts)
+
+    def top_lines(self, stall=None, n=DEFAULT_TOP_LINES, file_pattern=None):
+        """
+        The source lines with the most samples of a stall over all kernels.
+        @arg stall: a stall column of the source report like 'stall_long_sb', None for all stalls.
+        @arg file_pattern: regular expression the file name has to match.
+        @return: DataFrame of file, line, source, count, share of the samples of all selected
+        lines, number of kernels and the kernel with the most samples of the line.
+        """
+        line, stalls, kernel, count = self.samples()
+        if stall is not None:
+            if stall not in STALLS:
+                raise ValueError(f"Unknown stall {stall}, expected one of {', '.join(STALLS)}")
+            selected = stalls == STALLS.index(stall)
+            line, kernel, count = line[selected], kernel[selected], count[selected]
+        if file_pattern is not None:
+            pattern = re.compile(file_pattern)
+            matching = np.array([bool(pattern.search(name)) for name in self.files], dtype=bool)
+            selected = matching[np.asarray(self.line_files, dtype=np.int64)[line]]
+            line, kernel, count = line[selected], kernel[selected], count[selected]
+        columns = ['file', 'line', 'source', 'count', 'share', 'kernels', 'top_kernel']
+        total = count.sum()
+        if not total > 0:
+            return pd.DataFrame(columns=columns)
+        per_line = np.bincount(line, weights=count, minlength=len(self.line_numbers))
+        top = np.argsort(-per_line, kind='stable')[:n]
+        top = top[per_line[top] > 0]
+        rows = []
+        for line_id in top:
+            of_line = line == line_id
+            # samples of the line per kernel, a kernel has one sample per stall
+            kernel_counts = np.bincount(kernel[of_line], weights=count[of_line], minlength=len(self.kernels))
+            rows.append((self.files[self.line_files[line_id]], self.line_numbers[line_id], self.line_texts[line_id],
+                         per_line[line_id], per_line[line_id] / total, int(np.count_nonzero(kernel_counts)),
+                         self.kernels[int(kernel_counts.argmax())]))
+        return pd.DataFrame(rows, columns=columns)
+
+
+def update(index_path, source_path, kernel=None):
+    """Add one source report to the index file, creating it if needed."""
+    index = HotspotIndex(index_path)
+    if index.add(source_path, kernel):
+        index.save()
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('index', metavar='INDEX', help='.npz file of the index, created if missing.')
+    parser.add_argument('--add', metavar='SOURCE_CSV', action='append',
+                        help='add the source report of a kernel, can be repeated.')
+    parser.add_argument('--kernel', metavar='NAME',
+                        help='name of the kernel of --add, by default NAME of NAME_s.csv.')
+    parser.add_argument('--remove', metavar='NAME', action='append', help='drop the samples of a kernel.')
+    parser.add_argument('--stall', choices=STALLS, help='rank the lines by this stall, by default by all stalls.')
+    parser.add_argument('-n', '--top', metavar='N', type=int, default=DEFAULT_TOP_LINES,
+                        help='number of lines shown.')
+    parser.add_argument('--file', metavar='REGEX', help='only lines of the files matching REGEX.')
+    parser.add_argument('-l', '--log-level', metavar='LEVEL', default='INFO', help='log level.')
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level)
+    if args.kernel and len(args.add or []) > 1:
+        parser.error("--kernel names a single --add")
+
+    index = HotspotIndex(args.index)
+    changed = False
+    for name in args.remove or []:
+        if index.remove(name):
+            changed = True
+        else:
+            logger.warning("Kernel %s is not in the index", name)
+    for source_path in args.add or []:
+        changed = bool(index.add(source_path, args.kernel)) or changed
+    if changed:
+        index.save()
+    lines = index.top_lines(args.stall, args.top, args.file)
+    if lines.empty:
+        print("No samples found")
+    else:
+        print(lines.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -40,6 +40,10 @@ class Node:
         # 0: show as raw value
         # 1: show as percentage
         self.show_percentage_or_value = SHOW_AS_PERCENTAGE
+        # link of the node in the SVG, e.g. to the tree of the kernel contributing most to it
+        self.url = None
+        # fill color overriding the color of the node type, e.g. in diff trees
+        self.color = None
 
 
     def get_tree_suggestions_str(self) -> str:
@@ -93,6 +97,8 @@ class Node:
 
     def get_color(self) -> str:
         """Get the color of the node."""
+        if getattr(self, 'color', None):
+            return self.color
         if self.type == SUGGESTION_NODE:
             return 'mediumseagreen'
         elif self.type == SOURCE_CODE_NODE:
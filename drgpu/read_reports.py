@@ -1,34 +1,367 @@
 import re
 import os
+import csv
+import contextlib
+import itertools
+import numbers
 import configparser
 from io import StringIO
+import numpy as np
 import pandas as pd
 import logging
+from drgpu import compression
 from drgpu import counters
+from drgpu import heavy_hitters
 from drgpu import source_code_analysis
+from drgpu import trace
 from drgpu.data_struct import Report, Analysis, Stat
 
 logger = logging.getLogger(__name__)
 
+# Columns that identify one kernel launch across several partial ncu runs.
+NCU_KERNEL_KEY_COLUMNS = ["ID", "Kernel Name"]
+# Columns describing the profiling run itself. They legitimately differ between
+# partial runs of the same application, so they never count as conflicts.
+NCU_RUN_METADATA_COLUMNS = ["Process ID", "Process Name", "Host Name", "Kernel Time", "Context", "Stream"]
+# Counters fixed by the launch and the device, they must be identical in every partial report.
+# All other counters are measured again by every run and vary a little.
+NCU_STATIC_COLUMN_PREFIXES = ('launch__', 'device__attribute_')
+# Relative difference of a measured counter between partial reports that is not reported
+MEASURED_COUNTER_TOLERANCE = 0.05
+# Start of the CSV header after the ==PROF== preamble of ncu
+NCU_HEADER_PATTERNS = [re.compile(r'"ID","Process ID","Process Name"'), re.compile(r'ID,Time,API Call ID')]
+# Rows parsed to estimate the memory of one row in iter_kernel_chunks_ncu
+CHUNK_PROBE_ROWS = 64
+
+
+def parse_report_ncu(raw_content, path=''):
+    return read_report_ncu(StringIO(raw_content), path)
+
+
+def read_report_ncu(stream, path=''):
+    """
+    Parse a raw page from a text stream, e.g. compression.open_text of the report. The preamble
+    before the CSV header is skipped with read_header_ncu, the rest is parsed without first
+    reading the whole file into memory.
+    """
+    columns = read_header_ncu(stream, path)
+    with trace.span("read_csv", path=path):
+        raw_counters_df = pd.read_csv(stream, header=None, names=columns, keep_default_na=False)
+    return raw_counters_df
+
+
+def iter_kernel_rows_ncu(stream, path='', kernel_filter=None):
+    """
+    Parse a raw page from a text stream such as stdin or a FIFO and yield every kernel as soon as
+    its row has completely arrived, while ncu may still be writing the following ones.
+    Yields (kernel index, DataFrame of the units row and the kernel row) with the same string
+    values parse_report_ncu gives.
+    """
+    header_line = None
+    for line in stream:
+        for pattern in NCU_HEADER_PATTERNS:
+            match = pattern.search(line)
+            if match:
+                header_line = line[match.start():]
+                break
+        if header_line is not None:
+            break
+    if header_line is None:
+        raise ValueError(f"Report is empty or wrong format. Path: {path}")
+    reader = csv.reader(itertools.chain([header_line], stream))
+    columns = _unique_column_names(next(reader))
+    units = next(reader, None)
+    if units is None:
+        raise ValueError(f"Report has no units row. Path: {path}")
+    for kernel_index, row in enumerate(reader):
+        if len(row) != len(columns):
+            # e.g. the last row of an interrupted export
+            logger.warning("Skipping kernel %d of %s with %d of %d columns", kernel_index, path,
+                           len(row), len(columns))
+            continue
+        raw_counters = pd.DataFrame([units, row], columns=columns)
+        if kernel_filter is not None and not kernel_filter.mask(raw_counters.iloc[1:], [kernel_index])[0]:
+            continue
+        yield kernel_index, raw_counters
+
+
+def read_header_ncu(stream, path=''):
+    """
+    Read a text stream up to the CSV header and return the column names. The stream is left at
+    the units row, it does not need to be seekable.
+    """
+    for line in iter(stream.readline, ''):
+        for pattern in NCU_HEADER_PATTERNS:
+            match = pattern.search(line)
+            if match:
+                return _unique_column_names(next(csv.reader([line[match.start():]])))
+    raise ValueError(f"Report is empty or wrong format. Path: {path}")
+
+
+def iter_kernel_chunks_ncu(path, max_memory=None, chunk_rows=None, kernel_filter=None):
+    """
+    Parse a raw page in chunks of kernel rows, keeping only the counters DrGPU reads.
+    @arg max_memory: approximate bytes of one parsed chunk. The row size is measured on the first
+    rows of the report.
+    @arg chunk_rows: fixed number of kernel rows per chunk, overrides max_memory.
+    @arg kernel_filter: KernelFilter dropping kernels from each chunk as soon as it is parsed.
+    Yields (kernel indexes, DataFrame of the kernel rows without units row) so that only one chunk
+    is in memory at a time.
+    """
+    required = set(counters.required_ncu_columns())
+    if kernel_filter is not None:
+        required |= set(kernel_filter.columns())
+    with compression.open_text(path) as text:
+        columns = read_header_ncu(text, path)
+        reader = pd.read_csv(text, header=None, names=columns, keep_default_na=False, dtype=str,
+                             iterator=True, usecols=lambda column: column in required)
+        with reader:
+            try:
+                with trace.span("read_csv", path=path, rows=CHUNK_PROBE_ROWS + 1):
+                    # the first row is the units row
+                    chunk = reader.get_chunk(CHUNK_PROBE_ROWS + 1).iloc[1:]
+            except StopIteration:
+                return
+            if chunk_rows is None:
+                if max_memory is None:
+                    raise ValueError("Either max_memory or chunk_rows is needed")
+                row_bytes = chunk.memory_usage(deep=True).sum() / max(1, len(chunk))
+                chunk_rows = max(1, int(max_memory // max(1.0, row_bytes)))
+                logger.debug("%s: %d bytes per row, %d rows per chunk", path, row_bytes, chunk_rows)
+            first_kernel = 0
+            while True:
+                indexes = np.arange(first_kernel, first_kernel + len(chunk))
+                first_kernel += len(chunk)
+                if kernel_filter is not None and len(chunk):
+                    keep = kernel_filter.mask(chunk, indexes)
+                    chunk, indexes = chunk[keep], indexes[keep]
+                if len(chunk):
+                    yield indexes.tolist(), chunk.reset_index(drop=True)
+                chunk = None
+                try:
+                    with trace.span("read_csv", path=path, rows=chunk_rows):
+                        chunk = reader.get_chunk(chunk_rows)
+                except StopIteration:
+                    return
+
+
+class KernelFilter:
+    """
+    Predicates selecting kernels of a raw page. They are evaluated on the raw string columns while
+    a report is scanned, so the counters of skipped kernels are never converted.
+    """
+
+    def __init__(self, name=None, short_name=False, launches=None, process=None, min_cycles=None):
+        """
+        @arg name: regex searched in the kernel name.
+        @arg short_name: match name against the name shortened by get_kernel_name.
+        @arg launches: (start, stop) range of kernel indexes, stop is exclusive and may be None.
+        @arg process: process ID or process name.
+        @arg min_cycles: minimum gpc__cycles_elapsed.max of the kernel.
+        """
+        self.name = re.compile(name) if name is not None else None
+        self.short_name = short_name
+        self.launches = launches
+        self.process = str(process) if process is not None else None
+        self.min_cycles = min_cycles
+
+    def columns(self):
+        """Columns of the raw page the predicates read."""
+        columns = []
+        if self.name is not None:
+            columns.append("Kernel Name")
+        if self.process is not None:
+            columns += ["Process ID", "Process Name"]
+        if self.min_cycles is not None:
+            columns.append("gpc__cycles_elapsed.max")
+        return columns
+
+    def mask(self, kernel_rows, indexes):
+        """
+        Evaluate the predicates on kernel rows (without the units row) at once.
+        @arg indexes: kernel index of every row.
+        @return: numpy bool array, True for the kernels to keep.
+        """
+        missing = [column for column in self.columns() if column not in kernel_rows.columns]
+        if missing:
+            raise ValueError(f"The report has no column {', '.join(missing)} to filter kernels")
+        keep = np.ones(len(kernel_rows), dtype=bool)
+        if self.launches is not None:
+            indexes = np.asarray(indexes)
+            start, stop = self.launches
+            keep &= indexes >= start
+            if stop is not None:
+                keep &= indexes < stop
+        if self.name is not None:
+            names = kernel_rows["Kernel Name"].astype(str)
+            if self.short_name:
+                names = names.map(get_kernel_name)
+            keep &= names.str.contains(self.name).to_numpy(dtype=bool)
+        if self.process is not None:
+            keep &= ((kernel_rows["Process ID"].astype(str) == self.process)
+                     | (kernel_rows["Process Name"].astype(str) == self.process)).to_numpy(dtype=bool)
+        if self.min_cycles is not None:
+            cycles = kernel_rows["gpc__cycles_elapsed.max"]
+            if not pd.api.types.is_numeric_dtype(cycles):
+                cycles = pd.to_numeric(cycles.astype(str).str.replace(',', '', regex=False), errors='coerce')
+            keep &= (cycles >= self.min_cycles).to_numpy(dtype=bool)
+        return keep
+
+    def select(self, raw_counters_df, units_row=True):
+        """Kernel ids of a parsed raw page which pass the predicates."""
+        kernel_rows = raw_counters_df.iloc[1:] if units_row else raw_counters_df
+        indexes = np.arange(len(kernel_rows))
+        return indexes[self.mask(kernel_rows, indexes)].tolist()
+
+
+def _unique_column_names(names):
+    """Rename duplicate columns to name.1, name.2, ... like pd.read_csv."""
+    seen = {}
+    unique = []
+    for name in names:
+        if name in seen:
+            seen[name] += 1
+            name = "%s.%d" % (name, seen[name])
+        else:
+            seen[name] = 0
+        unique.append(name)
+    return unique
+
+
+def _read_report_file_ncu(path):
+    with compression.open_text(path) as text:
+        return read_report_ncu(text, path)
+
+
 def fill_report_ncu(report):
+    if getattr(report, 'raw_counters', None) is not None:
+        return report.raw_counters
     if getattr(report, 'report_content', None) is not None:
-        raw_content = report.report_content
+        raw_counters_df = parse_report_ncu(report.report_content, report.path)
     else:
-        with open(report.path, 'r', encoding='utf-8') as fin:
-            raw_content = fin.read()
-    reg = re.compile(r'"ID","Process ID","Process Name"[\s\S]+')
-    content = reg.findall(raw_content)
-    if not content:
-        reg2 = re.compile(r'ID,Time,API Call ID[\s\S]+')
-        content = reg2.findall(raw_content)
-        if not content:
-            raise ValueError(f"Report is empty or wrong format. Path: {report.path}")
-    raw_counters_df = pd.read_csv(StringIO(content[0]), keep_default_na=False)
+        raw_counters_df = _read_report_file_ncu(report.path)
+    partial_paths = getattr(report, 'partial_report_paths', None) or []
+    partial_contents = getattr(report, 'partial_report_contents', None) or [None] * len(partial_paths)
+    if partial_paths:
+        frames = [raw_counters_df]
+        for partial_path, partial_content in zip(partial_paths, partial_contents):
+            if partial_content is None:
+                frames.append(_read_report_file_ncu(partial_path))
+            else:
+                frames.append(parse_report_ncu(partial_content, partial_path))
+        with trace.span("merge_reports"):
+            raw_counters_df = merge_reports_ncu(frames, [report.path] + list(partial_paths),
+                                                on_conflict=report.on_conflict)
     return raw_counters_df
 
 
-def select_all_counters_ncu(raw_counters_df, stats, kernel_id):
-    raw_counters_df_first = raw_counters_df[kernel_id + 1:kernel_id + 2]
+def _kernel_rows_by_key(raw_counters_df, name):
+    """Index the kernel rows (everything after the units row) by ID, name and launch index."""
+    for column in NCU_KERNEL_KEY_COLUMNS:
+        if column not in raw_counters_df.columns:
+            raise ValueError(f"Partial report {name} has no '{column}' column to join on")
+    kernel_rows = raw_counters_df.iloc[1:]
+    # n-th launch of the same kernel in this report
+    launch_index = kernel_rows.groupby("Kernel Name", sort=False).cumcount()
+    key = pd.MultiIndex.from_arrays([kernel_rows["ID"].astype(str), kernel_rows["Kernel Name"], launch_index],
+                                    names=NCU_KERNEL_KEY_COLUMNS + ["launch"])
+    return kernel_rows.set_axis(key, axis=0)
+
+
+def _measured_conflicts(first, second, tolerance):
+    """Which values of two columns of a measured counter differ by more than the relative tolerance."""
+    conflicts = first.astype(str).values != second.astype(str).values
+    first_values, second_values = (pd.to_numeric(column.astype(str).str.replace(',', '', regex=False),
+                                                 errors='coerce').to_numpy(dtype=float)
+                                   for column in (first, second))
+    numeric = ~np.isnan(first_values) & ~np.isnan(second_values)
+    conflicts[numeric] = ~np.isclose(first_values[numeric], second_values[numeric], rtol=tolerance, atol=0)
+    return conflicts
+
+
+def merge_reports_ncu(raw_counters_dfs, names=None, on_conflict='error', tolerance=MEASURED_COUNTER_TOLERANCE):
+    """
+    Join several raw pages of the same application into one counter set.
+    Kernels are matched by ID, kernel name and launch index. Kernels which are not present in
+    every partial report are dropped. A counter collected by more than one report must have the
+    same unit in all of them, and launch and device attributes the same value. The value of the
+    earliest report is kept for measured counters, which differ between runs; a difference
+    beyond the tolerance is logged.
+    @arg on_conflict: 'error' raises ValueError on a conflicting unit or static attribute, 'first'
+    keeps the value of the earliest report and logs a warning.
+    @arg tolerance: relative difference of a measured counter logged as a warning.
+    """
+    if on_conflict not in ('error', 'first'):
+        raise ValueError(f"Unknown conflict policy: {on_conflict}")
+    if names is None:
+        names = ["report %d" % i for i in range(len(raw_counters_dfs))]
+    merged_units = raw_counters_dfs[0].iloc[:1].reset_index(drop=True)
+    merged_rows = _kernel_rows_by_key(raw_counters_dfs[0], names[0])
+    for name, raw_counters_df in zip(names[1:], raw_counters_dfs[1:]):
+        units = raw_counters_df.iloc[:1].reset_index(drop=True)
+        rows = _kernel_rows_by_key(raw_counters_df, name)
+        common_keys = merged_rows.index[merged_rows.index.isin(rows.index)]
+        if len(common_keys) != len(merged_rows) or len(common_keys) != len(rows):
+            logger.warning("%d kernels are not present in every partial report and are dropped after merging %s",
+                           len(merged_rows) + len(rows) - 2 * len(common_keys), name)
+        merged_rows = merged_rows.loc[common_keys]
+        rows = rows.loc[common_keys]
+        new_columns = []
+        for column in rows.columns:
+            if column not in merged_rows.columns:
+                new_columns.append(column)
+                continue
+            if column in NCU_KERNEL_KEY_COLUMNS or column in NCU_RUN_METADATA_COLUMNS:
+                continue
+            unit_conflict = str(merged_units.at[0, column]) != str(units.at[0, column])
+            if unit_conflict or column.startswith(NCU_STATIC_COLUMN_PREFIXES):
+                conflicts = merged_rows[column].astype(str).values != rows[column].astype(str).values
+            else:
+                conflicts = _measured_conflicts(merged_rows[column], rows[column], tolerance)
+                if conflicts.any():
+                    first = conflicts.argmax()
+                    logger.warning("Counter %s differs by more than %g%% between partial reports in %d kernels "
+                                   "(%s, kernel %s: %r vs %r). Keep the first value.", column, tolerance * 100,
+                                   conflicts.sum(), name, common_keys[first][1], merged_rows[column].iat[first],
+                                   rows[column].iat[first])
+                continue
+            if conflicts.any() or unit_conflict:
+                if unit_conflict:
+                    detail = "unit %r vs %r" % (merged_units.at[0, column], units.at[0, column])
+                else:
+                    first = conflicts.argmax()
+                    detail = "kernel %s: %r vs %r" % (common_keys[first][1], merged_rows[column].iat[first],
+                                                      rows[column].iat[first])
+                if on_conflict == 'error':
+                    raise ValueError(f"Counter {column} conflicts between partial reports ({name}, {detail})")
+                logger.warning("Counter %s conflicts between partial reports (%s, %s). Keep the first value.",
+                               column, name, detail)
+        merged_units = pd.concat([merged_units, units[new_columns]], axis=1)
+        merged_rows = pd.concat([merged_rows, rows[new_columns]], axis=1)
+    return pd.concat([merged_units, merged_rows.reset_index(drop=True)], ignore_index=True)
+
+
+def kernel_row_ncu(raw_counters, kernel_id, units_row=True):
+    """
+    Get the row of one kernel as a one-row DataFrame indexed by kernel_id + 1, like in a parsed raw page.
+    @arg raw_counters: pandas DataFrame or pyarrow Table of the raw page. Only the counters DrGPU
+    reads are converted from an Arrow table.
+    @arg units_row: whether the first row holds the units of the counters as in the ncu CSV.
+    """
+    position = kernel_id + 1 if units_row else kernel_id
+    if hasattr(raw_counters, 'column_names'):
+        # pyarrow.Table, project before converting so unused columns are never copied
+        columns = [column for column in counters.required_ncu_columns() if column in raw_counters.column_names]
+        kernel_row = raw_counters.slice(position, 1).select(columns).to_pandas()
+    else:
+        kernel_row = raw_counters[position:position + 1]
+    if len(kernel_row) == 0:
+        raise ValueError(f"There is no kernel with ID {kernel_id} in the report")
+    return kernel_row.set_axis([kernel_id + 1], axis=0)
+
+
+def select_all_counters_ncu(raw_counters_df, stats, kernel_id, units_row=True):
+    raw_counters_df_first = kernel_row_ncu(raw_counters_df, kernel_id, units_row)
     missing = False
     for counter_name, counter_value in counters.counters_name_map_for_ncu.items():
         cname_in_ncu = counter_value[0]
@@ -156,12 +489,63 @@ def fill_missing_counters_ncu(raw_counters_df_first, stats, kernel_id):
                                             0 * (inst_mem_32b / inst_mem_Xb))
 
 
+def numeric_columns_ncu(kernel_rows, columns):
+    """The counters of all kernels as float arrays, parsed like convert_raw_item."""
+    values = {}
+    for column in columns:
+        if column not in kernel_rows.columns:
+            raise ValueError(f"The report doesn't have the counter {column}")
+        column_values = kernel_rows[column]
+        if not pd.api.types.is_numeric_dtype(column_values):
+            column_values = pd.to_numeric(column_values.astype(str).str.replace(',', '', regex=False),
+                                          errors='coerce')
+        # 'nan' counters read as 0
+        values[column] = column_values.astype(float).fillna(0).to_numpy()
+    return values
+
+
+def memory_model_columns_ncu(raw_counters, units_row=True):
+    """
+    The stats of unit_hunt.memory_model for every kernel of a raw page, with the same derived
+    and missing counters as select_all_counters_ncu and fill_missing_counters_ncu.
+    @arg raw_counters: pandas DataFrame or pyarrow Table of the raw page.
+    @return: {stat name: array over kernels}
+    """
+    names = {name: counters.counters_name_map_for_ncu[name][0]
+             for name in ("elapsedClocks", "l1tex_hit_rate", "l2_hit_rate", "l1tex__t_set_accesses",
+                          "l1tex__t_requests", "gnic_read_sectors_postcoalescing", "fb_total_bytes")}
+    memory_bytes = ["sm__sass_inst_executed_op_memory_%s.sum" % size for size in ("8b", "16b", "32b", "64b", "128b")]
+    global_ld = "sm__sass_inst_executed_op_global_ld.sum"
+    needed = list(names.values()) + memory_bytes + [global_ld]
+    if hasattr(raw_counters, 'column_names'):
+        # pyarrow.Table
+        raw_counters = raw_counters.select([column for column in needed if column in raw_counters.column_names]
+                                           ).to_pandas()
+    kernel_rows = raw_counters.iloc[1:] if units_row else raw_counters
+    values = numeric_columns_ncu(kernel_rows, needed)
+    kernels = len(kernel_rows)
+    columns = {name: values[column] for name, column in names.items()}
+    columns["l1_lines_per_instruction_avg"] = columns.pop("l1tex__t_set_accesses") / columns.pop("l1tex__t_requests")
+    inst_mem_32b = values[memory_bytes[0]] + values[memory_bytes[1]] + values[memory_bytes[2]]
+    inst_mem_xb = inst_mem_32b + values[memory_bytes[3]] + values[memory_bytes[4]]
+    for bits, inst_mem in (("32", inst_mem_32b), ("64", values[memory_bytes[3]]), ("128", values[memory_bytes[4]])):
+        columns["inst_mem_gld_%sb" % bits] = values[global_ld] * (inst_mem / inst_mem_xb)
+        columns["inst_mem_geld_%sb" % bits] = np.zeros(kernels)
+    # counters ncu doesn't provide, see fill_missing_counters_ncu
+    for name, value in (("ltp_utlb_hit", 1), ("ltp_utlb_miss", 1), ("gpcl1_tlb_hit", 1), ("gpcl1_tlb_miss", 0),
+                        ("gnic_lg_read_requests_precoalescing", 1), ("gnic_lg_read_requests_postcoalescing", 1),
+                        ("mmu_ack_latency", -1), ("gnic_latency", -1), ("average_latency_reads", -1)):
+        columns[name] = np.full(kernels, value, dtype=float)
+    return columns
+
+
 def fill_stats(stats, report):
     """
     @arg stats: We store all stats(hw counters) in this argument.
     """
     raw_counters_df = fill_report_ncu(report)
-    select_all_counters_ncu(raw_counters_df, stats, report.kernel_id)
+    select_all_counters_ncu(raw_counters_df, stats, report.kernel_id,
+                            getattr(report, 'raw_counters_units_row', True))
 
 
 def read_config(config_source, config, *, source_name=None):
@@ -247,6 +631,9 @@ def collect_lines(handle):
 
 
 def fill_source_report(report: Report, analysis: Analysis):
+    if getattr(report, 'source_summary_size', None):
+        fill_source_report_summary(report, analysis, report.source_summary_size)
+        return
     if getattr(report, 'source_report_content', None) is not None:
         source_report_content = collect_lines(StringIO(report.source_report_content))
     else:
@@ -254,9 +641,10 @@ def fill_source_report(report: Report, analysis: Analysis):
             raise ValueError(
                 "Source report path is not provided and no in-memory content available."
             )
-        with open(report.source_report_path, 'r', encoding='utf-8') as stream:
+        with compression.open_text(report.source_report_path) as stream:
             source_report_content = collect_lines(stream)
-    source_df = pd.read_csv(StringIO(source_report_content))
+    with trace.span("read_csv", path=report.source_report_path):
+        source_df = pd.read_csv(StringIO(source_report_content))
     for i in range(len(source_df)):
         analysis.source_lines.append(None)
     current_filename = source_df.iat[0, 1]
@@ -288,6 +676,88 @@ def fill_source_report(report: Report, analysis: Analysis):
                 analysis.stall_sass_code[stall_reason_value] = new_dict
 
 
+def _source_rows(handle):
+    """The lines of the source report until the next page, like collect_lines."""
+    for line_num, line in enumerate(handle):
+        if line.startswith('#') and line_num > 0:
+            return
+        yield line
+
+
+def _source_number(value):
+    value = value.strip()
+    return float(value.replace(',', '')) if value else np.nan
+
+
+def iter_source_rows(handle, path=None):
+    """
+    Read a source report row by row.
+    @arg handle: text stream of the source report.
+    @return: iterator of (line id, Source_Code_Line, counts) of every instruction, with the line id
+    of fill_source_report and the counts of the stall columns of
+    source_code_analysis.stalls_mapping_to_detail_report in its order, NaN where empty.
+    """
+    stall_columns = list(source_code_analysis.stalls_mapping_to_detail_report)
+    reader = csv.reader(_source_rows(handle))
+    header = next(reader, None)
+    if header is None:
+        raise ValueError(f"Source report is empty. Path: {path}")
+    missing = [column for column in ['#', 'Source'] + stall_columns if column not in header]
+    if missing:
+        raise ValueError(f"Source report lacks the columns {', '.join(missing)}. Path: {path}")
+    line_column = header.index('#')
+    source_column = header.index('Source')
+    value_columns = [header.index(column) for column in stall_columns]
+    current_filename = None
+    for line_id, row in enumerate(reader):
+        raw_line_content = row[source_column].strip() if row[source_column] else np.nan
+        if line_id == 0:
+            current_filename = row[1]
+            continue
+        x = row[line_column].strip()
+        if not x:
+            current_filename = raw_line_content
+            continue
+        try:
+            line_number = int(float(x))
+        except ValueError:
+            raise ValueError(f"Line number is not a number: {x!r}") from None
+        code_line = source_code_analysis.Source_Code_Line(raw_line_content, line_number, current_filename)
+        yield line_id, code_line, [_source_number(row[column]) for column in value_columns]
+
+
+def fill_source_report_summary(report: Report, analysis: Analysis, summary_size):
+    """
+    fill_source_report for source reports too large to keep every instruction. The report is read
+    row by row and only a SpaceSaving summary of summary_size instructions is kept per stall
+    reason, so memory doesn't grow with the report. stall_sass_code and source_lines hold the
+    monitored instructions, stall_sass_totals the exact count of all instructions and
+    stall_sass_errors the largest overestimate of every monitored count.
+    """
+    if getattr(report, 'source_report_content', None) is not None:
+        opened = contextlib.nullcontext(StringIO(report.source_report_content))
+    elif report.source_report_path:
+        opened = compression.open_text(report.source_report_path)
+    else:
+        raise ValueError("Source report path is not provided and no in-memory content available.")
+    stalls = list(source_code_analysis.stalls_mapping_to_detail_report.values())
+    summaries = [heavy_hitters.SpaceSaving(summary_size) for _ in stalls]
+    with opened as handle, trace.span("read_source_summary", path=report.source_report_path):
+        for line_id, code_line, counts in iter_source_rows(handle, report.source_report_path):
+            for summary, count in zip(summaries, counts):
+                summary.add(line_id, count, code_line)
+    analysis.source_lines = {}
+    for stall, summary in zip(stalls, summaries):
+        monitored = summary.top()
+        analysis.stall_sass_code[stall] = {line_id: count for line_id, count, _, _ in monitored}
+        analysis.stall_sass_errors[stall] = {line_id: error for line_id, _, error, _ in monitored}
+        analysis.stall_sass_totals[stall] = summary.total
+        analysis.source_lines.update((line_id, line) for line_id, _, _, line in monitored)
+        if summary.max_error():
+            logger.debug("%s: %d instructions kept, counts overestimated by at most %.4g of %.4g",
+                         stall, len(monitored), summary.max_error(), summary.total)
+
+
 def convert_raw_item(aitem, as_type=float):
     if aitem == 'nan':
         return 0
@@ -295,6 +765,9 @@ def convert_raw_item(aitem, as_type=float):
 
     if real_type in [float, int]:
         return aitem
+    elif isinstance(aitem, numbers.Number):
+        # numpy scalars of typed DataFrame or Arrow input
+        return aitem.item() if hasattr(aitem, 'item') else aitem
     elif real_type == str:
         if as_type == str:
             return aitem
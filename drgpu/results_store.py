@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Store DrGPU analyses in a SQLite database and query them across runs.
+
+Every analyzed kernel becomes one row of `analyses` (report, kernel, bottleneck unit, idle share
+of the cycles) with its key counters, Memory_Metrics fields, first level stall breakdown and
+suggestions in child tables. Rows are buffered and inserted in batches, the database runs in WAL
+mode so queries don't block a running analysis.
+
+    ./main.py -i app.csv --store drgpu.db
+    python -m drgpu.results_store drgpu.db --bottleneck l2 --since 2026-09-01
+"""
+import argparse
+import datetime
+import logging
+import numbers
+import sqlite3
+import threading
+
+import pandas as pd
+
+from drgpu import read_reports
+from drgpu.node import NORMAL_TREE_NODE
+
+logger = logging.getLogger(__name__)
+
+# all_stats entries stored for every kernel
+KEY_COUNTERS = ['elapsedClocks', 'issueIPC', 'retireIPC', 'activewarps_per_activecycle', 'theoretical_active_warps',
+                'launch_block_size', 'register_per_thread', 'sol_sm', 'sol_l1', 'sol_l2', 'sol_dram',
+                'sol_compute_memory', 'l1tex_hit_rate', 'l2_hit_rate', 'fb_total_bytes', 'dram_throughput']
+# analyses buffered before they are written in one transaction
+DEFAULT_BATCH_SIZE = 64
+DETAIL_TABLES = ['counters', 'memory_metrics', 'stalls', 'suggestions']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    created TEXT NOT NULL,
+    report TEXT,
+    kernel_id INTEGER,
+    kernel_name TEXT,
+    output TEXT,
+    bottleneck TEXT,
+    idle REAL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    analysis_id INTEGER NOT NULL REFERENCES analyses(id),
+    name TEXT NOT NULL,
+    value REAL
+);
+CREATE TABLE IF NOT EXISTS memory_metrics (
+    analysis_id INTEGER NOT NULL REFERENCES analyses(id),
+    name TEXT NOT NULL,
+    value REAL
+);
+CREATE TABLE IF NOT EXISTS stalls (
+    analysis_id INTEGER NOT NULL REFERENCES analyses(id),
+    stall TEXT NOT NULL,
+    percentage REAL
+);
+CREATE TABLE IF NOT EXISTS suggestions (
+    analysis_id INTEGER NOT NULL REFERENCES analyses(id),
+    position INTEGER NOT NULL,
+    stall TEXT,
+    suggestion TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analyses_kernel_name ON analyses(kernel_name);
+CREATE INDEX IF NOT EXISTS analyses_report ON analyses(report);
+CREATE INDEX IF NOT EXISTS analyses_bottleneck ON analyses(bottleneck);
+CREATE INDEX IF NOT EXISTS counters_analysis ON counters(analysis_id);
+CREATE INDEX IF NOT EXISTS memory_metrics_analysis ON memory_metrics(analysis_id);
+CREATE INDEX IF NOT EXISTS stalls_analysis ON stalls(analysis_id);
+CREATE INDEX IF NOT EXISTS suggestions_analysis ON suggestions(analysis_id);
+"""
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, numbers.Real):
+        return None
+    return float(value)
+
+
+def memory_metric_fields(memory_metrics):
+    """The numeric Memory_Metrics fields as (name, value), throughputs as throughput_UNIT."""
+    fields = []
+    for name, value in vars(memory_metrics).items():
+        if isinstance(value, dict):
+            fields.extend(("%s_%s" % (name.removesuffix('s'), key), _number(item)) for key, item in value.items())
+        elif _number(value) is not None or value is None:
+            fields.append((name, _number(value)))
+    return fields
+
+
+def analysis_record(report, hw_tree, analysis, memory_metrics, output=None):
+    """
+    The rows of one analyzed kernel.
+    Returns:
+        The analyses row without id and the counters, memory_metrics, stalls and suggestions rows
+        without analysis_id.
+    """
+    all_stats = analysis.all_stats
+    kernel_name = all_stats.get('kernel_name')
+    row = (datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+           str(report.path) if report.path else None, report.kernel_id,
+           read_reports.get_kernel_name(kernel_name.value) if kernel_name else None, output,
+           analysis.bottleneck_unit, _number(hw_tree.percentage))
+    counters = [(name, _number(all_stats[name].value)) for name in KEY_COUNTERS if name in all_stats]
+    stalls = [(node.name, _number(node.percentage)) for node in hw_tree.child if node.type == NORMAL_TREE_NODE]
+    suggestions = []
+    for position, suggestion in enumerate(hw_tree.get_tree_suggestions()):
+        label = suggestion.suggestion.get_label(linewidth=None).replace("\\n", " ")
+        suggestions.append((position, suggestion.data.name if suggestion.data is not None else None, label))
+    return row, {'counters': counters, 'memory_metrics': memory_metric_fields(memory_metrics),
+                 'stalls': stalls, 'suggestions': suggestions}
+
+
+class ResultsStore:
+    """
+    SQLite sink of analyses. Use it as a context manager or call close() to write the last batch.
+    A store can be shared by the threads of a batch, the buffer and the connection are used under
+    one lock.
+    """
+
+    def __init__(self, path, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.pending = []
+        # guards pending and the connection, analyses are buffered by several threads
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # WAL makes NORMAL safe against corruption, a crash only loses the last transactions
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, report, hw_tree, analysis, memory_metrics, output=None):
+        """Buffer the analysis of one kernel, the batch is written when it is full."""
+        record = analysis_record(report, hw_tree, analysis, memory_metrics, output)
+        with self.lock:
+            self.pending.append(record)
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+
+    def flush(self):
+        """Write the buffered analyses in one transaction."""
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if not self.pending:
+            return
+        details = {table: [] for table in DETAIL_TABLES}
+        with self.connection:
+            for row, record in self.pending:
+                analysis_id = self.connection.execute(
+                    "INSERT INTO analyses (created, report, kernel_id, kernel_name, output, bottleneck, idle) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", row).lastrowid
+                for table in DETAIL_TABLES:
+                    details[table].extend((analysis_id,) + detail for detail in record[table])
+            self.connection.executemany("INSERT INTO counters VALUES (?, ?, ?)", details['counters'])
+            self.connection.executemany("INSERT INTO memory_metrics VALUES (?, ?, ?)", details['memory_metrics'])
+            self.connection.executemany("INSERT INTO stalls VALUES (?, ?, ?)", details['stalls'])
+            self.connection.executemany("INSERT INTO suggestions VALUES (?, ?, ?, ?)", details['suggestions'])
+        logger.debug("Stored %d analyses in %s", len(self.pending), self.path)
+        self.pending = []
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.connection.close()
+
+
+def query(connection, kernel=None, report=None, bottleneck=None, since=None, until=None, limit=None):
+    """
+    The analyses matching all given filters, newest first.
+    Args:
+        connection: An sqlite3 connection to the store.
+        kernel: SQL LIKE pattern of the kernel name, e.g. 'gemm%'.
+        report: SQL LIKE pattern of the report path.
+        bottleneck: Memory bottleneck unit: l1, utlb, l1tlb, l2 or fb.
+        since: Earliest creation time, 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS' in UTC.
+        until: Creation time before which analyses are returned, same format.
+        limit: Maximum number of analyses.
+    Returns:
+        A DataFrame with one row per analysis.
+    """
+    conditions = []
+    params = []
+    for column, operator, value in [('kernel_name', 'LIKE', kernel), ('report', 'LIKE', report),
+                                    ('bottleneck', '=', bottleneck), ('created', '>=', since),
+                                    ('created', '<', until)]:
+        if value is not None:
+            conditions.append("%s %s ?" % (column, operator))
+            params.append(value)
+    sql = "SELECT * FROM analyses"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY created DESC, id DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    return pd.read_sql_query(sql, connection, params=params)
+
+
+def details(connection, table, analysis_ids):
+    """The rows of a detail table (see DETAIL_TABLES) of the given analyses."""
+    if table not in DETAIL_TABLES:
+        raise ValueError(f"Unknown detail table {table}, expected one of {', '.join(DETAIL_TABLES)}")
+    analysis_ids = [int(analysis_id) for analysis_id in analysis_ids]
+    if not analysis_ids:
+        return pd.DataFrame()
+    placeholders = ", ".join("?" * len(analysis_ids))
+    return pd.read_sql_query(f"SELECT * FROM {table} WHERE analysis_id IN ({placeholders}) ORDER BY analysis_id",
+                             connection, params=analysis_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('database', metavar='DB', help='SQLite database written by main.py --store.')
+    parser.add_argument('--kernel', metavar='PATTERN', help="kernel name, SQL LIKE pattern such as 'gemm%%'.")
+    parser.add_argument('--report', metavar='PATTERN', help='report path, SQL LIKE pattern.')
+    parser.add_argument('--bottleneck', metavar='UNIT', help='memory bottleneck unit: l1, utlb, l1tlb, l2 or fb.')
+    parser.add_argument('--since', metavar='DATE', help='analyses created at or after DATE (UTC).')
+    parser.add_argument('--until', metavar='DATE', help='analyses created before DATE (UTC).')
+    parser.add_argument('--limit', metavar='N', type=int, help='show at most N analyses.')
+    parser.add_argument('--details', choices=DETAIL_TABLES, action='append',
+                        help='also show this table for the analyses found, can be repeated.')
+    parser.add_argument('--count', action='store_true', help='only count the analyses per bottleneck unit.')
+    args = parser.parse_args()
+
+    connection = sqlite3.connect(args.database)
+    try:
+        found = query(connection, args.kernel, args.report, args.bottleneck, args.since, args.until, args.limit)
+        if args.count:
+            print(found.groupby('bottleneck', dropna=False).size().rename('analyses').to_string())
+            return
+        if found.empty:
+            print("No analyses found")
+            return
+        print(found.to_string(index=False))
+        for table in args.details or []:
+            print("\n" + table)
+            print(details(connection, table, found['id']).to_string(index=False))
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
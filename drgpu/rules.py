@@ -0,0 +1,164 @@
+"""
+Declarative threshold rules of the suggestions.
+
+Every rule compares one metric of a kernel with a threshold. The metrics of many kernels form a
+kernels x metrics matrix and the whole rule table is evaluated on it with NumPy masks; the
+suggestion functions then only look up whether a rule fired for their kernel. Thresholds may be
+arrays broadcasting against the kernels, e.g. to evaluate a grid of configurations at once.
+"""
+import operator
+
+import numpy as np
+
+# Metrics of a kernel the rules read, in the column order of the metric matrix.
+RULE_METRICS = [
+    "activewarps_per_activecycle",
+    "launch_block_size",
+    # sm__average_thread_inst_executed_pred_on_per_inst_executed_realtime or its newer counterpart
+    "thread_per_inst_executed",
+    "not_predicated_off_thread_per_inst_executed",
+    "l1_throughput_per_cycle",
+    "l1_hit_rate",
+    "l1_conflict_rate",
+    "l1_lines_per_instruction",
+    # warp_size * bpl1 / BYTES_PER_L1_INSTRUCTION, a threshold depending on the kernel
+    "high_l1_lines_per_instruction",
+    "utlb_miss_rate",
+    "l2_bank_conflict_rate",
+    "l2_miss_rate",
+    "access_per_activate",
+    "average_dram_banks",
+    "compress_rate",
+    "shared_ld_conflict_per_request",
+    "shared_st_conflict_per_request",
+    # average bytes per global load, for recomputing high_l1_lines_per_instruction in sweeps
+    "bpl1",
+]
+METRIC_INDEX = {name: i for i, name in enumerate(RULE_METRICS)}
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+}
+
+# rule name: (metric, operator, threshold). The threshold is a Configuration attribute, a
+# metric of RULE_METRICS or a number. A missing metric (NaN) never fires.
+THRESHOLD_RULES = {
+    "low_activewarps_per_activecycle": ("activewarps_per_activecycle", '<', "low_activewarps_per_activecycle"),
+    "block_larger_than_warp": ("launch_block_size", '>', "warp_size"),
+    # @todo need fix. The newest version(2021.1.0) of ncu has changed this counter.
+    "barrier_thread_divergence": ("thread_per_inst_executed", '<', 17),
+    "branch_thread_divergence": ("not_predicated_off_thread_per_inst_executed", '<',
+                                 "high_not_predicated_off_thread_per_inst_executed"),
+    "high_l1_throughput": ("l1_throughput_per_cycle", '>=', "high_l1_throughput"),
+    "high_l1_hit_rate": ("l1_hit_rate", '>', "high_l1_hit_rate"),
+    "low_l1_hit_rate": ("l1_hit_rate", '<', "low_l1_hit_rate"),
+    "high_l1_conflict_rate": ("l1_conflict_rate", '>', "high_l1_conflict_rate"),
+    "high_l1_lines_per_instruction": ("l1_lines_per_instruction", '>', "high_l1_lines_per_instruction"),
+    "high_utlb_miss_rate": ("utlb_miss_rate", '>=', "high_utlb_miss_rate"),
+    "high_l2_bank_conflict_rate": ("l2_bank_conflict_rate", '>', "high_l2_bank_conflict_rate"),
+    "high_l2_miss_rate": ("l2_miss_rate", '>=', "high_l2_miss_rate"),
+    "low_access_per_activate": ("access_per_activate", '<', "low_access_per_activate"),
+    "low_bank_per_access": ("average_dram_banks", '<', "low_bank_per_access"),
+    "no_compression": ("compress_rate", '==', 0),
+    "low_compress_rate": ("compress_rate", '<=', "low_compress_rate"),
+    "high_shared_ld_conflict": ("shared_ld_conflict_per_request", '>', "conflict_high_threshold"),
+    "high_shared_st_conflict": ("shared_st_conflict_per_request", '>', "conflict_high_threshold"),
+}
+
+
+def _value(x):
+    if x is None:
+        return np.nan
+    return float(x)
+
+
+def _stat_value(stats, name):
+    stat = stats.get(name, None)
+    return stat.value if stat else None
+
+
+def kernel_metrics(stats, memory_metrics, config):
+    """
+    The row of one kernel in the metric matrix.
+    @arg stats: all_stats of the kernel after unit_hunt.
+    @arg memory_metrics: Memory_Metrics of the kernel.
+    """
+    metrics = dict.fromkeys(RULE_METRICS)
+    metrics["activewarps_per_activecycle"] = _stat_value(stats, 'activewarps_per_activecycle')
+    metrics["launch_block_size"] = _stat_value(stats, 'launch_block_size')
+    thread_per_inst_executed = stats.get('not_predicated_off_thread_per_inst_executed', None) \
+        or stats.get('not_predicated_off_thread_per_inst_executed2', None)
+    metrics["thread_per_inst_executed"] = thread_per_inst_executed.value if thread_per_inst_executed else None
+    metrics["not_predicated_off_thread_per_inst_executed"] = \
+        _stat_value(stats, 'not_predicated_off_thread_per_inst_executed')
+    elapsed_clocks = _stat_value(stats, 'elapsedClocks')
+    l1_throughput = memory_metrics.throughputs.get('l1')
+    if l1_throughput is not None and elapsed_clocks:
+        metrics["l1_throughput_per_cycle"] = l1_throughput / elapsed_clocks
+    for name in ("l1_hit_rate", "l1_conflict_rate", "l1_lines_per_instruction", "utlb_miss_rate",
+                 "l2_bank_conflict_rate", "l2_miss_rate", "access_per_activate", "average_dram_banks",
+                 "compress_rate", "shared_ld_conflict_per_request", "shared_st_conflict_per_request", "bpl1"):
+        metrics[name] = getattr(memory_metrics, name)
+    if memory_metrics.bpl1 is not None:
+        metrics["high_l1_lines_per_instruction"] = \
+            config.warp_size * memory_metrics.bpl1 / config.BYTES_PER_L1_INSTRUCTION
+    return np.array([_value(metrics[name]) for name in RULE_METRICS], dtype=float)
+
+
+def metric_matrix(rows):
+    """Stack kernel_metrics rows into the kernels x metrics matrix."""
+    if not len(rows):
+        return np.empty((0, len(RULE_METRICS)))
+    return np.vstack(rows)
+
+
+def metric_values(metric, matrix, metrics=None):
+    if metrics and metric in metrics:
+        return metrics[metric]
+    return matrix[:, METRIC_INDEX[metric]]
+
+
+def threshold_value(threshold, matrix, config, overrides=None, metrics=None):
+    if not isinstance(threshold, str):
+        return threshold
+    if overrides and threshold in overrides:
+        return overrides[threshold]
+    if threshold in METRIC_INDEX:
+        return metric_values(threshold, matrix, metrics)
+    return getattr(config, threshold)
+
+
+def evaluate(matrix, config, overrides=None, rules=None, metrics=None):
+    """
+    Evaluate the rule table on all kernels at once.
+    @arg matrix: kernels x RULE_METRICS matrix.
+    @arg overrides: {threshold name: value or array} replacing Configuration attributes. Arrays
+    need a shape broadcasting against (kernels,), e.g. (points, 1) for a grid of thresholds.
+    @arg rules: the rule table, THRESHOLD_RULES by default.
+    @arg metrics: {metric name: array} replacing columns of the matrix, e.g. metrics depending
+    on swept Configuration constants.
+    @return: {rule name: boolean mask}, of shape (kernels,) or the broadcast shape.
+    """
+    rules = THRESHOLD_RULES if rules is None else rules
+    fired = {}
+    with np.errstate(invalid='ignore'):
+        for name, (metric, op, threshold) in rules.items():
+            values = metric_values(metric, matrix, metrics)
+            limit = threshold_value(threshold, matrix, config, overrides, metrics)
+            fired[name] = OPERATORS[op](values, limit)
+    return fired
+
+
+def kernel_rules(fired, kernel):
+    """The rules of one kernel of evaluate(), as {rule name: bool}."""
+    return {name: bool(mask[kernel]) for name, mask in fired.items()}
+
+
+def evaluate_kernel(stats, memory_metrics, config):
+    """Evaluate the rule table on one kernel, returns {rule name: bool}."""
+    matrix = metric_matrix([kernel_metrics(stats, memory_metrics, config)])
+    return kernel_rules(evaluate(matrix, config), 0)
@@ -0,0 +1,457 @@
+"""
+Compact, versioned binary format of DrGPU results.
+
+A result file holds any of the decision tree, the Analysis (all_stats and the other stat dicts,
+the source lines and their stall samples) and the Memory_Metrics of one kernel. Its layout is
+
+    MAGIC, version, section count, directory of (tag, offset, length), sections
+
+Every string is stored once in the STRS section and referenced by index. Stats, nodes and
+metrics are flat NumPy record arrays; a value is a kind (None, int, float, str, bool) and 8
+bytes holding the int, the float bits or the string index. The tree is a table in preorder with
+the parent and the end of the subtree of every node, so a subtree is read without building the
+rest. Attributes outside the fixed columns are rows of the ATTR table. Only None, int, float,
+str and bool values are stored, others raise ValueError; nothing is pickled, so loading a file
+never runs code from it. Sections with unknown tags are skipped, so older readers load newer
+files of the same major version.
+
+The format is also the payload returned by worker processes, see collector.run_analysis.
+"""
+import mmap
+import numbers
+import struct
+from typing import Dict, List
+
+import numpy as np
+
+from drgpu.data_struct import Analysis, Memory_Metrics, Stat
+from drgpu.node import Node
+from drgpu.source_code_analysis import Source_Code_Line
+
+MAGIC = b'DRGPURES'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sHHI')
+DIRECTORY_ENTRY = struct.Struct('<4sQQ')
+
+# value kinds
+KIND_NONE = 0
+KIND_INT = 1
+KIND_FLOAT = 2
+KIND_STR = 3
+KIND_BOOL = 4
+# values of other types, written by older versions to a pickled XTRA section which is not loaded
+KIND_OTHER = 5
+
+VALUE_FIELDS = [('kind', 'u1'), ('bits', '<i8')]
+STAT_DTYPE = np.dtype([('group', '<u4'), ('key', '<u4'), ('name', '<u4'), ('raw_name', '<u4'),
+                       ('prefix', '<u4'), ('suffix', '<u4')] + VALUE_FIELDS)
+NODE_DTYPE = np.dtype([('parent', '<i4'), ('end', '<i4'), ('name', '<u4'), ('prefix_label', '<u4'),
+                       ('suffix_label', '<u4'), ('type', 'u1'), ('show', 'u1')] + VALUE_FIELDS)
+FIELD_DTYPE = np.dtype([('key', '<u4')] + VALUE_FIELDS)
+# also the errors of the summarized stall samples, with the error as count
+SASS_DTYPE = np.dtype([('stall', '<u4'), ('line', '<i8'), ('count', '<f8')])
+SOURCE_LINE_DTYPE = np.dtype([('index', '<i4'), ('line_number', '<i8'), ('raw_kind', 'u1'), ('raw_bits', '<i8'),
+                              ('file_kind', 'u1'), ('file_bits', '<i8')])
+# attribute outside the fixed columns of the row index of the owner table, 'node' or 'stat'
+ATTR_DTYPE = np.dtype([('owner', '<u4'), ('index', '<i4'), ('attr', '<u4')] + VALUE_FIELDS)
+
+# Stat attributes in the STAT columns, the others are stored in ATTR when not at their default
+STAT_COLUMNS = ['name', 'raw_name', 'prefix', 'suffix', 'value']
+NODE_COLUMNS = ['name', 'prefix_label', 'suffix_label', 'type', 'show_percentage_or_value', 'percentage', 'child']
+# Analysis attributes holding {name: Stat}
+STAT_GROUPS = ['all_stats', 'stall_stats', 'pipe_stats', 'instruction_stats', 'dispatch_stats',
+               'latency_stats', 'shared_mem_stats', 'bottleneck_stats']
+# Memory_Metrics attributes holding {name: number}, stored as 'attribute.name' fields
+METRIC_DICTS = ['throughputs']
+
+
+class _Strings:
+    """Interned strings of a file being written."""
+
+    def __init__(self):
+        self.index = {}
+        self.strings = []
+
+    def __call__(self, text):
+        i = self.index.get(text)
+        if i is None:
+            i = self.index[text] = len(self.strings)
+            self.strings.append(text)
+        return i
+
+    def encode(self):
+        blobs = [text.encode('utf-8') for text in self.strings]
+        offsets = np.zeros(len(blobs) + 1, dtype='<u4')
+        np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+        return struct.pack('<I', len(blobs)) + offsets.tobytes() + b''.join(blobs)
+
+
+def _decode_strings(buffer):
+    count = struct.unpack_from('<I', buffer, 0)[0]
+    offsets = np.frombuffer(buffer, dtype='<u4', count=count + 1, offset=4)
+    blob = bytes(buffer[4 + 4 * (count + 1):])
+    return [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(count)]
+
+
+def _encode_value(value, strings):
+    """(kind, 8 bytes as int64) of a value, KIND_OTHER for values of other types."""
+    if value is None:
+        return KIND_NONE, 0
+    if isinstance(value, (bool, np.bool_)):
+        return KIND_BOOL, int(value)
+    if isinstance(value, numbers.Integral) and -2 ** 63 <= value < 2 ** 63:
+        return KIND_INT, int(value)
+    if isinstance(value, numbers.Real):
+        return KIND_FLOAT, struct.unpack('<q', struct.pack('<d', float(value)))[0]
+    if isinstance(value, str):
+        return KIND_STR, strings(value)
+    return KIND_OTHER, 0
+
+
+def _encode_scalar(value, strings, what):
+    """_encode_value of a value which must be stored, ValueError for values of other types."""
+    kind, bits = _encode_value(value, strings)
+    if kind == KIND_OTHER:
+        raise ValueError(f"Can't serialize {what}: {type(value).__name__} is not None, int, float, str or bool")
+    return kind, bits
+
+
+def _decode_value(kind, bits, strings):
+    if kind == KIND_INT:
+        return int(bits)
+    if kind == KIND_FLOAT:
+        return struct.unpack('<d', struct.pack('<q', int(bits)))[0]
+    if kind == KIND_STR:
+        return strings[bits]
+    if kind == KIND_BOOL:
+        return bool(bits)
+    return None
+
+
+def _records(dtype, rows):
+    return np.array(rows, dtype=dtype)
+
+
+def _attribute_rows(owner, index, obj, columns, defaults, strings, attributes):
+    """Append the attributes of obj outside the columns which are not at their default."""
+    for attr, value in vars(obj).items():
+        if attr in columns or (attr in defaults and defaults[attr] == value):
+            continue
+        kind, bits = _encode_scalar(value, strings, "%s attribute %s" % (owner, attr))
+        attributes.append((strings(owner), index, strings(attr), kind, bits))
+
+
+def _stat_rows(analysis, strings, attributes):
+    rows = []
+    defaults = vars(Stat())
+    for group in STAT_GROUPS:
+        stats = getattr(analysis, group, None) or {}
+        for key, stat in stats.items():
+            kind, bits = _encode_scalar(stat.value, strings, "the value of stat %s" % key)
+            _attribute_rows('stat', len(rows), stat, STAT_COLUMNS, defaults, strings, attributes)
+            rows.append((strings(group), strings(key), strings(stat.name), strings(stat.raw_name),
+                         strings(stat.prefix), strings(stat.suffix), kind, bits))
+    return _records(STAT_DTYPE, rows)
+
+
+def _node_rows(hw_tree, strings, attributes):
+    rows = []
+    node_defaults = vars(Node(''))
+    # preorder, the end of a subtree is filled in when it is left
+    stack = [(hw_tree, -1, False)]
+    while stack:
+        node, parent, leaving = stack.pop()
+        if leaving:
+            rows[parent][1] = len(rows)
+            continue
+        kind, bits = _encode_scalar(node.percentage, strings, "the percentage of node %s" % node.name)
+        row = len(rows)
+        _attribute_rows('node', row, node, NODE_COLUMNS, node_defaults, strings, attributes)
+        rows.append([parent, 0, strings(node.name), strings(node.prefix_label), strings(node.suffix_label),
+                     node.type, node.show_percentage_or_value, kind, bits])
+        stack.append((None, row, True))
+        for child in reversed(node.child):
+            stack.append((child, row, False))
+    return _records(NODE_DTYPE, [tuple(row) for row in rows])
+
+
+def _field_rows(fields, strings, section):
+    rows = []
+    for key, value in fields:
+        kind, bits = _encode_scalar(value, strings, "%s field %s" % (section, key))
+        rows.append((strings(key), kind, bits))
+    return _records(FIELD_DTYPE, rows)
+
+
+def _memory_metric_fields(memory_metrics):
+    fields = []
+    for attr, value in vars(memory_metrics).items():
+        if attr in METRIC_DICTS and isinstance(value, dict):
+            fields.extend(("%s.%s" % (attr, key), item) for key, item in value.items())
+            # keeps empty dicts
+            fields.append((attr + ".", None))
+        else:
+            fields.append((attr, value))
+    return fields
+
+
+def _sass_rows(samples, strings, empty, name):
+    """
+    A {stall: {line: count}} dict of the Analysis as a table. The stalls without samples are
+    added to empty as (stall, name of the dict).
+    """
+    tables = []
+    for stall, lines in samples.items():
+        if not lines:
+            empty.append((stall, name))
+            continue
+        try:
+            line_ids = np.fromiter(lines.keys(), dtype='<i8', count=len(lines))
+            counts = np.fromiter(lines.values(), dtype='<f8', count=len(lines))
+        except (TypeError, ValueError):
+            raise ValueError(f"Can't serialize the samples of {stall}: lines must be int and counts numbers")
+        table = np.zeros(len(lines), dtype=SASS_DTYPE)
+        table['stall'] = strings(stall)
+        table['line'] = line_ids
+        table['count'] = counts
+        tables.append(table)
+    return np.concatenate(tables) if tables else np.zeros(0, dtype=SASS_DTYPE)
+
+
+def _source_line_rows(source_lines, strings):
+    rows = []
+    for index, line in source_lines.items() if isinstance(source_lines, dict) else enumerate(source_lines):
+        if line is None:
+            continue
+        raw_kind, raw_bits = _encode_scalar(line.raw_line, strings, "source line %s" % index)
+        file_kind, file_bits = _encode_scalar(line.file_name, strings, "the file name of source line %s" % index)
+        rows.append((index, line.line_number, raw_kind, raw_bits, file_kind, file_bits))
+    return _records(SOURCE_LINE_DTYPE, rows)
+
+
+def dumps(hw_tree: Node | None = None, analysis: Analysis | None = None,
+          memory_metrics: Memory_Metrics | None = None) -> bytes:
+    """
+    Serialize the results of one kernel, any of them may be left out.
+    Args:
+        hw_tree: The decision tree root node.
+        analysis: The analysis object.
+        memory_metrics: The memory metrics object.
+    Returns:
+        The bytes of the result file.
+    Raises:
+        ValueError: A value is not None, int, float, str or bool.
+    """
+    strings = _Strings()
+    attributes = []
+    sections = []
+    if hw_tree is not None:
+        sections.append((b'NODE', _node_rows(hw_tree, strings, attributes).tobytes()))
+    if analysis is not None:
+        sections.append((b'STAT', _stat_rows(analysis, strings, attributes).tobytes()))
+        # None: source_lines is the dict of a summarized source report
+        source_line_count = None if isinstance(analysis.source_lines, dict) else len(analysis.source_lines)
+        fields = [('bottleneck_unit', analysis.bottleneck_unit), ('source_line_count', source_line_count)]
+        sections.append((b'ANLS', _field_rows(fields, strings, 'analysis').tobytes()))
+        empty = []
+        sections.append((b'SASS', _sass_rows(analysis.stall_sass_code, strings, empty, 'stall_sass_code').tobytes()))
+        # the exact totals and the error bounds of a summarized source report
+        sections.append((b'STOT', _field_rows(analysis.stall_sass_totals.items(), strings, 'stall total').tobytes()))
+        sections.append((b'SERR', _sass_rows(analysis.stall_sass_errors, strings, empty,
+                                             'stall_sass_errors').tobytes()))
+        sections.append((b'SEMP', _field_rows(empty, strings, 'empty stall').tobytes()))
+        sections.append((b'SRCL', _source_line_rows(analysis.source_lines, strings).tobytes()))
+    if memory_metrics is not None:
+        fields = _memory_metric_fields(memory_metrics)
+        sections.append((b'MEMM', _field_rows(fields, strings, 'memory_metrics').tobytes()))
+    if attributes:
+        sections.append((b'ATTR', _records(ATTR_DTYPE, attributes).tobytes()))
+    sections.insert(0, (b'STRS', strings.encode()))
+
+    offset = HEADER.size + DIRECTORY_ENTRY.size * len(sections)
+    directory = []
+    payload = []
+    for tag, data in sections:
+        padding = -offset % 8
+        payload.append(b'\0' * padding)
+        offset += padding
+        directory.append(DIRECTORY_ENTRY.pack(tag, offset, len(data)))
+        payload.append(data)
+        offset += len(data)
+    return HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(sections)) + b''.join(directory) + b''.join(payload)
+
+
+def dump(path, hw_tree: Node | None = None, analysis: Analysis | None = None,
+         memory_metrics: Memory_Metrics | None = None):
+    """Save the results of one kernel to path, see dumps."""
+    with open(path, 'wb') as fout:
+        fout.write(dumps(hw_tree, analysis, memory_metrics))
+
+
+class Result:
+    """
+    A loaded result file. The tables are read on load, the objects are only built when asked for.
+    """
+
+    def __init__(self, buffer):
+        if len(buffer) < HEADER.size:
+            raise ValueError("Not a DrGPU result: too short")
+        magic, version, _, count = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a DrGPU result")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"DrGPU result version {version} is newer than the supported version {FORMAT_VERSION}")
+        self.version = version
+        self.buffer = buffer
+        self.sections = {}
+        for i in range(count):
+            tag, offset, length = DIRECTORY_ENTRY.unpack_from(buffer, HEADER.size + i * DIRECTORY_ENTRY.size)
+            self.sections[tag] = memoryview(buffer)[offset:offset + length]
+        self.strings = _decode_strings(self.sections[b'STRS'])
+        self.nodes = self._table(b'NODE', NODE_DTYPE)
+        self.stats = self._table(b'STAT', STAT_DTYPE)
+        self.attributes = {}
+        attributes = self._table(b'ATTR', ATTR_DTYPE)
+        for row in attributes if attributes is not None else []:
+            self.attributes.setdefault((self.strings[row['owner']], int(row['index'])), {})[
+                self.strings[row['attr']]] = _decode_value(row['kind'], row['bits'], self.strings)
+
+    def _table(self, tag, dtype):
+        section = self.sections.get(tag)
+        if section is None:
+            return None
+        return np.frombuffer(section, dtype=dtype)
+
+    def _value(self, row, what):
+        if row['kind'] == KIND_OTHER:
+            raise ValueError(f"{what} was pickled by an older DrGPU version and is not loaded")
+        return _decode_value(row['kind'], row['bits'], self.strings)
+
+    def has_tree(self) -> bool:
+        return self.nodes is not None
+
+    def find(self, name: str) -> List[int]:
+        """Indexes of the nodes with this name, in preorder."""
+        if self.nodes is None or name not in self.strings:
+            return []
+        return np.flatnonzero(self.nodes['name'] == self.strings.index(name)).tolist()
+
+    def _node(self, index):
+        row = self.nodes[index]
+        node = Node(self.strings[row['name']], int(row['type']))
+        node.prefix_label = self.strings[row['prefix_label']]
+        node.suffix_label = self.strings[row['suffix_label']]
+        node.show_percentage_or_value = int(row['show'])
+        node.percentage = self._value(row, "The percentage of node %s" % node.name)
+        for attr, value in self.attributes.get(('node', index), {}).items():
+            setattr(node, attr, value)
+        return node
+
+    def tree(self, index: int = 0) -> Node:
+        """
+        The subtree rooted at the node with this index (the whole tree by default). Only the
+        rows of the subtree are read.
+        """
+        if self.nodes is None:
+            raise ValueError("The result has no decision tree")
+        end = int(self.nodes[index]['end'])
+        built = {}
+        for i in range(index, end):
+            node = self._node(i)
+            built[i] = node
+            if i != index:
+                built[int(self.nodes[i]['parent'])].child.append(node)
+        return built[index]
+
+    def subtree(self, name: str) -> Node | None:
+        """The subtree of the first node with this name, None if there is none."""
+        found = self.find(name)
+        return self.tree(found[0]) if found else None
+
+    def stat_group(self, group: str = 'all_stats') -> Dict[str, Stat]:
+        """One {name: Stat} dict of the Analysis, e.g. all_stats."""
+        stats = {}
+        if self.stats is None or group not in self.strings:
+            return stats
+        for index in np.flatnonzero(self.stats['group'] == self.strings.index(group)):
+            row = self.stats[index]
+            stat = Stat(self.strings[row['name']], self.strings[row['raw_name']])
+            stat.prefix = self.strings[row['prefix']]
+            stat.suffix = self.strings[row['suffix']]
+            stat.value = self._value(row, "The value of stat %s" % self.strings[row['key']])
+            for attr, value in self.attributes.get(('stat', int(index)), {}).items():
+                setattr(stat, attr, value)
+            stats[self.strings[row['key']]] = stat
+        return stats
+
+    def _fields(self, tag):
+        table = self._table(tag, FIELD_DTYPE)
+        if table is None:
+            return None
+        return [(self.strings[row['key']], self._value(row, "Field %s" % self.strings[row['key']]))
+                for row in table]
+
+    def _samples(self, tag):
+        """A {stall: {line: count}} dict stored by _sass_rows."""
+        samples = {}
+        table = self._table(tag, SASS_DTYPE)
+        if table is None:
+            return samples
+        for stall in dict.fromkeys(table['stall'].tolist()):
+            rows = table[table['stall'] == stall]
+            samples[self.strings[stall]] = dict(zip(rows['line'].tolist(), rows['count'].tolist()))
+        return samples
+
+    def memory_metrics(self) -> Memory_Metrics | None:
+        fields = self._fields(b'MEMM')
+        if fields is None:
+            return None
+        memory_metrics = Memory_Metrics()
+        for key, value in fields:
+            attr, dot, item = key.partition('.')
+            if not dot:
+                setattr(memory_metrics, attr, value)
+            elif item:
+                getattr(memory_metrics, attr)[item] = value
+            else:
+                setattr(memory_metrics, attr, getattr(memory_metrics, attr, None) or {})
+        return memory_metrics
+
+    def analysis(self) -> Analysis | None:
+        fields = self._fields(b'ANLS')
+        if fields is None:
+            return None
+        fields = dict(fields)
+        analysis = Analysis()
+        for group in STAT_GROUPS:
+            setattr(analysis, group, self.stat_group(group))
+        analysis.bottleneck_unit = fields['bottleneck_unit']
+        analysis.stall_sass_totals = dict(self._fields(b'STOT') or [])
+        analysis.stall_sass_code = self._samples(b'SASS')
+        analysis.stall_sass_errors = self._samples(b'SERR')
+        for stall, name in self._fields(b'SEMP') or []:
+            getattr(analysis, name)[stall] = {}
+        if fields['source_line_count'] is None:
+            analysis.source_lines = {}
+        else:
+            analysis.source_lines = [None] * fields['source_line_count']
+        for row in self._table(b'SRCL', SOURCE_LINE_DTYPE):
+            line = Source_Code_Line(line_number=int(row['line_number']))
+            if row['raw_kind'] == KIND_OTHER or row['file_kind'] == KIND_OTHER:
+                raise ValueError(f"Source line {int(row['index'])} was pickled by an older DrGPU version "
+                                 f"and is not loaded")
+            line.raw_line = _decode_value(row['raw_kind'], row['raw_bits'], self.strings)
+            line.file_name = _decode_value(row['file_kind'], row['file_bits'], self.strings)
+            analysis.source_lines[int(row['index'])] = line
+        return analysis
+
+
+def loads(data) -> Result:
+    """Load a result from bytes."""
+    return Result(data)
+
+
+def load(path) -> Result:
+    """Load a result file. The file is memory-mapped, only the parts accessed are read."""
+    with open(path, 'rb') as fin:
+        return Result(mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ))
@@ -49,7 +49,9 @@ def add_source_code_nodes(tmpstats, hw_tree, analysis, config):
         stall_sass_code_clean = [a for a in stall_sass_code[stat_name].items() if not np.isnan(a[1])]
         # sort all instructions leading to this stall reason by their counts
         stall_insts = sorted(stall_sass_code_clean, key=lambda kv: (kv[1], kv[0]), reverse=True)
-        sum_value = sum(a[1] for a in stall_insts)
+        # a summarized source report keeps only the heaviest instructions
+        sum_value = analysis.stall_sass_totals.get(stat_name, sum(a[1] for a in stall_insts))
+        errors = analysis.stall_sass_errors.get(stat_name, {})
         if sum_value == 0:
             continue
         N = config.max_number_of_showed_source_code_nodes
@@ -63,5 +65,8 @@ def add_source_code_nodes(tmpstats, hw_tree, analysis, config):
             if cur_inst.file_name != last_file_name:
                 content += str(cur_inst.file_name) + r':\l'
                 last_file_name = cur_inst.file_name
-            content += r"%d %s    %.2f%%\l" % (cur_inst.line_number, cur_inst.raw_line, inst_count[1] / new_sum * 100)
+            content += r"%d %s    %.2f%%" % (cur_inst.line_number, cur_inst.raw_line, inst_count[1] / new_sum * 100)
+            if errors.get(inst_count[0]):
+                content += r" (+-%.2f%%)" % (errors[inst_count[0]] / new_sum * 100)
+            content += r"\l"
         add_one_source_code_node(cur_node, content)
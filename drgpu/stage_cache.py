@@ -0,0 +1,172 @@
+"""
+Memoization of the stages of drgpu_launch.work.
+
+An interactive session often analyzes the same kernel again after changing one threshold or the
+output name. With a StageCache every stage (ingest, derived metrics, memory model, tree,
+suggestions, render) is keyed on exactly the inputs it reads: the content hash of the reports,
+the kernel id, the key of the stages it builds on and the Configuration fields listed for it
+below. Only the stages whose inputs changed are computed again. Cached results are copied in
+and out, so callers may modify what they get. Launches in several threads may share one cache;
+a stage missing in all of them is computed by each.
+"""
+import copy
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from drgpu import read_reports
+from drgpu import rules
+
+logger = logging.getLogger(__name__)
+
+STAGES = ["ingest", "derived_metrics", "memory_model", "tree", "suggestions", "render"]
+
+# Configuration fields read by unit_hunt.long_scoreboard_throughput and long_scoreboard_latency
+MEMORY_MODEL_FIELDS = ["warp_size", "BYTES_PER_L1_INSTRUCTION", "BYTES_PER_L2_INSTRUCTION",
+                       "L1_THROUGHPUT_FIX", "uTLB_THROUGHPUT_FIX", "L1_TLB_THROUGHPUT_FIX", "L2_THROUGHPUT_FIX",
+                       "FB_THROUGHPUT_FIX", "L1_LATENCY_FIX", "uTLB_LATENCY_FIX", "l1TLB_LATENCY_FIX",
+                       "l2_latency", "fb_latency"]
+# read by drgpu_launch.build_tree, gather and source_code_analysis
+TREE_FIELDS = ["quadrants_per_SM", "max_number_of_showed_nodes", "max_percentage_of_showed_nodes",
+               "max_avtive_warps_per_SM", "conflict_high_threshold", "low_activewarps_per_activecycle",
+               "max_number_of_showed_source_code_nodes"]
+# read by suggestions.py and the thresholds of rules.THRESHOLD_RULES
+SUGGESTION_FIELDS = ["warp_size", "BYTES_PER_L1_INSTRUCTION", "compute_capability",
+                     "max_not_predicated_off_thread_per_inst_executed"] + \
+                    [threshold for _, _, threshold in rules.THRESHOLD_RULES.values()
+                     if isinstance(threshold, str) and threshold not in rules.METRIC_INDEX]
+
+# entries kept by default, a few MB per kernel
+DEFAULT_MAX_ENTRIES = 256
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def config_fields(config, fields):
+    return tuple((field, getattr(config, field)) for field in fields)
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fin:
+        for block in iter(lambda: fin.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_digest(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class StageCache:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        # {key digest: stage result}, least recently used first
+        self.entries = OrderedDict()
+        # {(path, size, mtime_ns): content digest} so unchanged files are hashed once
+        self.file_digests = {}
+        # {output path: (render key, signature of the output file)}
+        self.rendered = {}
+        self.hits = dict.fromkeys(STAGES, 0)
+        self.misses = dict.fromkeys(STAGES, 0)
+        # guards the dicts above, stages are computed without holding it
+        self.lock = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.file_digests.clear()
+            self.rendered.clear()
+
+    def path_digest(self, path):
+        st = os.stat(path)
+        signature = (os.fspath(path), st.st_size, st.st_mtime_ns)
+        digest = self.file_digests.get(signature)
+        if digest is None:
+            digest = file_digest(path)
+            self.file_digests[signature] = digest
+        return digest
+
+    def report_key(self, report):
+        """The inputs of the ingest stage: content of the reports, kernel and reading options."""
+        raw_counters = getattr(report, 'raw_counters', None)
+        units_row = getattr(report, 'raw_counters_units_row', True)
+        if raw_counters is not None:
+            # only the row of the kernel is read
+            kernel_row = read_reports.kernel_row_ncu(raw_counters, report.kernel_id, units_row)
+            main = ('frame', int(pd.util.hash_pandas_object(kernel_row, index=False).sum()),
+                    tuple(kernel_row.columns))
+        elif getattr(report, 'report_content', None) is not None:
+            main = ('content', text_digest(report.report_content))
+        else:
+            main = ('file', self.path_digest(report.path))
+        partials = []
+        if raw_counters is None:
+            partial_contents = getattr(report, 'partial_report_contents', None) or \
+                [None] * len(report.partial_report_paths)
+            for partial_path, partial_content in zip(report.partial_report_paths, partial_contents):
+                partials.append(text_digest(partial_content) if partial_content is not None
+                                else self.path_digest(partial_path))
+        source = None
+        if getattr(report, 'source_report_content', None) is not None:
+            source = ('content', text_digest(report.source_report_content))
+        elif report.source_report_path:
+            source = ('file', self.path_digest(report.source_report_path))
+        return ('ingest', main, tuple(partials), report.on_conflict, units_row, report.kernel_id, source,
+                getattr(report, 'source_summary_size', None))
+
+    def key(self, *parts):
+        return hashlib.sha256(pickle.dumps(parts, protocol=4)).hexdigest()
+
+    def get(self, stage, key, compute):
+        """
+        The result of the stage for the key, computed by compute() if it isn't cached. The
+        caller gets its own copy.
+        """
+        with self.lock:
+            cached = key in self.entries
+            if cached:
+                self.entries.move_to_end(key)
+                self.hits[stage] += 1
+                entry = self.entries[key]
+            else:
+                self.misses[stage] += 1
+        if cached:
+            logger.debug("Stage %s cached", stage)
+            # entries are never modified, copying them needs no lock
+            return copy.deepcopy(entry)
+        result = compute()
+        entry = copy.deepcopy(result)
+        with self.lock:
+            self.entries[key] = entry
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return result
+
+    def render(self, key, output_path, render):
+        """
+        Run render() unless the output file was rendered from the same key and is unchanged.
+        @return: the result of render(), None if it was not run.
+        """
+        svg_path = output_path + '.svg'
+        with self.lock:
+            done = self.rendered.get(output_path)
+        if done is not None and done[0] == key and os.path.exists(svg_path):
+            st = os.stat(svg_path)
+            if done[1] == (st.st_size, st.st_mtime_ns):
+                with self.lock:
+                    self.hits['render'] += 1
+                logger.debug("Stage render cached for %s", output_path)
+                return None
+        with self.lock:
+            self.misses['render'] += 1
+        rendering = render()
+        if os.path.exists(svg_path):
+            st = os.stat(svg_path)
+            with self.lock:
+                self.rendered[output_path] = (key, (st.st_size, st.st_mtime_ns))
+        return rendering
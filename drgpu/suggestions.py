@@ -4,11 +4,11 @@ from drgpu.node import Node, SUGGESTION_NODE
 
 logger = logging.getLogger(__name__)
 
-def mio_throttle_short_scoreboard_common_suggest(stats, shared_mem_stats, memory_metrics, conflict_high_threshold):
+def mio_throttle_short_scoreboard_common_suggest(stats, shared_mem_stats, memory_metrics, fired):
     conflict_suggestion = []
     transaction_size_suggestion = []
 
-    if memory_metrics.shared_ld_conflict_per_request is not None and memory_metrics.shared_ld_conflict_per_request > conflict_high_threshold:
+    if fired['high_shared_ld_conflict']:
         conflict_suggestion.append(('load', memory_metrics.shared_ld_conflict_per_request))
         shared_ld_32b = shared_mem_stats.get('shared_ld_32b_executed')
         shared_ld_64b = shared_mem_stats.get('shared_ld_64b_executed')
@@ -17,7 +17,7 @@ def mio_throttle_short_scoreboard_common_suggest(stats, shared_mem_stats, memory
                                                                                                 shared_ld_32b.value + shared_ld_64b.value) / shared_ld.value > 0.66) or shared_ld_32b.value / shared_ld.value > 0.33 or shared_ld_64b.value / shared_ld.value > 0.33):
             transaction_size_suggestion.append('load')
 
-    if memory_metrics.shared_st_conflict_per_request != 0 and memory_metrics.shared_st_conflict_per_request > conflict_high_threshold:
+    if memory_metrics.shared_st_conflict_per_request != 0 and fired['high_shared_st_conflict']:
         conflict_suggestion.append(('store', memory_metrics.shared_st_conflict_per_request))
         shared_st_32b = shared_mem_stats.get('shared_st_32b_executed')
         shared_st_64b = shared_mem_stats.get('shared_st_64b_executed')
@@ -44,7 +44,7 @@ def mio_throttle_suggest(hw_tree, stats, shared_mem_stats, config):
                        r"Fewer data conflicts can reduce the time for loads, and can help alleviate the throttle cycles.")
 
 
-def short_scoreboard_suggest(hw_tree, stats, shared_mem_stats, config):
+def short_scoreboard_suggest(hw_tree, stats, shared_mem_stats, config, fired):
     short_scoreboard_node = find_node(hw_tree, "warp_cant_issue_short_scoreboard")
     if not short_scoreboard_node:
         return
@@ -60,7 +60,7 @@ def short_scoreboard_suggest(hw_tree, stats, shared_mem_stats, config):
         add_suggestion(short_scoreboard_node, "Try to use asynchronous shared memory copy.")
 
     common_more_warps_suggestion(short_scoreboard_node, stats, hw_tree,
-                                 "More warps may help hide the shared memory latency.", config)
+                                 "More warps may help hide the shared memory latency.", config, fired)
     add_suggestion(short_scoreboard_node, r"Consider loop unrolling to hide shared memory and MIO latency.")
 
 
@@ -76,19 +76,20 @@ def pipe_suggest(hw_tree, stats):
                            r"Tensor cores can double the rate of FP64 ops in some cases. Investigate if your application can exploit them.")
 
 
-def barrier_suggest(hw_tree, stats, config):
+def barrier_suggest(hw_tree, stats, config, fired):
     barrier_node = find_node(hw_tree, "warp_cant_issue_barrier")
     if not barrier_node:
         return
     threads_per_block = stats['launch_block_size'].value
-    if threads_per_block > config.warp_size:
+    if fired['block_larger_than_warp']:
         add_suggestion(barrier_node,
                        r"The number of threads per block is about %d, but only %d needed for a warp. Splitting them into multiple CTAs may help reduce barrier cycles (but may affect intra-CTA sharing via shared memory)." % (
                        int(threads_per_block),
                        config.warp_size))
     else:
         common_more_warps_suggestion(barrier_node, stats, hw_tree,
-                                     "More concurrent warps may help reduce cycles wasted due to barriers.", config)
+                                     "More concurrent warps may help reduce cycles wasted due to barriers.", config,
+                                     fired)
     if config.compute_capability >= 80:
         add_suggestion(barrier_node, r"Try to use asynchronous barrier.")
 
@@ -99,7 +100,7 @@ def barrier_suggest(hw_tree, stats, config):
         not_predicated_off_thread_per_inst_executed = stats["not_predicated_off_thread_per_inst_executed2"]
     else:
         return
-    if not_predicated_off_thread_per_inst_executed.value < 17:
+    if fired['barrier_thread_divergence']:
         add_suggestion(barrier_node,
                        r"High thread divergence: %d%% threads in a warp execute together. Reducing divergence may help reduce barrier cycles." % (
                                not_predicated_off_thread_per_inst_executed.value / config.warp_size * 100))
@@ -112,25 +113,25 @@ def membar_suggest(hw_tree, stats):
     add_suggestion(membar_node, r"Try to reduce the scope of the memory barrier to warp or thread block")
 
 
-def branch_solving_suggest(hw_tree, stats, config):
+def branch_solving_suggest(hw_tree, stats, config, fired):
     branch_solving_node = find_node(hw_tree, "warp_cant_issue_branch_resolving")
     if not branch_solving_node:
         return
     not_predicated_off_thread_per_inst_executed = stats["not_predicated_off_thread_per_inst_executed"]
-    if not_predicated_off_thread_per_inst_executed.value < config.high_not_predicated_off_thread_per_inst_executed:
+    if fired['branch_thread_divergence']:
         add_suggestion(branch_solving_node,
                        r"High thread divergence: %d %% threads in a warp execute together. Reducing divergence may help reduce the branch resolving cycles." % (
                                not_predicated_off_thread_per_inst_executed.value / config.max_not_predicated_off_thread_per_inst_executed * 100))
 
 
-def drain_suggest(hw_tree, stats, config):
+def drain_suggest(hw_tree, stats, config, fired):
     drain_node = find_node(hw_tree, "warp_cant_issue_drain")
     if not drain_node:
         return
     add_suggestion(drain_node,
                    r"Try to move the burst of global memory stores away from the kernel end to earlier in the execution.")
     common_more_warps_suggestion(drain_node, stats, hw_tree,
-                                 "More warps may help utilize the cycles wasted due to pending stores.", config)
+                                 "More warps may help utilize the cycles wasted due to pending stores.", config, fired)
 
 
 def imc_miss_suggest(hw_tree, stats):
@@ -167,15 +168,11 @@ def lg_credit_throttle_suggest(hw_tree, stats):
                        r"Reducing concurrent warps may help.")
 
 
-def memory_suggest(hw_tree, stats, bottleneck_unit, memory_metrics, config):
+def memory_suggest(hw_tree, stats, bottleneck_unit, memory_metrics, config, fired):
     occupancy_node = find_node(hw_tree, "occupancy")
-    activewarps_per_activecycle = stats['activewarps_per_activecycle'].value
-    if activewarps_per_activecycle < config.low_activewarps_per_activecycle:
+    if fired['low_activewarps_per_activecycle']:
         add_suggestion(occupancy_node, "Try to increase active warps by reducing register usage or block size")
 
-    elapsedClocks = stats['elapsedClocks'].value
-    high_l1_lines_per_instruction = config.warp_size * memory_metrics.bpl1 / config.BYTES_PER_L1_INSTRUCTION
-
     l1_node = find_node(hw_tree, "throughput_l1")
     if not l1_node:
         l1_node = find_node(hw_tree, "l1_latency")
@@ -183,25 +180,23 @@ def memory_suggest(hw_tree, stats, bottleneck_unit, memory_metrics, config):
         logger.warning("Can't find throughput or latency node for L1")
     else:
         # Case 1: the l1 throughput is close to peak number
-        l1_throughput = memory_metrics.throughputs['l1']
-        if l1_throughput / elapsedClocks >= config.high_l1_throughput:
+        if fired['high_l1_throughput']:
             add_suggestion(l1_node, "Your L1 read bandwidth is close to peak. ")
             add_suggestion(l1_node, r"Try to reduce L1 utilization, e.g. by using temporary variables.")
             activewarps_per_activecycle = stats['activewarps_per_activecycle'].value
-            if activewarps_per_activecycle is not None and activewarps_per_activecycle < config.low_activewarps_per_activecycle and not find_node(
-                    hw_tree, "warp_cant_issue_mio_throttle"):
+            if fired['low_activewarps_per_activecycle'] and not find_node(hw_tree, "warp_cant_issue_mio_throttle"):
                 add_suggestion(l1_node,
                                r"Current number of active warps per active cycle is %.2f(the max allowed is 64). Try to issue more warps to hide L1 latency." % (
                                    activewarps_per_activecycle))
         else:
             # Case 2: The l1 throughput is not close to peak number
-            if memory_metrics.l1_hit_rate > config.high_l1_hit_rate:
-                if memory_metrics.l1_conflict_rate is not None and memory_metrics.l1_conflict_rate > config.high_l1_conflict_rate:
+            if fired['high_l1_hit_rate']:
+                if fired['high_l1_conflict_rate']:
                     l1_conflict_rate_node = find_node(hw_tree, "l1_conflict_rate")
                     if l1_conflict_rate_node:
                         add_suggestion(l1_conflict_rate_node,
                                        r"Try to rearrange your data accesses to reduce L1 data conflicts.")
-                    if memory_metrics.l1_lines_per_instruction is not None and memory_metrics.l1_lines_per_instruction > high_l1_lines_per_instruction:
+                    if fired['high_l1_lines_per_instruction']:
                         l1_lines_per_instruction_node = find_node(hw_tree, "l1_lines_per_instruction")
                         if l1_lines_per_instruction_node:
                             add_suggestion(l1_lines_per_instruction_node,
@@ -212,10 +207,10 @@ def memory_suggest(hw_tree, stats, bottleneck_unit, memory_metrics, config):
         utlb_node = find_node(hw_tree, "throughput_utlb")
         if not utlb_node:
             return
-        if memory_metrics.l1_hit_rate < config.low_l1_hit_rate:
+        if fired['low_l1_hit_rate']:
             add_suggestion(utlb_node,
                             r"Try to reduce the L1 miss rate to reduce utilization of uTLB.")
-        if memory_metrics.l1_lines_per_instruction and memory_metrics.l1_lines_per_instruction > high_l1_lines_per_instruction:
+        if fired['high_l1_lines_per_instruction']:
             add_suggestion(utlb_node,
                             r"Try to rearrange your data access strides to read fewer uTLB entries per load.")
 
@@ -227,17 +222,17 @@ def memory_suggest(hw_tree, stats, bottleneck_unit, memory_metrics, config):
     else:
         l1_miss_rate_node = find_node(l1tlb_node, "l1_miss_rate")
         if l1_miss_rate_node:
-            common_l1_miss_rate_suggestion(l1_miss_rate_node, memory_metrics, config)
+            common_l1_miss_rate_suggestion(l1_miss_rate_node, memory_metrics, config, fired)
         else:
-            common_l1_miss_rate_suggestion(l1tlb_node, memory_metrics, config)
-        if memory_metrics.utlb_miss_rate is not None and memory_metrics.utlb_miss_rate >= config.high_utlb_miss_rate:
+            common_l1_miss_rate_suggestion(l1tlb_node, memory_metrics, config, fired)
+        if fired['high_utlb_miss_rate']:
             utlb_miss_rate = find_node(l1tlb_node, "utlb_miss_rate")
             if utlb_miss_rate:
                 add_suggestion(utlb_miss_rate,
                                r"Try to rearrange your data accesses for SMs to stay within uTLB pages, e.g. by tiling.")
         # only complain if throughput bound
         if bottleneck_unit == "l1tlb":
-            if memory_metrics.l1_lines_per_instruction and memory_metrics.l1_lines_per_instruction > high_l1_lines_per_instruction:
+            if fired['high_l1_lines_per_instruction']:
                 l1_lines_per_load_node = find_node(hw_tree, "l1_lines_per_instruction")
                 if l1_lines_per_load_node:
                     add_suggestion(l1_lines_per_load_node,
@@ -250,12 +245,12 @@ def memory_suggest(hw_tree, stats, bottleneck_unit, memory_metrics, config):
         logger.warning("Can't find throughput or latency node for L2")
     else:
         # across_load_coalescing_ratio
-        if memory_metrics.l2_bank_conflict_rate is not None and memory_metrics.l2_bank_conflict_rate > config.high_l2_bank_conflict_rate:
+        if fired['high_l2_bank_conflict_rate']:
             l2_bank_conflict_rate_node = find_node(l2_node, "l2_bank_conflict_rate")
             if (l2_bank_conflict_rate_node):
                 add_suggestion(l2_bank_conflict_rate_node,
                                r"Try to rearrange your data accesses to reduce bank conflicts.")
-        if memory_metrics.l2_miss_rate is not None and memory_metrics.l2_miss_rate >= config.high_l2_miss_rate:
+        if fired['high_l2_miss_rate']:
             # @todo this part is not clear
             fb_node = find_node(hw_tree, "throughput_fb")
             if not fb_node:
@@ -275,34 +270,33 @@ def memory_suggest(hw_tree, stats, bottleneck_unit, memory_metrics, config):
     if not fb_node:
         logger.warning("Can't find throughput or latency node for FB")
     else:
-        if memory_metrics.l2_miss_rate is not None and memory_metrics.l2_miss_rate >= config.high_l2_miss_rate:
+        if fired['high_l2_miss_rate']:
             l2_miss_node = find_node(fb_node, "l2_miss_rate")
             if l2_miss_node:
                 pass
                 # add_suggestion(l2_miss_node,
                 #             r"Try to reduce the L2 miss rate to reduce utilization of FB, e.g. by L2 persisting access policy")
-        if memory_metrics.access_per_activate is not None and memory_metrics.access_per_activate < config.low_access_per_activate:
+        if fired['low_access_per_activate']:
             access_per_activate_node = find_node(fb_node, "access_per_activate")
             if access_per_activate_node:
                 add_suggestion(access_per_activate_node,
                                r"Try to rearrange the data accesses to limit activating pages, e.g. by increasing spatial locality.")
-        if memory_metrics.average_dram_banks is not None and memory_metrics.average_dram_banks < config.low_bank_per_access:
+        if fired['low_bank_per_access']:
             bank_per_access_node = find_node(fb_node, "average_dram_banks")
             if (bank_per_access_node):
                 suggestion = r"Bank utilization is low, typically happens when not enough concurrent requests."
 
                 activewarps_per_activecycle = stats['activewarps_per_activecycle'].value
-                if activewarps_per_activecycle is not None and activewarps_per_activecycle < config.low_activewarps_per_activecycle and not find_node(
-                        hw_tree, "warp_cant_issue_mio_throttle"):
+                if fired['low_activewarps_per_activecycle'] and not find_node(hw_tree, "warp_cant_issue_mio_throttle"):
                     suggestion += " Current number of active warps per active cycle is %.2f (max allowed is 64). If possible, you may be able to hide memory latency by running more concurrent warps." % (
                         activewarps_per_activecycle)
                 add_suggestion(bank_per_access_node, suggestion)
         if memory_metrics.compress_rate is not None:
             compress_node = find_node(fb_node, "compression_success_rate")
             if (compress_node):
-                if memory_metrics.compress_rate == 0:
+                if fired['no_compression']:
                     add_suggestion(compress_node, r"Try enabling compression to reduce FB utilization.")
-                elif memory_metrics.compress_rate <= config.low_compress_rate:
+                elif fired['low_compress_rate']:
                     add_suggestion(compress_node,
                                    r"Compression rate is low; try enabling compression on more data if possible")
         dram_noreq_node = find_node(fb_node, "dram_noReq")
@@ -319,16 +313,15 @@ def wait_suggestion(hw_tree, stats):
                    r"Long-latency instructions consuming each other's results spaced too close together. Try to restructure or unroll to increase spacing.")
 
 
-def common_l1_miss_rate_suggestion(target_node, memory_metrics, config):
-    if memory_metrics.l1_hit_rate < config.low_l1_hit_rate:
+def common_l1_miss_rate_suggestion(target_node, memory_metrics, config, fired):
+    if fired['low_l1_hit_rate']:
         add_suggestion(target_node,
                        r"Try to reduce the L1 miss rate to reduce utilization of the rest of memory heirarchy. You may be able to increase L1 size by reducing the shared memory size.")
 
 
-def common_more_warps_suggestion(target_node, stats, hw_tree, suffix, config):
+def common_more_warps_suggestion(target_node, stats, hw_tree, suffix, config, fired):
     activewarps_per_activecycle = stats['activewarps_per_activecycle'].value
-    if activewarps_per_activecycle < config.low_activewarps_per_activecycle and not find_node(
-            hw_tree, "warp_cant_issue_mio_throttle"):
+    if fired['low_activewarps_per_activecycle'] and not find_node(hw_tree, "warp_cant_issue_mio_throttle"):
         add_suggestion(target_node,
                        #   @todo  64?? in ncu, this number is 32.
                        r"Current number of active warps per active cycle is %.2f (max allowed is 64). " % (
@@ -0,0 +1,196 @@
+"""
+What-if sweeps over the constants of the memory config.
+
+The counters of a report are read and its kernels analyzed once. Then the memory model
+(unit_hunt.memory_model) and the suggestion rules (rules.evaluate) are evaluated for every point
+of a parameter grid in one vectorized pass: each swept Configuration attribute becomes a
+(points, 1) array broadcasting against the kernels. The result tells, for every grid point, how
+many kernels get another bottleneck unit or another set of fired rules than with the loaded
+config, and where along each parameter axis the diagnosis changes.
+"""
+import copy
+import logging
+
+import numpy as np
+import pandas as pd
+
+from drgpu import counters
+from drgpu import read_reports
+from drgpu import rules
+from drgpu import trace
+from drgpu import unit_hunt
+from drgpu.data_struct import Analysis, Report, Memory_Metrics, Configuration
+from drgpu.drgpu_launch import hunt_units
+
+logger = logging.getLogger(__name__)
+
+RULE_NAMES = list(rules.THRESHOLD_RULES)
+
+
+def parse_grid(specs):
+    """
+    Parse NAME=V1,V2,... and NAME=START:STOP:NUM (NUM evenly spaced values, both ends included)
+    into {name: array of values}.
+    """
+    grid = {}
+    for spec in specs:
+        name, sep, values = spec.partition('=')
+        name = name.strip()
+        if not sep or not name or not values:
+            raise ValueError(f"Expected NAME=V1,V2,... or NAME=START:STOP:NUM, got '{spec}'")
+        if ':' in values:
+            parts = values.split(':')
+            if len(parts) != 3:
+                raise ValueError(f"Expected START:STOP:NUM in '{spec}'")
+            grid[name] = np.linspace(float(parts[0]), float(parts[1]), int(parts[2]))
+        else:
+            grid[name] = np.array([float(value) for value in values.split(',')])
+        if len(grid[name]) == 0:
+            raise ValueError(f"No values to sweep in '{spec}'")
+    return grid
+
+
+def check_grid(grid, config: Configuration):
+    """Raise ValueError unless every swept name is a numeric constant of the configuration."""
+    for name in grid:
+        current = getattr(config, name, None)
+        if isinstance(current, bool) or not isinstance(current, (int, float)):
+            raise ValueError(f"{name} is not a numeric memory config constant")
+
+
+def kernel_inputs(report: Report, config: Configuration):
+    """
+    Read and analyze every kernel of the report once.
+    Args:
+        report: The report, all of its kernels are swept.
+        config: Parsed GPU configuration data.
+    Returns:
+        The memory model columns ({stat name: array over kernels}) and the kernels x
+        rules.RULE_METRICS matrix.
+    """
+    raw_counters = read_reports.fill_report_ncu(report)
+    units_row = getattr(report, 'raw_counters_units_row', True)
+    if not hasattr(raw_counters, 'column_names'):
+        # slicing the kernel rows out of a narrow frame is much cheaper
+        raw_counters = raw_counters[[column for column in counters.required_ncu_columns()
+                                     if column in raw_counters.columns]]
+    columns = read_reports.memory_model_columns_ncu(raw_counters, units_row)
+    kernels = len(columns['elapsedClocks'])
+    rows = []
+    with trace.span("rule_metrics", kernels=kernels):
+        for kernel_id in range(kernels):
+            analysis = Analysis()
+            memory_metrics = Memory_Metrics()
+            read_reports.fill_stats(analysis.all_stats, Report(path=report.path, kernel_id=kernel_id,
+                                                               raw_counters=raw_counters,
+                                                               raw_counters_units_row=units_row))
+            hunt_units(analysis, memory_metrics, config)
+            rows.append(rules.kernel_metrics(analysis.all_stats, memory_metrics, config))
+    return columns, rules.metric_matrix(rows)
+
+
+def diagnose(columns, matrix, config):
+    """
+    Bottleneck unit and fired rules of every kernel under config, whose constants may be arrays.
+    Returns:
+        The index of the bottleneck unit in unit_hunt.MEMORY_UNITS and the fired rules as bits
+        in the order of RULE_NAMES, both of the broadcast shape of the constants and kernels.
+    """
+    model = unit_hunt.memory_model(columns, config)
+    bottleneck = np.argmax(model["bottleneck_unit"][..., None] == np.array(unit_hunt.MEMORY_UNITS), axis=-1)
+    # rule metrics computed from the constants, the others only depend on the counters
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metrics = {
+            "l1_throughput_per_cycle": model["l1_throughput"] / columns["elapsedClocks"],
+            "high_l1_lines_per_instruction": config.warp_size * matrix[:, rules.METRIC_INDEX["bpl1"]]
+                                             / config.BYTES_PER_L1_INSTRUCTION,
+        }
+    fired = rules.evaluate(matrix, config, metrics=metrics)
+    shape = np.broadcast_shapes(bottleneck.shape, *[np.shape(mask) for mask in fired.values()])
+    rule_bits = np.zeros(shape, dtype=np.int64)
+    for bit, name in enumerate(RULE_NAMES):
+        rule_bits |= np.asarray(fired[name], dtype=np.int64) << bit
+    return np.broadcast_to(bottleneck, shape), rule_bits
+
+
+def rule_names(bits):
+    return [name for bit, name in enumerate(RULE_NAMES) if bits >> bit & 1]
+
+
+def sweep(columns, matrix, config: Configuration, grid):
+    """
+    Evaluate the memory model and the suggestion rules on every point of the grid.
+    Args:
+        columns: Memory model columns of kernel_inputs.
+        matrix: Rule metric matrix of kernel_inputs.
+        config: The loaded configuration, the baseline of the comparison.
+        grid: {Configuration attribute: values}, every combination of the values is evaluated.
+    Returns:
+        The points (one row per grid point with the swept values, the kernels whose bottleneck
+        or fired rules differ from the baseline, the rules changing for any kernel and the
+        number of kernels bound by every unit) and the transitions (one row per pair of
+        neighbouring points along one parameter axis whose diagnosis differs).
+    """
+    check_grid(grid, config)
+    names = list(grid)
+    axes = np.meshgrid(*[np.asarray(grid[name], dtype=float) for name in names], indexing='ij')
+    grid_shape = tuple(len(grid[name]) for name in names)
+    points = int(np.prod(grid_shape))
+    swept = copy.copy(config)
+    for name, axis in zip(names, axes):
+        setattr(swept, name, axis.reshape(-1, 1))
+    kernels = matrix.shape[0]
+
+    with trace.span("sweep", points=points, kernels=kernels):
+        base_bottleneck, base_bits = diagnose(columns, matrix, config)
+        bottleneck, rule_bits = diagnose(columns, matrix, swept)
+        bottleneck = np.broadcast_to(bottleneck, (points, kernels))
+        rule_bits = np.broadcast_to(rule_bits, (points, kernels))
+
+        summary = {name: axis.ravel() for name, axis in zip(names, axes)}
+        summary["bottleneck_changes"] = (bottleneck != base_bottleneck).sum(axis=1)
+        changed_bits = rule_bits ^ base_bits
+        summary["rule_changes"] = (changed_bits != 0).sum(axis=1)
+        any_changed = np.bitwise_or.reduce(changed_bits, axis=1)
+        summary["changed_rules"] = [",".join(rule_names(bits)) for bits in any_changed]
+        for i, unit in enumerate(unit_hunt.MEMORY_UNITS):
+            summary[unit] = (bottleneck == i).sum(axis=1)
+        point_table = pd.DataFrame(summary)
+
+        transition_table = transitions(names, grid, axes, bottleneck.reshape(grid_shape + (kernels,)),
+                                       rule_bits.reshape(grid_shape + (kernels,)))
+    return point_table, transition_table
+
+
+def transitions(names, grid, axes, bottleneck, rule_bits):
+    """
+    Neighbouring grid points along every axis whose bottleneck units or fired rules differ. A row
+    holds the values of the other parameters, its own goes to from and to.
+    """
+    rows = []
+    for axis, name in enumerate(names):
+        if len(grid[name]) < 2:
+            continue
+        head = [slice(None)] * len(names)
+        tail = [slice(None)] * len(names)
+        head[axis] = slice(None, -1)
+        tail[axis] = slice(1, None)
+        head = tuple(head)
+        tail = tuple(tail)
+        bottleneck_changes = (bottleneck[head] != bottleneck[tail]).sum(axis=-1)
+        changed_bits = rule_bits[head] ^ rule_bits[tail]
+        rule_changes = (changed_bits != 0).sum(axis=-1)
+        any_changed = np.bitwise_or.reduce(changed_bits, axis=-1)
+        for index in zip(*np.nonzero(bottleneck_changes + rule_changes)):
+            row = {"parameter": name, "from": axes[axis][head][index], "to": axes[axis][tail][index]}
+            for other, other_name in enumerate(names):
+                if other != axis:
+                    row[other_name] = axes[other][head][index]
+            row["bottleneck_changes"] = bottleneck_changes[index]
+            row["rule_changes"] = rule_changes[index]
+            row["changed_rules"] = ",".join(rule_names(any_changed[index]))
+            rows.append(row)
+    # a parameter is a column only when rows of another parameter hold its value
+    others = [name for name in names if any(name in row for row in rows)]
+    columns = ["parameter", "from", "to"] + others + ["bottleneck_changes", "rule_changes", "changed_rules"]
+    return pd.DataFrame(rows, columns=columns)
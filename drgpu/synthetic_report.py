@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic NCU raw page and source mapping CSVs for scale testing.
+
+The raw page has the same layout as `ncu --csv --page raw` (optional ==PROF== preamble, quoted
+header, units row, one row per kernel) and contains every counter named in
+counters.counters_name_map_for_ncu, so DrGPU can analyze any of its kernels. The source mapping
+has the `#`, `Source` and stall_* columns of an exported NCU source page.
+"""
+import argparse
+import csv
+import sys
+
+import numpy as np
+
+from drgpu import counters
+from drgpu import source_code_analysis
+
+NCU_METADATA_COLUMNS = ["ID", "Process ID", "Process Name", "Host Name", "Kernel Name", "Kernel Time",
+                        "Context", "Stream"]
+SOURCE_COLUMNS = ["#", "Source", "Live Registers", "Warp Stall Sampling (All Cycles)",
+                  "Warp Stall Sampling (Not-issued Cycles)", "Instructions Executed"]
+DISTRIBUTIONS = ('lognormal', 'uniform')
+# rows generated per numpy batch
+BATCH_ROWS = 1024
+
+
+def raw_report_columns(columns=None):
+    """
+    All columns of the synthetic raw page.
+    Args:
+        columns: Total number of columns. Filler counters are appended to reach it. The default
+            is only the columns DrGPU reads.
+    """
+    names = list(NCU_METADATA_COLUMNS)
+    names += [name for name in counters.required_ncu_columns() if name not in names]
+    if columns is not None:
+        names += ["synthetic__metric_%d.sum" % i for i in range(max(0, columns - len(names)))]
+    return names
+
+
+def column_kind(name):
+    """Classify a counter by the range of its values, returns (kind, unit)."""
+    if name == "gpc__cycles_elapsed.max":
+        return 'cycles', 'cycle'
+    if name in ("launch__block_size", "launch__registers_per_thread") or name.startswith("launch__occupancy_limit"):
+        return 'launch', ''
+    if name == "sm__warps_active.avg.per_cycle_active" or name == "sm__maximum_warps_avg_per_active_cycle":
+        return 'warps', 'warp'
+    if name.endswith("per_issue_active.ratio"):
+        return 'stall', 'ratio'
+    if "pred_on_per_inst_executed" in name:
+        return 'threads', 'thread'
+    if name.endswith("per_cycle_active"):
+        return 'ipc', 'inst/cycle'
+    if name.endswith(".pct") or "pct_of_peak" in name:
+        return 'percent', '%'
+    if name.startswith("dram__bytes"):
+        return 'count', 'byte'
+    return 'count', ''
+
+
+def draw_values(rng, name, kind, rows, distribution):
+    """Draw the values of one counter for `rows` kernels."""
+    if kind == 'percent':
+        return rng.uniform(0, 100, rows)
+    if kind == 'stall':
+        return rng.lognormal(-1.0, 1.0, rows)
+    if kind == 'ipc':
+        return rng.uniform(0.05, 4, rows)
+    if kind == 'warps':
+        if name.startswith("sm__maximum"):
+            return rng.uniform(48, 64, rows)
+        return rng.uniform(1, 48, rows)
+    if kind == 'threads':
+        return rng.uniform(1, 32, rows)
+    if kind == 'launch':
+        if name == "launch__block_size":
+            return rng.choice([64, 128, 256, 512, 1024], rows)
+        if name == "launch__registers_per_thread":
+            return rng.integers(16, 256, rows)
+        return rng.integers(1, 33, rows)
+    if kind == 'cycles':
+        low, scale = 1e4, 1e6
+    else:
+        low, scale = 1, 1e7
+    if distribution == 'uniform':
+        return np.floor(rng.uniform(low, scale, rows))
+    return np.floor(low + rng.lognormal(np.log(scale), 1.0, rows))
+
+
+def write_raw_report(stream, kernels, columns=None, distribution='lognormal', kernel_names=8,
+                     seed=0, preamble=True):
+    """
+    Write a synthetic NCU raw page.
+    Args:
+        stream: Text stream to write to.
+        kernels: Number of kernel rows.
+        columns: Total number of columns (optional, see raw_report_columns).
+        distribution: Distribution of the counter values, lognormal or uniform.
+        kernel_names: Number of distinct kernel names. Kernels are launched round-robin.
+        seed: Seed of the random generator.
+        preamble: Whether to write the ==PROF== lines ncu prints before the CSV.
+    """
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution {distribution}, use one of {DISTRIBUTIONS}")
+    rng = np.random.default_rng(seed)
+    names = raw_report_columns(columns)
+    kinds = [column_kind(name) for name in names]
+    if preamble:
+        stream.write("==PROF== Connected to process 1000 (synthetic)\n")
+        stream.write("==PROF== Disconnected from process 1000\n")
+    writer = csv.writer(stream, quoting=csv.QUOTE_ALL, lineterminator='\n')
+    writer.writerow(names)
+    writer.writerow([''] * len(NCU_METADATA_COLUMNS) + [unit for _, unit in kinds[len(NCU_METADATA_COLUMNS):]])
+    kernel_name_pool = ["synthetic_kernel_%d(float *, float *, int)" % i for i in range(kernel_names)]
+    counter_columns = list(zip(names, kinds))[len(NCU_METADATA_COLUMNS):]
+    for batch_start in range(0, kernels, BATCH_ROWS):
+        rows = min(BATCH_ROWS, kernels - batch_start)
+        formatted = []
+        for name, (kind, _) in counter_columns:
+            values = draw_values(rng, name, kind, rows, distribution)
+            if kind == 'launch':
+                formatted.append([str(int(value)) for value in values])
+            else:
+                formatted.append(["%.6f" % value for value in values])
+        for i in range(rows):
+            kernel_id = batch_start + i
+            metadata = [str(kernel_id), "1000", "synthetic", "127.0.0.1",
+                        kernel_name_pool[kernel_id % kernel_names], "2025-Jan-01 00:00:00", "1", "7"]
+            writer.writerow(metadata + [column[i] for column in formatted])
+
+
+def write_source_report(stream, lines, files=1, hot_fraction=0.1, distribution='lognormal', seed=0):
+    """
+    Write a synthetic NCU source mapping with stall samples.
+    Args:
+        stream: Text stream to write to.
+        lines: Total number of source lines over all files.
+        files: Number of source files the lines are split into.
+        hot_fraction: Fraction of the lines which have stall samples.
+        distribution: Distribution of the sample counts, lognormal or uniform.
+        seed: Seed of the random generator.
+    """
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution {distribution}, use one of {DISTRIBUTIONS}")
+    rng = np.random.default_rng(seed)
+    stall_columns = list(source_code_analysis.stalls_mapping_to_detail_report) + \
+        ["stall_not_selected", "stall_selected", "stall_sleep", "stall_tex"]
+    writer = csv.writer(stream, lineterminator='\n')
+    writer.writerow(SOURCE_COLUMNS + stall_columns)
+    empty = [''] * (len(SOURCE_COLUMNS) + len(stall_columns) - 2)
+    lines_per_file = max(1, lines // files)
+    written = 0
+    for file_index in range(files):
+        writer.writerow(['', 'synthetic_%d.cu' % file_index] + empty)
+        file_lines = lines_per_file if file_index < files - 1 else lines - written
+        for batch_start in range(0, file_lines, BATCH_ROWS):
+            rows = min(BATCH_ROWS, file_lines - batch_start)
+            hot = rng.random(rows) < hot_fraction
+            if distribution == 'uniform':
+                samples = rng.integers(0, 1000, (rows, len(stall_columns)))
+            else:
+                samples = np.floor(rng.lognormal(3.0, 1.5, (rows, len(stall_columns)))).astype(np.int64)
+            for i in range(rows):
+                line_number = batch_start + i + 1
+                code = "    v%d = v%d * a[idx + %d];" % (line_number, line_number - 1, line_number)
+                if hot[i]:
+                    total = int(samples[i].sum())
+                    writer.writerow([line_number, code, 8, total, total, total * 4]
+                                    + [int(value) for value in samples[i]])
+                else:
+                    writer.writerow([line_number, code] + empty)
+        written += file_lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-o', '--output', metavar='PATH', required=True,
+                        help='path of the raw page CSV, - for stdout.')
+    parser.add_argument('-s', '--source', metavar='PATH', help='also write a source mapping CSV to PATH.')
+    parser.add_argument('-k', '--kernels', type=int, default=100, help='number of kernel rows.')
+    parser.add_argument('--columns', type=int, default=None,
+                        help='total number of columns, filled up with synthetic counters.')
+    parser.add_argument('--kernel-names', type=int, default=8, help='number of distinct kernel names.')
+    parser.add_argument('--source-lines', type=int, default=10000, help='number of source lines.')
+    parser.add_argument('--source-files', type=int, default=1, help='number of source files.')
+    parser.add_argument('--hot-fraction', type=float, default=0.1,
+                        help='fraction of source lines with stall samples.')
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='lognormal',
+                        help='distribution of counter values and stall samples.')
+    parser.add_argument('--seed', type=int, default=0, help='random seed.')
+    parser.add_argument('--no-preamble', action='store_true', help="don't write the ==PROF== lines.")
+    args = parser.parse_args()
+
+    if args.output == '-':
+        write_raw_report(sys.stdout, args.kernels, args.columns, args.distribution, args.kernel_names,
+                         args.seed, not args.no_preamble)
+    else:
+        with open(args.output, 'w', encoding='utf-8', newline='') as fout:
+            write_raw_report(fout, args.kernels, args.columns, args.distribution, args.kernel_names,
+                             args.seed, not args.no_preamble)
+    if args.source:
+        with open(args.source, 'w', encoding='utf-8', newline='') as fout:
+            write_source_report(fout, args.source_lines, args.source_files, args.hot_fraction,
+                                args.distribution, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Opt-in tracing of DrGPU stages in Chrome trace-event format.
+
+The written JSON opens in Perfetto (https://ui.perfetto.dev) and chrome://tracing. Tracing is
+disabled by default; span() then returns a shared no-op context manager, so instrumented code
+pays only for one function call.
+
+Small helpers called thousands of times per kernel are decorated with traced(). Their calls
+record no events of their own: the number of calls and their total time are summed into the
+innermost open span of the thread and shown in its args as NAME.calls and NAME.ms. Calls outside
+any span are written as counter ("C") events.
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+_NULL_SPAN = contextlib.nullcontext()
+# the active Tracer, None while tracing is disabled
+_tracer = None
+# the open spans of every thread, innermost last
+_local = threading.local()
+
+
+def _add_call(calls, name, duration_ns):
+    count, total_ns = calls.get(name, (0, 0))
+    calls[name] = (count + 1, total_ns + duration_ns)
+
+
+def _call_args(calls):
+    args = {}
+    for name, (count, total_ns) in calls.items():
+        args[name + ".calls"] = count
+        args[name + ".ms"] = round(total_ns / 1e6, 3)
+    return args
+
+
+class Tracer:
+    def __init__(self):
+        # complete ("X") events of the Chrome trace-event format
+        self.events = []
+        self.lock = threading.Lock()
+        # {name: (calls, ns)} of traced() calls outside any span
+        self.calls = {}
+
+    def add_call(self, name, duration_ns):
+        spans = getattr(_local, 'spans', None)
+        if spans:
+            _add_call(spans[-1].calls, name, duration_ns)
+            return
+        with self.lock:
+            _add_call(self.calls, name, duration_ns)
+
+    def drain_calls(self):
+        """Counter events of the traced() calls outside any span, the totals restart."""
+        with self.lock:
+            calls = self.calls
+            self.calls = {}
+        ts = time.perf_counter_ns() / 1000
+        return [{"name": name, "cat": "drgpu", "ph": "C", "ts": ts, "pid": os.getpid(),
+                 "args": {"calls": count, "ms": round(total_ns / 1e6, 3)}}
+                for name, (count, total_ns) in calls.items()]
+
+    def add(self, name, start_ns, end_ns, args):
+        event = {"name": name, "cat": "drgpu", "ph": "X", "ts": start_ns / 1000,
+                 "dur": (end_ns - start_ns) / 1000, "pid": os.getpid(), "tid": threading.get_ident()}
+        if args:
+            event["args"] = args
+        with self.lock:
+            self.events.append(event)
+
+
+class _Span:
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start_ns = 0
+        # {name: (calls, ns)} of the traced() calls made directly inside this span
+        self.calls = {}
+
+    def __enter__(self):
+        spans = getattr(_local, 'spans', None)
+        if spans is None:
+            spans = _local.spans = []
+        spans.append(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end_ns = time.perf_counter_ns()
+        _local.spans.pop()
+        args = self.args
+        if self.calls:
+            args = dict(args or {}, **_call_args(self.calls))
+        self.tracer.add(self.name, self.start_ns, end_ns, args)
+        return False
+
+
+def enable():
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+
+
+def disable():
+    global _tracer
+    _tracer = None
+
+
+def is_enabled():
+    return _tracer is not None
+
+
+def span(name, **args):
+    """Context manager recording one span. Arguments are shown in the span details."""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _Span(_tracer, name, {key: str(value) for key, value in args.items()})
+
+
+def traced(name):
+    """
+    Decorator counting the calls of the function and their time in the enclosing span, without
+    an event per call.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return func(*args, **kwargs)
+            start_ns = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                tracer.add_call(name, time.perf_counter_ns() - start_ns)
+        return wrapper
+    return decorator
+
+
+def drain():
+    """Return and forget the recorded events, e.g. to send them from a worker process to its parent."""
+    if _tracer is None:
+        return []
+    calls = _tracer.drain_calls()
+    with _tracer.lock:
+        events = _tracer.events
+        _tracer.events = []
+    return events + calls
+
+
+def extend(events):
+    """Add events recorded by another process."""
+    if _tracer is None or not events:
+        return
+    with _tracer.lock:
+        _tracer.events.extend(events)
+
+
+def write(path):
+    """Write all recorded events to a Chrome trace JSON file."""
+    events = drain()
+    main_pid = os.getpid()
+    metadata = []
+    for pid in sorted({event["pid"] for event in events} | {main_pid}):
+        metadata.append({"name": "process_name", "ph": "M", "pid": pid,
+                         "args": {"name": "drgpu" if pid == main_pid else "drgpu worker %d" % pid}})
+    with open(path, 'w', encoding='utf-8') as fout:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, fout)
@@ -2,11 +2,13 @@ import re
 import copy
 import numpy as np
 import logging
+from drgpu import trace
 from drgpu.data_struct import Stat
 from drgpu.node import NODE_NAME_MAP_COUNTER
 
 logger = logging.getLogger(__name__)
 
+@trace.traced("add_to_tmp_stats")
 def add_to_tmp_stats(stats, final_stat_name, current_stat, suffix='', prefix=''):
     astat: Stat = stats.get(final_stat_name, None)
     if astat:
@@ -365,3 +367,90 @@ def long_scoreboard_latency(stats, memory_metrics, config):
 
     latency_stats["total_latency"] = Stat(aname='total_latency', avalue=sum_latency)
     return latency_stats
+
+
+# memory units of the throughput model, in the order the bottleneck ties are broken (the last wins)
+MEMORY_UNITS = ["l1", "utlb", "l1tlb", "l2", "fb"]
+# levels of the latency model
+LATENCY_LEVELS = ["l1", "tlb", "l2", "fb"]
+# global load counters of preface_mem_stats: (stat name, bytes per request)
+GLOBAL_LOAD_STATS = [("inst_mem_%s_%db" % (kind, bits), bits / 8)
+                     for kind in ("gld", "geld") for bits in (32, 64, 128)]
+# stats read by memory_model
+MEMORY_MODEL_STATS = ["elapsedClocks", "l1tex_hit_rate", "l2_hit_rate", "l1_lines_per_instruction_avg",
+                      "ltp_utlb_hit", "ltp_utlb_miss", "gpcl1_tlb_hit", "gpcl1_tlb_miss",
+                      "gnic_lg_read_requests_precoalescing", "gnic_lg_read_requests_postcoalescing",
+                      "gnic_read_sectors_postcoalescing", "fb_total_bytes", "mmu_ack_latency", "gnic_latency",
+                      "average_latency_reads"] + [name for name, _ in GLOBAL_LOAD_STATS]
+
+
+def memory_model_columns(stats_list):
+    """Stack the memory model stats of several kernels, {stat name: array over kernels}."""
+    return {name: np.array([stats[name].value for stats in stats_list], dtype=float)
+            for name in MEMORY_MODEL_STATS}
+
+
+def memory_model(columns, config):
+    """
+    The throughput and latency model of long_scoreboard_throughput and long_scoreboard_latency
+    for many kernels at once.
+    @arg columns: {stat name: array over kernels} of MEMORY_MODEL_STATS, see memory_model_columns
+    and read_reports.memory_model_columns_ncu.
+    @return: {name: array over kernels} with bottleneck_unit, util_rate, the throughput of every
+    unit of MEMORY_UNITS (l1_throughput, ...), the raw and the weighted latency cycles of every
+    level of LATENCY_LEVELS (l1_cycles, l1_latency, ...) and total_latency.
+    """
+    c = {name: np.asarray(columns[name], dtype=float) for name in MEMORY_MODEL_STATS}
+    elapsed_clocks = c['elapsedClocks']
+    l1_miss_rate = 1 - c['l1tex_hit_rate'] / 100
+    l2_miss_rate = 1 - c['l2_hit_rate'] / 100
+    lpl1 = c['l1_lines_per_instruction_avg']
+    utlb_miss_rate = c['ltp_utlb_miss'] / (c['ltp_utlb_hit'] + c['ltp_utlb_miss'])
+    across_load_coalescing_ratio = c['gnic_lg_read_requests_precoalescing'] / c['gnic_lg_read_requests_postcoalescing']
+
+    # bytes per l1 instruction
+    total_lds = sum(np.trunc(c[name]) for name, _ in GLOBAL_LOAD_STATS)
+    sum_requests = sum(c[name] for name, _ in GLOBAL_LOAD_STATS)
+    sum_bytes = sum(c[name] * line_byte for name, line_byte in GLOBAL_LOAD_STATS)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bpl1 = np.where(sum_requests == 0, 0, sum_bytes / sum_requests)
+        tlb_requests = c['gpcl1_tlb_hit'] + c['gpcl1_tlb_miss']
+        l1_tlb_miss_rate = np.where(tlb_requests == 0, 0, c['gpcl1_tlb_miss'] / tlb_requests)
+
+    # Configuration constants given as arrays (a grid of configurations) broadcast against the kernels
+    throughputs = np.stack(np.broadcast_arrays(
+        (1 - l1_miss_rate) * total_lds * bpl1 * config.L1_THROUGHPUT_FIX,
+        l1_miss_rate * (1 - utlb_miss_rate) * lpl1 * config.uTLB_THROUGHPUT_FIX,
+        l1_miss_rate * utlb_miss_rate * (1 - l1_tlb_miss_rate) * lpl1 * config.L1_TLB_THROUGHPUT_FIX,
+        (1 - l2_miss_rate) * config.BYTES_PER_L2_INSTRUCTION * c['gnic_read_sectors_postcoalescing']
+        * config.L2_THROUGHPUT_FIX,
+        c['fb_total_bytes'] * config.FB_THROUGHPUT_FIX,
+    ), axis=-1)
+    # the last of the largest throughputs, like the stable sort of long_scoreboard_throughput
+    bottleneck = throughputs.shape[-1] - 1 - np.argmax(throughputs[..., ::-1], axis=-1)
+    model = {"bottleneck_unit": np.array(MEMORY_UNITS)[bottleneck],
+             "util_rate": np.take_along_axis(throughputs, bottleneck[..., None], axis=-1)[..., 0] / elapsed_clocks}
+    for i, unit in enumerate(MEMORY_UNITS):
+        model[unit + "_throughput"] = throughputs[..., i]
+
+    l1_latency = config.L1_LATENCY_FIX + 2 * (lpl1 - 1)
+    utlb_latency = config.uTLB_LATENCY_FIX + (lpl1 - 1)
+    l1tlb_latency = config.l1TLB_LATENCY_FIX + lpl1 - 1
+    has_mmu_latency = c['mmu_ack_latency'] != -1
+    raw_tlb_latency = np.where(has_mmu_latency, c['mmu_ack_latency'], utlb_latency + l1tlb_latency)
+    tlb_latency = np.where(has_mmu_latency, np.ceil(l1_miss_rate * c['mmu_ack_latency']),
+                           np.ceil(l1_miss_rate * utlb_latency)
+                           + np.ceil(l1_miss_rate * utlb_miss_rate * l1tlb_latency))
+    l2_latency = np.where(c['gnic_latency'] != -1, c['gnic_latency'] - l2_miss_rate * c['average_latency_reads'],
+                          config.l2_latency)
+    fb_latency = np.where(c['average_latency_reads'] != -1, c['average_latency_reads'], config.fb_latency)
+    cycles = {"l1": l1_latency, "tlb": raw_tlb_latency, "l2": l2_latency, "fb": fb_latency}
+    latencies = {"l1": np.ceil(l1_latency),
+                 "tlb": tlb_latency,
+                 "l2": np.ceil(l1_miss_rate * l2_latency / across_load_coalescing_ratio),
+                 "fb": np.ceil(l1_miss_rate * l2_miss_rate * fb_latency / across_load_coalescing_ratio)}
+    for level in LATENCY_LEVELS:
+        model[level + "_cycles"] = np.ceil(cycles[level])
+        model[level + "_latency"] = latencies[level]
+    model["total_latency"] = sum(latencies[level] for level in LATENCY_LEVELS)
+    return model
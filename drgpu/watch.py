@@ -0,0 +1,219 @@
+"""
+Watch a directory and analyze NCU reports as they arrive.
+
+Main reports are `NAME.csv`, their optional source mappings `NAME_s.csv`. A report is analyzed
+once its files stopped changing for `settle` seconds, so half-written exports are never read.
+Analyzed reports are recorded with their size and mtime in a JSON state file; after a restart
+only new or changed reports are analyzed, and a report is analyzed again when its source mapping
+shows up later. On Linux inotify wakes the watcher up, elsewhere (or on file systems without
+inotify) the directory is polled.
+"""
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import select
+import sys
+import time
+from pathlib import Path
+
+from drgpu.drgpu_launch import DEFAULT_OUTPUT_DIR, launch, load_report, load_config
+from drgpu.hotspot_index import HotspotIndex
+
+logger = logging.getLogger(__name__)
+
+SOURCE_SUFFIX = '_s.csv'
+STATE_FILE_NAME = '.drgpu_watch.json'
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+
+def inotify_watch(directory: Path):
+    """
+    Open an inotify descriptor watching the directory for written and moved-in files.
+    Returns:
+        The file descriptor, or None where inotify is not available.
+    """
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def report_pairs(directory: Path):
+    """
+    Pair the main reports of the directory with their source mappings.
+    Returns:
+        {main report path: source mapping path or None}
+    """
+    names = set(os.listdir(directory))
+    pairs = {}
+    for name in sorted(names):
+        if not name.endswith('.csv') or name.endswith(SOURCE_SUFFIX):
+            continue
+        source_name = name[:-len('.csv')] + SOURCE_SUFFIX
+        pairs[directory / name] = directory / source_name if source_name in names else None
+    return pairs
+
+
+def file_signature(path: Path | None):
+    if path is None:
+        return None
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+class Watcher:
+    def __init__(self, directory: Path, memory_config: str | None = None, settle: float = 2.0,
+                 poll_interval: float = 1.0, state_path: Path | None = None, save_dot: bool = True,
+                 store=None, hotspot_index: Path | None = None, output_dir: str = DEFAULT_OUTPUT_DIR,
+                 unique_output: bool = False):
+        self.directory = Path(directory)
+        self.memory_config = memory_config
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.state_path = Path(state_path) if state_path else self.directory / STATE_FILE_NAME
+        self.save_dot = save_dot
+        self.output_dir = output_dir
+        self.unique_output = unique_output
+        # optional results_store.ResultsStore, written after every report
+        self.store = store
+        # optional hotspot index file, the source mapping of every report is added to it
+        self.hotspots = HotspotIndex(hotspot_index) if hotspot_index else None
+        # {report name: {"report": signature, "source": source name, "source_signature": signature,
+        #  "error": message}} of the reports already handled
+        self.state = self.load_state()
+        # {path: (signature, time the signature was first seen)} of the files not yet stable
+        self.observed = {}
+        self.config = None
+
+    def load_state(self):
+        try:
+            with open(self.state_path, encoding='utf-8') as fin:
+                return json.load(fin).get('reports', {})
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.warning("Ignoring the corrupt watch state %s", self.state_path)
+            return {}
+
+    def save_state(self):
+        tmp_path = self.state_path.with_name(self.state_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as fout:
+            json.dump({'version': 1, 'reports': self.state}, fout, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    def is_stable(self, path: Path, signature, now: float) -> bool:
+        """Whether the file kept the same size and mtime for `settle` seconds."""
+        seen = self.observed.get(path)
+        if seen is None or seen[0] != signature:
+            self.observed[path] = (signature, now)
+            return self.settle <= 0
+        return now - seen[1] >= self.settle
+
+    def scan(self):
+        """
+        Analyze every new, changed and complete report of the directory once.
+        Returns:
+            The number of reports analyzed and the number still being written.
+        """
+        now = time.monotonic()
+        analyzed = 0
+        waiting = 0
+        for report_path, source_path in report_pairs(self.directory).items():
+            try:
+                signature = file_signature(report_path)
+                source_signature = file_signature(source_path)
+            except FileNotFoundError:
+                # removed or renamed since listing, the next scan sees the result
+                continue
+            entry = {'report': signature, 'source': source_path.name if source_path else None,
+                     'source_signature': source_signature}
+            done = self.state.get(report_path.name)
+            if done is not None and all(done.get(key) == value for key, value in entry.items()):
+                continue
+            stable = self.is_stable(report_path, signature, now)
+            if source_path is not None:
+                stable = self.is_stable(source_path, source_signature, now) and stable
+            if not stable:
+                waiting += 1
+                continue
+            self.observed.pop(report_path, None)
+            self.observed.pop(source_path, None)
+            error = self.analyze(report_path, source_path)
+            if error:
+                entry['error'] = error
+            self.state[report_path.name] = entry
+            self.save_state()
+            analyzed += 1
+        return analyzed, waiting
+
+    def analyze(self, report_path: Path, source_path: Path | None):
+        """Analyze one report, returns the error message if it failed."""
+        logger.info("Analyze %s%s", report_path, " with " + str(source_path) if source_path else "")
+        try:
+            if self.config is None:
+                self.config = load_config(self.memory_config)
+            report = load_report(report_path, source_path)
+            launch(report, self.config, output=report_path.stem, save_dot=self.save_dot, store=self.store,
+                   output_dir=self.output_dir, unique_output=self.unique_output)
+            if self.store is not None:
+                self.store.flush()
+            if self.hotspots is not None and source_path is not None:
+                if self.hotspots.add(source_path, report_path.stem):
+                    self.hotspots.save()
+        except Exception as e:  # keep watching, the report is retried once it changes
+            logger.error("Analysis of %s failed: %s", report_path, e)
+            return str(e)
+        return None
+
+    def run(self, timeout: float | None = None):
+        """
+        Watch the directory until interrupted or for `timeout` seconds.
+        """
+        fd = inotify_watch(self.directory)
+        if fd is None:
+            logger.info("inotify is not available, polling %s every %g s", self.directory, self.poll_interval)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while True:
+                _, waiting = self.scan()
+                wait = self.poll_interval
+                if fd is not None and not waiting:
+                    # nothing pending, sleep until the directory changes
+                    wait = None
+                if deadline is not None:
+                    remaining = max(0.0, deadline - time.monotonic())
+                    if remaining == 0:
+                        return
+                    wait = remaining if wait is None else min(wait, remaining)
+                if fd is None:
+                    time.sleep(wait)
+                    continue
+                if select.select([fd], [], [], wait)[0]:
+                    # the events only wake the scan up, drain them
+                    try:
+                        while os.read(fd, 65536):
+                            pass
+                    except BlockingIOError:
+                        pass
+        finally:
+            if fd is not None:
+                os.close(fd)
@@ -5,26 +5,56 @@ Main entry point file to parse arguments and launch DrGPU.
 
 import argparse
 import logging
+import os
+import stat
+import sys
 from pathlib import Path
 
-from drgpu.drgpu_launch import launch, load_report, load_config
+from drgpu import cluster
+from drgpu import compression
+from drgpu import hotspot_index
+from drgpu import sweep
+from drgpu import trace
+from drgpu.watch import Watcher
+from drgpu.results_store import ResultsStore
+from drgpu.read_reports import KernelFilter
+from drgpu.aggregate import format_variation
+from drgpu.drgpu_launch import launch, load_report, load_report_arrow, load_config, iter_stream_reports, \
+    iter_chunked_reports, aggregate_report, launch_batch, launch_app, launch_clusters, default_dot_graph_name, \
+    ARROW_SUFFIXES, DEFAULT_OUTPUT_DIR
+from drgpu.dot_graph import unique_output_path
 
 logger = logging.getLogger(__name__)
 
+# chunk size when kernel filters scan a report without --max-memory
+DEFAULT_CHUNK_MEMORY = 256 << 20
+
 def main():
     """
     Main function to parse the arguments and launch the program.
     """
     parser = argparse.ArgumentParser()
-    parser.add_argument('-i', '--report-path', metavar='PATH',
-                        help='path to the CSV main report generated by Nsight Compute (NCU).',
-                        required=True, action='store')
+    parser.add_argument('-i', '--report-path', metavar='PATH', nargs='+',
+                        help='path to the CSV main report generated by Nsight Compute (NCU). '
+                             'Further paths are partial reports of the same run whose counters '
+                             'are merged into the first one.',
+                        required=False, action='store')
     parser.add_argument('-o', '--output', metavar='FILE_NAME',
                         help='name of the output decision tree file.', required=False,
                         action='store')
+    parser.add_argument('--output-dir', metavar='DIR', default=DEFAULT_OUTPUT_DIR,
+                        help='directory of the decision trees and tables (default: dots).',
+                        required=False, action='store')
+    parser.add_argument('--unique-output', action='store_true',
+                        help='add a number to an output name if the file exists instead of overwriting it.',
+                        required=False)
     parser.add_argument('-s', '--source', metavar='CSV_FILE_PATH',
                         help='path to the CSV source mapping exported from NCU.',
                         required=False, action='store')
+    parser.add_argument('--source-summary', metavar='SIZE', type=int,
+                        help='stream the source mapping and keep only the SIZE heaviest instructions '
+                             'of each stall reason, for source exports too large to load.',
+                        required=False, action='store')
     parser.add_argument('-c', '--memoryconfig', metavar='PATH',
                         help='absolute path to the memory config or a file name in mem_config',
                         required=False, action='store')
@@ -34,21 +64,301 @@ def main():
     parser.add_argument('-l', '--log-level', metavar='LEVEL',
                         help='log level (DEBUG, INFO, WARNING, ERROR, CRITICAL).', required=False,
                         action='store')
+    parser.add_argument('--on-conflict', choices=['error', 'first'],
+                        help='what to do when merged partial reports disagree on a unit or a launch or '
+                             'device attribute (default: error).',
+                        required=False, action='store')
+    parser.add_argument('--units-row', action='store_true',
+                        help='the first row of an Arrow (.arrow/.feather/.ipc) report holds the counter '
+                             'units like the NCU CSV.', required=False)
+    parser.add_argument('--max-memory', metavar='SIZE', type=parse_size,
+                        help='analyze all kernels of a CSV report in chunks of about SIZE bytes '
+                             '(e.g. 512M) instead of loading the whole report.',
+                        required=False, action='store')
+    parser.add_argument('--aggregate', action='store_true',
+                        help='combine repeated launches of each kernel and launch configuration into '
+                             'one cycle-weighted diagnosis.', required=False)
+    parser.add_argument('--app-tree', action='store_true',
+                        help='one tree for all kernels of the report weighted by their elapsed cycles, '
+                             'saved as OUTPUT_app, with links to the trees of the top kernels.',
+                        required=False)
+    parser.add_argument('--cluster', metavar='K', type=int,
+                        help='group the kernels into K clusters by stall signature and analyze only the '
+                             'medoid of each, saved as OUTPUT_cluster_N. The members are listed in '
+                             'OUTPUT_DIR/OUTPUT_clusters.csv.', required=False, action='store')
+    parser.add_argument('--sweep', metavar='NAME=VALUES', action='append',
+                        help='what-if sweep of a memory config constant over V1,V2,... or START:STOP:NUM '
+                             'values, repeat for a grid. Reports where the bottleneck units or the '
+                             'fired suggestion rules of the kernels change.', required=False)
+    parser.add_argument('--kernel-name', metavar='REGEX',
+                        help='analyze every kernel whose name matches REGEX.', required=False, action='store')
+    parser.add_argument('--short-name', action='store_true',
+                        help='match --kernel-name against the name without parameter list.', required=False)
+    parser.add_argument('--launches', metavar='START:STOP', type=parse_range,
+                        help='analyze the kernels with index START (inclusive) to STOP (exclusive).',
+                        required=False, action='store')
+    parser.add_argument('--process', metavar='PID_OR_NAME',
+                        help='analyze the kernels of this process ID or process name.',
+                        required=False, action='store')
+    parser.add_argument('--min-cycles', metavar='CYCLES', type=float,
+                        help='analyze the kernels with at least CYCLES elapsed cycles.',
+                        required=False, action='store')
+    parser.add_argument('--watch', metavar='DIR',
+                        help='analyze every NAME.csv (with NAME_s.csv as source) written to DIR, '
+                             'until interrupted.', required=False, action='store')
+    parser.add_argument('--settle', metavar='SECONDS', type=float, default=2.0,
+                        help='watch mode: time a report must stop changing before it is analyzed.',
+                        required=False, action='store')
+    parser.add_argument('--store', metavar='DB',
+                        help='record every analysis in the SQLite database DB, query it with '
+                             'python -m drgpu.results_store DB.', required=False, action='store')
+    parser.add_argument('--hotspot-index', metavar='INDEX',
+                        help='add the source mapping to the cross-kernel hotspot index INDEX (.npz), query '
+                             'it with python -m drgpu.hotspot_index INDEX.', required=False, action='store')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='write a Chrome trace-event JSON of the DrGPU stages to FILE '
+                             '(open it in Perfetto).', required=False, action='store')
     args = parser.parse_args()
+    if not args.report_path and not args.watch:
+        parser.error("one of -i/--report-path and --watch is required")
+    if args.hotspot_index and not args.source and not args.watch:
+        parser.error("--hotspot-index needs the source mapping of -s/--source")
+    args.kernel_filter = make_kernel_filter(args)
+    if args.kernel_filter and args.report_path and Path(args.report_path[0]).suffix in ARROW_SUFFIXES:
+        parser.error("kernel filters apply to CSV reports only")
+    # the analyses of all kernels of a report, run() does one of them
+    analyses = [option for option, given in [('--sweep', args.sweep), ('--aggregate', args.aggregate),
+                                             ('--app-tree', args.app_tree), ('--cluster', args.cluster)] if given]
+    if len(analyses) > 1:
+        parser.error("only one of %s can be given" % ", ".join(analyses))
+    if analyses and args.kernel_id is not None:
+        parser.error("%s analyzes all kernels of the report, -id/--id selects one" % analyses[0])
+    if args.sweep and args.store:
+        parser.error("--sweep records no analyses in --store")
+    if args.report_path:
+        mode = report_mode(args)
+        ignored = ignored_options(args, mode)
+        if ignored:
+            parser.error("%s cannot be combined with %s" % (mode, ", ".join(ignored)))
+    if args.sweep:
+        try:
+            args.sweep = sweep.parse_grid(args.sweep)
+        except ValueError as e:
+            parser.error(str(e))
 
     if args.log_level:
         logging.basicConfig(level=args.log_level)
     else:
         logging.basicConfig(level=logging.INFO)
 
-    report = load_report(Path(args.report_path),
-                         Path(args.source) if args.source else None,
-                         int(args.kernel_id) if args.kernel_id else None)
+    if args.trace:
+        trace.enable()
+    store = ResultsStore(args.store) if args.store else None
+    try:
+        run(args, store)
+    finally:
+        if store is not None:
+            store.close()
+        if args.trace:
+            trace.write(args.trace)
+
+
+def run(args, store=None):
+    """
+    Analyze the report given on the command line, recording the analyses in the store if given.
+    """
+    if args.watch:
+        watcher = Watcher(Path(args.watch), args.memoryconfig, settle=args.settle, store=store,
+                          hotspot_index=args.hotspot_index, output_dir=args.output_dir,
+                          unique_output=args.unique_output)
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            pass
+        return
+    if args.hotspot_index:
+        hotspot_index.update(args.hotspot_index, Path(args.source), args.output)
+    if is_stream(args.report_path[0]):
+        run_stream(args, store)
+        return
+    if args.max_memory or args.kernel_filter:
+        run_chunked(args, store)
+        return
+    with trace.span("load_report"):
+        report_path = Path(args.report_path[0])
+        if report_path.suffix in ARROW_SUFFIXES:
+            report = load_report_arrow(report_path,
+                                       Path(args.source) if args.source else None,
+                                       int(args.kernel_id) if args.kernel_id else None,
+                                       args.units_row)
+        else:
+            report = load_report(report_path,
+                                 Path(args.source) if args.source else None,
+                                 int(args.kernel_id) if args.kernel_id else None,
+                                 [Path(path) for path in args.report_path[1:]],
+                                 args.on_conflict or 'error', args.source_summary)
     config = load_config(args.memoryconfig)
-    tree = launch(report, config, output=args.output)
+    if args.sweep:
+        run_sweep(report, config, args.sweep, args.output, args.output_dir, args.unique_output)
+        return
+    if args.aggregate:
+        run_aggregated(report, config, args.output, store, args.output_dir, args.unique_output)
+        return
+    if args.app_tree:
+        launch_app(report, config, output=args.output, store=store, output_dir=args.output_dir,
+                   unique_output=args.unique_output)
+        return
+    if args.cluster:
+        run_clusters(report, config, args.cluster, args.output, store, args.output_dir, args.unique_output)
+        return
+    tree = launch(report, config, output=args.output, store=store, output_dir=args.output_dir,
+                  unique_output=args.unique_output)
     logging.debug("\nSuggestions generated:")
     logging.debug(tree.get_tree_suggestions_str(), end="")
 
 
+def run_aggregated(report, config, output, store=None, output_dir=DEFAULT_OUTPUT_DIR, unique_output=False):
+    """
+    Analyze every kernel and launch configuration of the report once, with the counters of its
+    launches combined. The output of group N is named OUTPUT_N.
+    """
+    output = default_dot_graph_name(report, output)
+    reports, variation = aggregate_report(report)
+    for group_id in range(len(reports)):
+        logger.info(format_variation(variation, group_id))
+    launch_batch(reports, config, outputs=["%s_%d" % (output, group_id) for group_id in range(len(reports))],
+                 store=store, output_dir=output_dir, unique_output=unique_output)
+
+
+def run_clusters(report, config, clusters, output, store=None, output_dir=DEFAULT_OUTPUT_DIR, unique_output=False):
+    """
+    Analyze the medoid of every cluster of kernels. The members of all clusters with their
+    distance from the medoid are saved to OUTPUT_DIR/OUTPUT_clusters.csv.
+    """
+    output = default_dot_graph_name(report, output)
+    members, _ = launch_clusters(report, config, clusters, output, store=store, output_dir=output_dir,
+                                 unique_output=unique_output)
+    logger.info("\n" + cluster.format_clusters(members))
+    save_table(members, output_dir, output + "_clusters", unique_output)
+
+
+def run_sweep(report, config, grid, output, output_dir=DEFAULT_OUTPUT_DIR, unique_output=False):
+    """
+    Sweep the memory config constants of the grid over every kernel of the report. The table of
+    all grid points is saved to OUTPUT_DIR/OUTPUT_sweep.csv.
+    """
+    output = default_dot_graph_name(report, output)
+    sweep.check_grid(grid, config)
+    columns, matrix = sweep.kernel_inputs(report, config)
+    points, transitions = sweep.sweep(columns, matrix, config, grid)
+    if transitions.empty:
+        logger.info("The diagnosis of the %d kernels is the same on all %d grid points", len(matrix), len(points))
+    else:
+        logger.info("\n" + transitions.to_string(index=False, na_rep=""))
+    save_table(points, output_dir, output + "_sweep", unique_output)
+
+
+def save_table(table, output_dir, name, unique_output=False):
+    """Save a DataFrame to OUTPUT_DIR/NAME.csv, numbered like the trees with unique_output."""
+    if unique_output:
+        path = unique_output_path(output_dir, name, '.csv') + '.csv'
+    else:
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, name + '.csv')
+    table.to_csv(path, index=False)
+    logger.info("save to %s", path)
+
+
+def report_mode(args):
+    """How run() reads the report, None when it is loaded as a whole."""
+    if is_stream(args.report_path[0]):
+        return "a report read from stdin or a FIFO"
+    if args.max_memory or args.kernel_filter:
+        return "--max-memory and the kernel filters"
+    if Path(args.report_path[0]).suffix in ARROW_SUFFIXES:
+        return "an Arrow report"
+    return None
+
+
+def ignored_options(args, mode):
+    """The options given on the command line which the report mode doesn't support."""
+    if mode is None:
+        return []
+    options = [('partial reports', len(args.report_path) > 1), ('--on-conflict', args.on_conflict is not None),
+               ('--source-summary', args.source_summary is not None)]
+    if mode != "an Arrow report":
+        # these analyze all kernels of a loaded report together
+        options += [('--sweep', args.sweep), ('--aggregate', args.aggregate), ('--app-tree', args.app_tree),
+                    ('--cluster', args.cluster)]
+    return [option for option, given in options if given]
+
+
+def make_kernel_filter(args):
+    """The KernelFilter of the command line, None without filter options."""
+    if args.kernel_name is None and args.launches is None and args.process is None and args.min_cycles is None:
+        return None
+    return KernelFilter(args.kernel_name, args.short_name, args.launches, args.process, args.min_cycles)
+
+
+def parse_range(text):
+    """Parse START:STOP, START: or a single index into (start, stop)."""
+    if ':' not in text:
+        return int(text), int(text) + 1
+    start, stop = text.split(':', 1)
+    return int(start) if start else 0, int(stop) if stop else None
+
+
+def parse_size(size):
+    """Parse a byte size like 512M or 2G."""
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+    size = size.strip().upper().removesuffix('B')
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+
+def run_chunked(args, store=None):
+    """
+    Analyze every kernel of a report, or the kernels passing the filters, chunk by chunk so that
+    reports larger than memory fit. The output of a kernel is named OUTPUT_INDEX.
+    """
+    report_path = Path(args.report_path[0])
+    output = args.output or Path(compression.strip_suffix(report_path.name)).stem
+    config = load_config(args.memoryconfig)
+    for index, report in iter_chunked_reports(report_path, Path(args.source) if args.source else None,
+                                              int(args.kernel_id) if args.kernel_id else None,
+                                              max_memory=args.max_memory or DEFAULT_CHUNK_MEMORY,
+                                              kernel_filter=args.kernel_filter):
+        launch(report, config, output="%s_%d" % (output, index), store=store, output_dir=args.output_dir,
+               unique_output=args.unique_output)
+
+
+def is_stream(report_path):
+    """Whether the report is read from stdin (-) or a FIFO."""
+    return report_path == '-' or (os.path.exists(report_path) and stat.S_ISFIFO(os.stat(report_path).st_mode))
+
+
+def run_stream(args, store=None):
+    """
+    Analyze every kernel of a report piped from ncu as soon as its row arrives, e.g.
+    ncu --csv --page raw -i app.ncu-rep | ./main.py -i -
+    The output of a kernel is named OUTPUT_INDEX.
+    """
+    report_path = args.report_path[0]
+    name = 'stdin' if report_path == '-' else report_path
+    output = args.output or ('stdin' if report_path == '-' else Path(report_path).stem)
+    config = load_config(args.memoryconfig)
+    stream = sys.stdin if report_path == '-' else open(report_path, 'r', encoding='utf-8')
+    try:
+        for index, report in iter_stream_reports(stream, Path(args.source) if args.source else None,
+                                                 int(args.kernel_id) if args.kernel_id else None, name,
+                                                 args.kernel_filter):
+            launch(report, config, output="%s_%d" % (output, index), store=store, output_dir=args.output_dir,
+                   unique_output=args.unique_output)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,56 @@
+"""
+Shared fixtures of the unit tests.
+
+Run with
+    python -m pytest test
+The reports are written by drgpu.synthetic_report, so the tests need no GPU and no ncu.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+if str(REPO_DIR) not in sys.path:
+    sys.path.insert(0, str(REPO_DIR))
+
+from drgpu import read_reports  # noqa: E402
+from drgpu import synthetic_report  # noqa: E402
+from drgpu.data_struct import Report  # noqa: E402
+from drgpu.drgpu_launch import load_config  # noqa: E402
+
+SYNTHETIC_KERNELS = 12
+
+
+@pytest.fixture(scope='session')
+def synthetic_kernels():
+    return SYNTHETIC_KERNELS
+
+
+@pytest.fixture(scope='session')
+def a100_config():
+    return load_config('a100')
+
+
+@pytest.fixture(scope='session')
+def synthetic_report_path(tmp_path_factory):
+    """A raw page of SYNTHETIC_KERNELS synthetic kernels."""
+    path = tmp_path_factory.mktemp('reports') / 'synthetic.csv'
+    with open(path, 'w', encoding='utf-8') as fout:
+        synthetic_report.write_raw_report(fout, SYNTHETIC_KERNELS, seed=3)
+    return path
+
+
+@pytest.fixture(scope='session')
+def synthetic_raw_counters(synthetic_report_path):
+    """The parsed raw page of synthetic_report_path, units row first."""
+    return read_reports.fill_report_ncu(Report(path=str(synthetic_report_path)))
+
+
+@pytest.fixture(scope='session')
+def synthetic_source_path(tmp_path_factory):
+    """A source mapping of 2000 lines in 4 files."""
+    path = tmp_path_factory.mktemp('reports') / 'synthetic_s.csv'
+    with open(path, 'w', encoding='utf-8') as fout:
+        synthetic_report.write_source_report(fout, 2000, files=4, seed=3)
+    return path
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the ncu command line on machines without a GPU.
+
+Profiling (`--export NAME ...`) copies a canned raw page to NAME.ncu-rep instead of running
+the application. Exporting (`--csv --page raw -i NAME.ncu-rep`) prints that file. The canned
+report is $DRGPU_NCU_STUB_REPORT (default: vector_add.csv next to this script) and every
+profiling call sleeps $DRGPU_NCU_STUB_DELAY seconds to imitate the profiling time.
+"""
+import os
+import shutil
+import sys
+import time
+
+
+def main(argv):
+    if '--csv' in argv:
+        with open(argv[argv.index('-i') + 1], 'r', encoding='utf-8') as fin:
+            sys.stdout.write(fin.read())
+        return 0
+    if '--export' not in argv:
+        sys.stderr.write("ncu_stub: only --export and --csv -i are supported\n")
+        return 1
+    report = os.environ.get('DRGPU_NCU_STUB_REPORT',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vector_add.csv'))
+    time.sleep(float(os.environ.get('DRGPU_NCU_STUB_DELAY', '0')))
+    print("==PROF== Connected to process (ncu_stub)")
+    shutil.copyfile(report, argv[argv.index('--export') + 1] + '.ncu-rep')
+    print("==PROF== Report: %s.ncu-rep" % argv[argv.index('--export') + 1])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,40 @@
+import json
+from pathlib import Path
+
+from drgpu import collector
+from drgpu import dot_graph
+from drgpu.drgpu_launch import launch, load_report
+
+NCU_STUB = Path(__file__).resolve().parent / 'ncu_stub.py'
+
+
+def test_collect_with_ncu_stub(synthetic_report_path, a100_config, tmp_path, monkeypatch):
+    monkeypatch.setenv('DRGPU_NCU_STUB_REPORT', str(synthetic_report_path))
+    manifest = {
+        "output_dir": "reports",
+        "jobs": [
+            {"name": "app", "executable": "./app.out", "args": ["input.txt"], "kernels": ["kernel_a", "kernel_b"]},
+            {"name": "other", "executable": "./other.out"},
+            # profiling fails, the rest of the suite goes on
+            {"name": "broken", "executable": "./broken.out", "cwd": "missing"},
+        ]
+    }
+    manifest_path = tmp_path / 'manifest.json'
+    manifest_path.write_text(json.dumps(manifest), encoding='utf-8')
+    output_dir, tasks = collector.load_manifest(manifest_path)
+    assert [task.output_name for task in tasks] == ['app_kernel_a', 'app_kernel_b', 'other', 'broken']
+
+    tasks = collector.collect(tasks, output_dir, ncu=str(NCU_STUB), export_workers=2, analysis_workers=2,
+                              memory_config='a100', save_dot=False)
+    *collected, broken = tasks
+    assert broken.error.startswith('profile: ') and broken.tree is None
+
+    expected = dot_graph.build_digraph(launch(load_report(synthetic_report_path), a100_config, save_dot=False))
+    report = synthetic_report_path.read_text(encoding='utf-8')
+    for task in collected:
+        assert task.error is None
+        assert task.csv_path == str((output_dir / (task.output_name + '.csv')).absolute())
+        assert Path(task.csv_path).read_text(encoding='utf-8') == report
+        assert dot_graph.build_digraph(task.tree).source == expected.source
+    assert sorted(path.name for path in output_dir.iterdir()) == \
+        sorted(task.output_name + suffix for task in collected for suffix in ('.csv', '.ncu-rep'))
@@ -0,0 +1,53 @@
+import gzip
+import lzma
+
+import pandas as pd
+import pytest
+
+from drgpu import compression
+from drgpu import read_reports
+from drgpu.data_struct import Report
+
+
+def compress(data, kind):
+    if kind == 'gzip':
+        return gzip.compress(data)
+    if kind == 'xz':
+        return lzma.compress(data)
+    zstandard = pytest.importorskip('zstandard')
+    return zstandard.ZstdCompressor().compress(data)
+
+
+@pytest.fixture(params=['command', 'library'])
+def decompressor(request, monkeypatch):
+    if request.param == 'library':
+        monkeypatch.setattr(compression, 'decompress_command', lambda kind, path: None)
+    return request.param
+
+
+def compressed_report(source, directory, kind, decompressor, size=None):
+    data = source.read_bytes()
+    path = directory / (source.name + compression.SUFFIXES[kind])
+    path.write_bytes(compress(data, kind)[:size])
+    assert compression.detect_compression(path) == kind
+    if decompressor == 'command' and compression.decompress_command(kind, path) is None:
+        pytest.skip(f"no {kind} executable")
+    return path
+
+
+@pytest.mark.parametrize('kind', ['gzip', 'xz', 'zstd'])
+def test_compressed_report_round_trip(synthetic_report_path, synthetic_raw_counters, tmp_path, kind,
+                                      decompressor):
+    path = compressed_report(synthetic_report_path, tmp_path, kind, decompressor)
+    raw_counters = read_reports.fill_report_ncu(Report(path=str(path)))
+    pd.testing.assert_frame_equal(raw_counters, synthetic_raw_counters)
+    with compression.open_text(path) as text:
+        assert text.read() == synthetic_report_path.read_text(encoding='utf-8')
+
+
+@pytest.mark.parametrize('kind', ['gzip', 'xz', 'zstd'])
+def test_truncated_report_fails(synthetic_report_path, tmp_path, kind, decompressor):
+    size = len(compress(synthetic_report_path.read_bytes(), kind)) // 2
+    path = compressed_report(synthetic_report_path, tmp_path, kind, decompressor, size)
+    with pytest.raises(ValueError, match="Decompressing .* failed"):
+        read_reports.fill_report_ncu(Report(path=str(path)))
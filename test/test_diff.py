@@ -0,0 +1,77 @@
+import pytest
+
+from drgpu import diff
+from drgpu import read_reports
+from drgpu import synthetic_report
+from drgpu.data_struct import Report
+from drgpu.node import SUGGESTION_NODE
+
+NEW_KERNELS = 10
+
+
+@pytest.fixture(scope='module')
+def new_report_path(tmp_path_factory):
+    """Another synthetic run of the first NEW_KERNELS launches, with other counter values."""
+    path = tmp_path_factory.mktemp('reports') / 'synthetic_new.csv'
+    with open(path, 'w', encoding='utf-8') as fout:
+        synthetic_report.write_raw_report(fout, NEW_KERNELS, seed=5)
+    return path
+
+
+def tree_nodes(hw_tree):
+    nodes = []
+    stack = [hw_tree]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(node.child)
+    return nodes
+
+
+def test_kernels_match_by_name_and_launch(synthetic_raw_counters, synthetic_kernels, new_report_path):
+    old_keys = diff.kernel_keys(synthetic_raw_counters)
+    new_keys = diff.kernel_keys(read_reports.fill_report_ncu(Report(path=str(new_report_path))))
+    # the 8 kernel names are launched round-robin
+    assert new_keys[9] == ("synthetic_kernel_1(float *, float *, int)", 1)
+    pairs, only_old, only_new = diff.match_kernels(old_keys, new_keys)
+    assert pairs == [(kernel_id, kernel_id) for kernel_id in range(NEW_KERNELS)]
+    assert only_old == old_keys[NEW_KERNELS:synthetic_kernels]
+    assert only_new == []
+    # kernels are paired by key, not by position
+    pairs, _, _ = diff.match_kernels(old_keys, new_keys[::-1])
+    assert pairs == [(NEW_KERNELS - 1 - kernel_id, kernel_id) for kernel_id in range(NEW_KERNELS)]
+
+
+def test_combined_tree_aligns_nodes_and_suggestions(synthetic_report_path, new_report_path, a100_config):
+    result, combined = diff.diff_reports(Report(path=str(synthetic_report_path)), Report(path=str(new_report_path)),
+                                         a100_config)
+    assert len(result['kernels']) == len(combined) == NEW_KERNELS
+    changed_suggestions = 0
+    for kernel in result['kernels']:
+        paths = [node['path'] for node in kernel['nodes']]
+        assert len(set(paths)) == len(paths)
+        for node in kernel['nodes']:
+            if node['status'] in ('increased', 'decreased'):
+                assert (node['delta'] > 0) == (node['status'] == 'increased')
+        nodes = tree_nodes(combined[kernel['new_kernel_id']])
+        compared = [node for node in nodes if node.type in diff.COMPARED_TYPES]
+        assert len(compared) == len(kernel['nodes'])
+        assert sorted(node.color for node in compared) == \
+            sorted(diff.STATUS_COLORS[node['status']] for node in kernel['nodes'])
+        # every suggestion in the combined tree appeared or disappeared
+        suggestions = [node for node in nodes if node.type == SUGGESTION_NODE]
+        for status, change in (('added', 'appeared'), ('removed', 'disappeared')):
+            colored = [node for node in suggestions if node.color == diff.STATUS_COLORS[status]]
+            assert len(colored) == len(kernel['suggestions'][change])
+            changed_suggestions += len(colored)
+        assert len(set(node.name for node in nodes)) == len(nodes)
+    assert changed_suggestions > 0
+
+
+def test_same_report_has_no_changes(synthetic_report_path, a100_config):
+    report = Report(path=str(synthetic_report_path), kernel_id=0)
+    result, combined = diff.diff_reports(report, report, a100_config, kernel_id=4)
+    (kernel,) = result['kernels']
+    assert {node['status'] for node in kernel['nodes']} == {'unchanged'}
+    assert kernel['suggestions'] == {'appeared': [], 'disappeared': []}
+    assert all(node.type != SUGGESTION_NODE for node in tree_nodes(combined[4]))
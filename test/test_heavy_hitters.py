@@ -0,0 +1,54 @@
+import pytest
+
+from drgpu import compression
+from drgpu import read_reports
+from drgpu.heavy_hitters import SpaceSaving
+
+
+@pytest.fixture(scope='module')
+def stall_samples(synthetic_source_path):
+    """(line id, stall index, count) of every sampled instruction of the synthetic source report."""
+    samples = []
+    with compression.open_text(synthetic_source_path) as handle:
+        for line_id, _, values in read_reports.iter_source_rows(handle, synthetic_source_path):
+            samples.extend((line_id, stall, value) for stall, value in enumerate(values) if value > 0)
+    return samples
+
+
+def exact_counts(samples):
+    counts = {}
+    for key, _, weight in samples:
+        counts[key] = counts.get(key, 0.0) + weight
+    return counts
+
+
+def summarize(samples, capacity):
+    summary = SpaceSaving(capacity)
+    for key, stall, weight in samples:
+        summary.add(key, weight, payload=stall)
+    return summary
+
+
+def test_exact_when_capacity_covers_all_items(stall_samples):
+    counts = exact_counts(stall_samples)
+    for capacity in (len(counts), 2 * len(counts)):
+        summary = summarize(stall_samples, capacity)
+        assert summary.max_error() == 0
+        assert summary.total == pytest.approx(sum(counts.values()))
+        top = summary.top()
+        assert {key: count for key, count, _, _ in top} == pytest.approx(counts)
+        assert [count for _, count, _, _ in top] == sorted(counts.values(), reverse=True)
+
+
+def test_error_bounds_below_capacity(stall_samples):
+    counts = exact_counts(stall_samples)
+    capacity = len(counts) // 10
+    summary = summarize(stall_samples, capacity)
+    assert len(summary.items) == capacity
+    assert summary.max_error() <= summary.total / capacity
+    for key, count, error, _ in summary.top():
+        assert count - error <= counts[key] + 1e-6
+        assert counts[key] <= count + 1e-6
+    # every item heavier than total / capacity is monitored
+    heavy = {key for key, count in counts.items() if count > summary.total / capacity}
+    assert heavy <= set(summary.items)
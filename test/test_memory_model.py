@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from drgpu import read_reports
+from drgpu import unit_hunt
+from drgpu.data_struct import Analysis, Memory_Metrics, Report
+from drgpu.drgpu_launch import hunt_units
+
+
+@pytest.fixture(scope='module')
+def scalar_kernels(synthetic_report_path, synthetic_raw_counters, synthetic_kernels, a100_config):
+    """(analysis, memory_metrics) of every kernel after the scalar long_scoreboard_* model."""
+    kernels = []
+    for kernel_id in range(synthetic_kernels):
+        analysis = Analysis()
+        memory_metrics = Memory_Metrics()
+        read_reports.fill_stats(analysis.all_stats, Report(path=str(synthetic_report_path), kernel_id=kernel_id,
+                                                           raw_counters=synthetic_raw_counters))
+        hunt_units(analysis, memory_metrics, a100_config)
+        kernels.append((analysis, memory_metrics))
+    return kernels
+
+
+def test_memory_model_matches_scalar_model(scalar_kernels, a100_config):
+    columns = unit_hunt.memory_model_columns([analysis.all_stats for analysis, _ in scalar_kernels])
+    model = unit_hunt.memory_model(columns, a100_config)
+    for i, (analysis, memory_metrics) in enumerate(scalar_kernels):
+        assert model['bottleneck_unit'][i] == analysis.bottleneck_unit
+        assert model['util_rate'][i] == pytest.approx(analysis.bottleneck_stats['util_rate'].value)
+        for unit in unit_hunt.MEMORY_UNITS:
+            assert model[unit + '_throughput'][i] == pytest.approx(memory_metrics.throughputs[unit])
+        for level in unit_hunt.LATENCY_LEVELS:
+            assert model[level + '_cycles'][i] == analysis.latency_stats[level + '_cycles'].value
+            assert model[level + '_latency'][i] == analysis.latency_stats[level + '_latency'].value
+        assert model['total_latency'][i] == analysis.latency_stats['total_latency'].value
+
+
+def test_raw_page_columns_match_stats(scalar_kernels, synthetic_raw_counters):
+    from_stats = unit_hunt.memory_model_columns([analysis.all_stats for analysis, _ in scalar_kernels])
+    from_raw_page = read_reports.memory_model_columns_ncu(synthetic_raw_counters)
+    for name in unit_hunt.MEMORY_MODEL_STATS:
+        np.testing.assert_allclose(from_raw_page[name], from_stats[name], rtol=1e-9, err_msg=name)
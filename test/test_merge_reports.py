@@ -0,0 +1,69 @@
+import io
+import logging
+
+import pytest
+
+from drgpu import read_reports
+from drgpu import synthetic_report
+
+MEASURED = 'gpc__cycles_elapsed.max'
+STATIC = 'launch__block_size'
+KEY_COLUMNS = read_reports.NCU_KERNEL_KEY_COLUMNS + read_reports.NCU_RUN_METADATA_COLUMNS
+
+
+@pytest.fixture(scope='module')
+def raw_page():
+    stream = io.StringIO()
+    synthetic_report.write_raw_report(stream, 6, seed=1)
+    return read_reports.parse_report_ncu(stream.getvalue())
+
+
+def partial(raw_page, columns, scale=None, changes=None):
+    """A partial report with the key columns and the given counters of raw_page."""
+    report = raw_page[[column for column in raw_page.columns if column in KEY_COLUMNS or column in columns]].copy()
+    if scale is not None:
+        report.loc[1:, MEASURED] = ["%.6f" % (float(value) * scale) for value in report.loc[1:, MEASURED]]
+    for (row, column), value in (changes or {}).items():
+        report.at[row, column] = value
+    return report
+
+
+def test_merge_joins_counters(raw_page):
+    counters = [column for column in raw_page.columns if column not in KEY_COLUMNS]
+    first, second = counters[:len(counters) // 2], counters[len(counters) // 2:]
+    merged = read_reports.merge_reports_ncu([partial(raw_page, first), partial(raw_page, second)])
+    assert merged.shape == raw_page.shape
+    assert merged[counters].equals(raw_page[counters])
+
+
+def test_measured_counter_within_tolerance(raw_page, caplog):
+    with caplog.at_level(logging.WARNING):
+        merged = read_reports.merge_reports_ncu([partial(raw_page, [MEASURED]),
+                                                 partial(raw_page, [MEASURED], scale=1.01)])
+    assert merged[MEASURED].equals(raw_page[MEASURED])
+    assert not caplog.records
+
+
+@pytest.mark.parametrize('on_conflict', ['error', 'first'])
+def test_measured_counter_beyond_tolerance_keeps_first(raw_page, caplog, on_conflict):
+    with caplog.at_level(logging.WARNING):
+        merged = read_reports.merge_reports_ncu([partial(raw_page, [MEASURED]),
+                                                 partial(raw_page, [MEASURED], scale=1.2)], on_conflict=on_conflict)
+    assert merged[MEASURED].equals(raw_page[MEASURED])
+    assert MEASURED in caplog.text
+
+
+def test_static_attribute_conflict(raw_page, caplog):
+    reports = [partial(raw_page, [STATIC]), partial(raw_page, [STATIC], changes={(2, STATIC): '999'})]
+    with pytest.raises(ValueError, match=STATIC):
+        read_reports.merge_reports_ncu(reports)
+    with caplog.at_level(logging.WARNING):
+        merged = read_reports.merge_reports_ncu(reports, on_conflict='first')
+    assert merged[STATIC].equals(raw_page[STATIC])
+    assert STATIC in caplog.text
+
+
+def test_unit_conflict(raw_page):
+    reports = [partial(raw_page, [MEASURED]), partial(raw_page, [MEASURED], changes={(0, MEASURED): 'usecond'})]
+    with pytest.raises(ValueError, match="unit"):
+        read_reports.merge_reports_ncu(reports)
@@ -0,0 +1,78 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import graphviz
+import pytest
+
+from drgpu import dot_graph
+from drgpu import drgpu_launch
+from drgpu import results_store
+from drgpu.data_struct import Report
+
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg"/>'
+
+
+@pytest.fixture
+def fake_dot(monkeypatch):
+    """Render without the dot executable, every SVG is the same placeholder."""
+    monkeypatch.setattr(graphviz.Digraph, 'pipe', lambda self, *args, **kwargs: SVG)
+
+
+def test_unique_output_path_skips_taken_names(tmp_path):
+    (tmp_path / 'tree.svg').write_bytes(b'')
+    (tmp_path / 'tree_1.svg').write_bytes(b'')
+    assert dot_graph.unique_output_path(str(tmp_path), 'tree') == str(tmp_path / 'tree_2')
+    # a prefix reserved with another suffix doesn't block the name
+    assert dot_graph.unique_output_path(str(tmp_path), 'tree', '_app.svg') == str(tmp_path / 'tree')
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        paths = list(executor.map(lambda _: dot_graph.unique_output_path(str(tmp_path), 'tree'), range(32)))
+    assert len(set(paths)) == len(paths)
+    assert str(tmp_path / 'tree_2') not in paths
+
+
+def test_unique_output_path_gives_up(tmp_path, monkeypatch):
+    monkeypatch.setattr(dot_graph, 'MAX_UNIQUE_TRIES', 2)
+    dot_graph.unique_output_path(str(tmp_path), 'tree')
+    dot_graph.unique_output_path(str(tmp_path), 'tree')
+    with pytest.raises(FileExistsError):
+        dot_graph.unique_output_path(str(tmp_path), 'tree')
+
+
+def test_threaded_launch_render(fake_dot, tmp_path, synthetic_report_path, synthetic_raw_counters,
+                                synthetic_kernels, a100_config):
+    output_dir = tmp_path / 'dots'
+
+    def analyze(kernel_id, output_dir):
+        report = Report(path=str(synthetic_report_path), kernel_id=kernel_id, raw_counters=synthetic_raw_counters)
+        return drgpu_launch.launch_render(report, a100_config, output='tree', output_dir=output_dir, store=store)
+
+    database = tmp_path / 'drgpu.db'
+    with results_store.ResultsStore(database, batch_size=3) as store:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            in_memory = list(executor.map(analyze, range(synthetic_kernels), [None] * synthetic_kernels))
+            saved = list(executor.map(analyze, range(synthetic_kernels), [str(output_dir)] * synthetic_kernels))
+
+    for hw_tree, rendering in in_memory:
+        assert rendering.name == 'tree'
+        assert rendering.svg == SVG
+        assert rendering.dot_path is None and rendering.svg_path is None
+        assert rendering.dot == dot_graph.build_digraph(hw_tree).source.encode('utf-8')
+    # every launch got its own name, and its files hold its own tree
+    names = [os.path.basename(rendering.dot_path) for _, rendering in saved]
+    assert len(set(names)) == synthetic_kernels
+    assert sorted(os.listdir(output_dir)) == sorted(names + [name + '.svg' for name in names])
+    for _, rendering in saved:
+        with open(rendering.dot_path, 'rb') as fin:
+            assert fin.read() == rendering.dot
+
+    connection = sqlite3.connect(database)
+    try:
+        analyses = results_store.query(connection)
+    finally:
+        connection.close()
+    outputs = analyses.sort_values('id')['output'].tolist()
+    assert outputs[:synthetic_kernels] == ['tree'] * synthetic_kernels
+    # the store records the name render() picked, not the requested one
+    assert sorted(outputs[synthetic_kernels:]) == sorted(names)
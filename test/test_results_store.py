@@ -0,0 +1,33 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from drgpu import drgpu_launch
+from drgpu import results_store
+from drgpu.data_struct import Report
+
+
+def test_threads_share_one_store(tmp_path, synthetic_report_path, synthetic_raw_counters, synthetic_kernels,
+                                 a100_config):
+    raw_counters = synthetic_raw_counters
+    database = tmp_path / 'drgpu.db'
+    rounds = 4
+
+    def analyze(kernel_id):
+        report = Report(path=str(synthetic_report_path), kernel_id=kernel_id, raw_counters=raw_counters)
+        drgpu_launch.launch(report, a100_config, save_dot=False, store=store)
+
+    # a small batch makes the threads flush while others are buffering
+    with results_store.ResultsStore(database, batch_size=3) as store:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(analyze, list(range(synthetic_kernels)) * rounds))
+
+    connection = sqlite3.connect(database)
+    try:
+        analyses = results_store.query(connection)
+        stalls = results_store.details(connection, 'stalls', analyses['id'])
+    finally:
+        connection.close()
+    assert len(analyses) == synthetic_kernels * rounds
+    assert analyses['id'].is_unique
+    assert (analyses['kernel_id'].value_counts() == rounds).all()
+    assert set(stalls['analysis_id']) == set(analyses['id'])
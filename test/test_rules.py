@@ -0,0 +1,115 @@
+import copy
+
+import pytest
+
+from drgpu import rules
+from drgpu.data_struct import Memory_Metrics, Report
+from drgpu.drgpu_launch import add_suggestions, analyze, load_config
+
+
+def _divergence_stat(stats):
+    return stats.get("not_predicated_off_thread_per_inst_executed", None) \
+        or stats.get("not_predicated_off_thread_per_inst_executed2", None)
+
+
+def _barrier_divergence(stats, config):
+    stat = _divergence_stat(stats)
+    return stat is not None and stat.value < 17
+
+
+def _high_l1_lines_per_instruction(memory_metrics, config):
+    high_l1_lines_per_instruction = config.warp_size * memory_metrics.bpl1 / config.BYTES_PER_L1_INSTRUCTION
+    return bool(memory_metrics.l1_lines_per_instruction) \
+        and memory_metrics.l1_lines_per_instruction > high_l1_lines_per_instruction
+
+
+# The inline checks of the suggestion functions before the rule table, including their None
+# guards: unguarded comparisons raise TypeError on a missing metric.
+OLD_THRESHOLDS = {
+    "low_activewarps_per_activecycle": lambda s, m, c:
+        s['activewarps_per_activecycle'].value < c.low_activewarps_per_activecycle,
+    "block_larger_than_warp": lambda s, m, c: s['launch_block_size'].value > c.warp_size,
+    "barrier_thread_divergence": lambda s, m, c: _barrier_divergence(s, c),
+    "branch_thread_divergence": lambda s, m, c:
+        s["not_predicated_off_thread_per_inst_executed"].value < c.high_not_predicated_off_thread_per_inst_executed,
+    "high_l1_throughput": lambda s, m, c:
+        m.throughputs['l1'] / s['elapsedClocks'].value >= c.high_l1_throughput,
+    "high_l1_hit_rate": lambda s, m, c: m.l1_hit_rate > c.high_l1_hit_rate,
+    "low_l1_hit_rate": lambda s, m, c: m.l1_hit_rate < c.low_l1_hit_rate,
+    "high_l1_conflict_rate": lambda s, m, c:
+        m.l1_conflict_rate is not None and m.l1_conflict_rate > c.high_l1_conflict_rate,
+    "high_l1_lines_per_instruction": lambda s, m, c: _high_l1_lines_per_instruction(m, c),
+    "high_utlb_miss_rate": lambda s, m, c:
+        m.utlb_miss_rate is not None and m.utlb_miss_rate >= c.high_utlb_miss_rate,
+    "high_l2_bank_conflict_rate": lambda s, m, c:
+        m.l2_bank_conflict_rate is not None and m.l2_bank_conflict_rate > c.high_l2_bank_conflict_rate,
+    "high_l2_miss_rate": lambda s, m, c: m.l2_miss_rate is not None and m.l2_miss_rate >= c.high_l2_miss_rate,
+    "low_access_per_activate": lambda s, m, c:
+        m.access_per_activate is not None and m.access_per_activate < c.low_access_per_activate,
+    "low_bank_per_access": lambda s, m, c:
+        m.average_dram_banks is not None and m.average_dram_banks < c.low_bank_per_access,
+    "no_compression": lambda s, m, c: m.compress_rate is not None and m.compress_rate == 0,
+    "low_compress_rate": lambda s, m, c: m.compress_rate is not None and m.compress_rate <= c.low_compress_rate,
+    "high_shared_ld_conflict": lambda s, m, c:
+        m.shared_ld_conflict_per_request is not None and m.shared_ld_conflict_per_request > c.conflict_high_threshold,
+    "high_shared_st_conflict": lambda s, m, c:
+        m.shared_st_conflict_per_request != 0 and m.shared_st_conflict_per_request > c.conflict_high_threshold,
+}
+
+
+def old_rules(stats, memory_metrics, config):
+    return {name: bool(check(stats, memory_metrics, config)) for name, check in OLD_THRESHOLDS.items()}
+
+
+def analyzed_kernel(report_path, raw_counters, kernel_id, config):
+    memory_metrics = Memory_Metrics()
+    report = Report(path=str(report_path), kernel_id=kernel_id, raw_counters=raw_counters)
+    analysis, hw_tree = analyze(report, memory_metrics, config)
+    return analysis, hw_tree, memory_metrics
+
+
+def suggestions_text(hw_tree, analysis, memory_metrics, config, fired=None):
+    hw_tree = copy.deepcopy(hw_tree)
+    add_suggestions(hw_tree, analysis, memory_metrics, config, fired)
+    return hw_tree.get_tree_suggestions_str()
+
+
+def test_rule_table_covers_old_thresholds():
+    assert set(OLD_THRESHOLDS) == set(rules.THRESHOLD_RULES)
+
+
+@pytest.mark.parametrize('gpu', ['a100', 'gtx1650'])
+def test_suggestions_match_old_thresholds(synthetic_report_path, synthetic_raw_counters, synthetic_kernels,
+                                          gpu):
+    config = load_config(gpu)
+    fired_total = 0
+    for kernel_id in range(synthetic_kernels):
+        analysis, hw_tree, memory_metrics = analyzed_kernel(synthetic_report_path, synthetic_raw_counters,
+                                                            kernel_id, config)
+        expected = old_rules(analysis.all_stats, memory_metrics, config)
+        assert rules.evaluate_kernel(analysis.all_stats, memory_metrics, config) == expected
+        assert suggestions_text(hw_tree, analysis, memory_metrics, config) == \
+            suggestions_text(hw_tree, analysis, memory_metrics, config, expected)
+        fired_total += sum(expected.values())
+    # the synthetic kernels exercise both outcomes
+    assert 0 < fired_total < synthetic_kernels * len(OLD_THRESHOLDS)
+
+
+def test_missing_metrics_never_fire(synthetic_report_path, synthetic_raw_counters, a100_config):
+    config = a100_config
+    analysis, hw_tree, memory_metrics = analyzed_kernel(synthetic_report_path, synthetic_raw_counters, 0,
+                                                        config)
+    stats = analysis.all_stats
+    stats['not_predicated_off_thread_per_inst_executed'] = copy.copy(
+        stats['not_predicated_off_thread_per_inst_executed'])
+    stats['not_predicated_off_thread_per_inst_executed'].value = None
+    memory_metrics.l1_hit_rate = None
+    memory_metrics.shared_st_conflict_per_request = None
+    missing = ["branch_thread_divergence", "high_l1_hit_rate", "low_l1_hit_rate", "high_shared_st_conflict"]
+    for name in missing:
+        with pytest.raises(TypeError):
+            OLD_THRESHOLDS[name](stats, memory_metrics, config)
+
+    fired = rules.evaluate_kernel(stats, memory_metrics, config)
+    assert not any(fired[name] for name in missing)
+    suggestions_text(hw_tree, analysis, memory_metrics, config)
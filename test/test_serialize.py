@@ -0,0 +1,80 @@
+import copy
+
+import numpy as np
+import pytest
+
+from drgpu import dot_graph
+from drgpu import serialize
+from drgpu.data_struct import Memory_Metrics
+from drgpu.drgpu_launch import analyze, add_suggestions, load_report
+
+
+@pytest.fixture(scope='module', params=[None, 50], ids=['full_source', 'source_summary'])
+def analyzed(request, synthetic_report_path, synthetic_source_path, a100_config):
+    report = load_report(synthetic_report_path, synthetic_source_path, kernel_id=3, source_summary_size=request.param)
+    memory_metrics = Memory_Metrics()
+    analysis, hw_tree = analyze(report, memory_metrics, a100_config)
+    add_suggestions(hw_tree, analysis, memory_metrics, a100_config)
+    return hw_tree, analysis, memory_metrics
+
+
+def dot_source(hw_tree):
+    return dot_graph.build_digraph(hw_tree).source
+
+
+def test_round_trip_keeps_the_dot_graph(analyzed):
+    hw_tree, analysis, memory_metrics = analyzed
+    result = serialize.loads(serialize.dumps(hw_tree, analysis, memory_metrics))
+    assert 'synthetic_' in dot_source(hw_tree)
+    assert dot_source(result.tree()) == dot_source(hw_tree)
+    loaded = result.analysis()
+    assert loaded.bottleneck_unit == analysis.bottleneck_unit
+    assert {name: stat.value for name, stat in loaded.all_stats.items()} == \
+        {name: stat.value for name, stat in analysis.all_stats.items()}
+    assert vars(result.memory_metrics()) == vars(memory_metrics)
+
+
+def test_subtree_matches_the_node(analyzed):
+    hw_tree, analysis, memory_metrics = analyzed
+    result = serialize.loads(serialize.dumps(hw_tree, analysis, memory_metrics))
+    original = next(node for node in hw_tree.child if node.name == 'warp_cant_issue_long_scoreboard')
+    assert dot_source(result.subtree('warp_cant_issue_long_scoreboard')) == dot_source(original)
+
+
+def test_stall_samples_round_trip_without_pickle(analyzed):
+    hw_tree, analysis, memory_metrics = analyzed
+    analysis.stall_sass_code.setdefault('warp_cant_issue_sleeping', {})
+    try:
+        result = serialize.loads(serialize.dumps(hw_tree, analysis, memory_metrics))
+    finally:
+        if not analysis.stall_sass_code['warp_cant_issue_sleeping']:
+            del analysis.stall_sass_code['warp_cant_issue_sleeping']
+    assert b'XTRA' not in result.sections
+    loaded = result.analysis()
+    assert loaded.stall_sass_code.pop('warp_cant_issue_sleeping') == {}
+    # assert_equal treats NaN sample counts as equal
+    for attr in ('stall_sass_code', 'stall_sass_totals', 'stall_sass_errors'):
+        np.testing.assert_equal(getattr(loaded, attr), getattr(analysis, attr))
+
+
+def test_node_attributes_round_trip(analyzed):
+    hw_tree = copy.deepcopy(analyzed[0])
+    hw_tree.child[0].url = 'kernel_3.svg'
+    hw_tree.child[0].color = 'lightpink'
+    loaded = serialize.loads(serialize.dumps(hw_tree)).tree()
+    assert (loaded.child[0].url, loaded.child[0].color) == ('kernel_3.svg', 'lightpink')
+    assert loaded.child[1].url is None
+
+
+def test_values_of_other_types_are_rejected(analyzed):
+    hw_tree, analysis, memory_metrics = copy.deepcopy(analyzed)
+    hw_tree.child[0].percentage = [0.5]
+    with pytest.raises(ValueError, match="percentage of node"):
+        serialize.dumps(hw_tree)
+    stat = next(iter(analysis.all_stats.values()))
+    stat.value = {'sm_0': 1.0}
+    with pytest.raises(ValueError, match="value of stat"):
+        serialize.dumps(analysis=analysis)
+    memory_metrics.bottleneck = ('l2', 'fb')
+    with pytest.raises(ValueError, match="memory_metrics field bottleneck"):
+        serialize.dumps(memory_metrics=memory_metrics)
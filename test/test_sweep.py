@@ -0,0 +1,84 @@
+import copy
+
+import numpy as np
+import pytest
+
+from drgpu import read_reports
+from drgpu import rules
+from drgpu import sweep
+from drgpu import unit_hunt
+from drgpu.data_struct import Analysis, Memory_Metrics, Report
+from drgpu.drgpu_launch import hunt_units
+
+
+@pytest.fixture(scope='module')
+def kernel_stats(synthetic_report_path, synthetic_raw_counters, synthetic_kernels):
+    stats = []
+    for kernel_id in range(synthetic_kernels):
+        all_stats = {}
+        read_reports.fill_stats(all_stats, Report(path=str(synthetic_report_path), kernel_id=kernel_id,
+                                                  raw_counters=synthetic_raw_counters))
+        stats.append(all_stats)
+    return stats
+
+
+def scalar_diagnosis(kernel_stats, config):
+    """Bottleneck unit and fired rules of every kernel, analyzed one by one like launch_batch."""
+    bottlenecks = []
+    rows = []
+    for all_stats in kernel_stats:
+        analysis = Analysis()
+        analysis.all_stats = copy.deepcopy(all_stats)
+        memory_metrics = Memory_Metrics()
+        hunt_units(analysis, memory_metrics, config)
+        bottlenecks.append(analysis.bottleneck_unit)
+        rows.append(rules.kernel_metrics(analysis.all_stats, memory_metrics, config))
+    fired = rules.evaluate(rules.metric_matrix(rows), config)
+    return bottlenecks, [rules.kernel_rules(fired, kernel) for kernel in range(len(kernel_stats))]
+
+
+def test_grid_points_match_scalar_evaluation(synthetic_report_path, kernel_stats, a100_config):
+    config = a100_config
+    # wide enough to move the bottleneck unit and the fired rules of some kernels
+    grid = {'FB_THROUGHPUT_FIX': config.FB_THROUGHPUT_FIX * np.array([0.01, 1.0, 100.0]),
+            'L1_THROUGHPUT_FIX': config.L1_THROUGHPUT_FIX * np.array([0.1, 10.0]),
+            'high_l2_miss_rate': np.array([0.1, 0.9])}
+    columns, matrix = sweep.kernel_inputs(Report(path=str(synthetic_report_path)), config)
+    points, _ = sweep.sweep(columns, matrix, config, grid)
+    assert len(points) == 3 * 2 * 2
+
+    base_bottlenecks, base_rules = scalar_diagnosis(kernel_stats, config)
+    changed_bottlenecks = changed_rules_total = 0
+    for _, point in points.iterrows():
+        point_config = copy.copy(config)
+        for name in grid:
+            setattr(point_config, name, point[name])
+        bottlenecks, kernel_rules = scalar_diagnosis(kernel_stats, point_config)
+        for unit in unit_hunt.MEMORY_UNITS:
+            assert point[unit] == bottlenecks.count(unit)
+        assert point['bottleneck_changes'] == sum(a != b for a, b in zip(bottlenecks, base_bottlenecks))
+        assert point['rule_changes'] == sum(a != b for a, b in zip(kernel_rules, base_rules))
+        changed_rules = {name for kernel, base in zip(kernel_rules, base_rules)
+                         for name in kernel if kernel[name] != base[name]}
+        assert set(filter(None, point['changed_rules'].split(','))) == changed_rules
+        changed_bottlenecks += point['bottleneck_changes']
+        changed_rules_total += point['rule_changes']
+    assert changed_bottlenecks > 0 and changed_rules_total > 0
+
+
+def test_transitions_leave_out_their_own_parameter(synthetic_report_path, a100_config):
+    config = a100_config
+    columns, matrix = sweep.kernel_inputs(Report(path=str(synthetic_report_path)), config)
+    factors = np.array([0.01, 1.0, 100.0])
+    _, transitions = sweep.sweep(columns, matrix, config, {'FB_THROUGHPUT_FIX': config.FB_THROUGHPUT_FIX * factors})
+    assert not transitions.empty
+    assert 'FB_THROUGHPUT_FIX' not in transitions.columns
+
+    grid = {'FB_THROUGHPUT_FIX': config.FB_THROUGHPUT_FIX * factors,
+            'L1_THROUGHPUT_FIX': config.L1_THROUGHPUT_FIX * np.array([0.1, 10.0])}
+    _, transitions = sweep.sweep(columns, matrix, config, grid)
+    for _, row in transitions.iterrows():
+        for name in grid:
+            if name in transitions.columns:
+                assert np.isnan(row[name]) == (name == row['parameter'])
+    assert not transitions.isna().all().any()
@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from drgpu import trace
+
+
+@pytest.fixture
+def tracer():
+    trace.enable()
+    yield
+    trace.disable()
+
+
+@trace.traced("helper")
+def helper():
+    return 1
+
+
+def test_traced_calls_are_summed_into_the_enclosing_span(tracer, tmp_path):
+    with trace.span("stage"):
+        for _ in range(5):
+            helper()
+        with trace.span("inner"):
+            helper()
+    helper()
+    path = tmp_path / 'trace.json'
+    trace.write(path)
+    events = [event for event in json.loads(path.read_text())['traceEvents'] if event['ph'] != 'M']
+    spans = {event['name']: event for event in events if event['ph'] == 'X'}
+    assert set(spans) == {'stage', 'inner'}
+    assert spans['stage']['args']['helper.calls'] == 5
+    assert spans['inner']['args']['helper.calls'] == 1
+    counters = [event for event in events if event['ph'] == 'C']
+    assert [(event['name'], event['args']['calls']) for event in counters] == [('helper', 1)]